@@ -0,0 +1,174 @@
+"""
+Server-sent alert deltas for dashboards.
+
+One AlertStream per process watches the database version. When it changes, or
+the day rolls over, the alert feed is computed once and diffed with the previous
+snapshot into a single event listing the alerts that are new, resolved or
+changed. Events carry increasing ids and the most recent ones are kept for
+replay, so any number of subscribers share one computation and a reconnecting
+EventSource resumes from its Last-Event-ID. A client without an id, or whose id
+is no longer buffered, starts from a full snapshot instead.
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Hashable, List, Optional, Tuple
+
+import pandas as pd
+from starlette.concurrency import run_in_threadpool
+
+from encoders import _dumps, frame_records
+
+# Comment line sent when nothing happened for this many seconds, so proxies keep the connection
+HEARTBEAT_SECONDS = 15
+
+# Milliseconds a disconnected EventSource waits before reconnecting
+RETRY_MS = 5000
+
+
+def keyed_alerts(feed: pd.DataFrame) -> Dict[str, Dict[str, Any]]:
+    """
+    Alert records keyed by equipment, alert type and occurrence. An asset can have
+    several alerts of one type (e.g. two overdue rentals); they are told apart by
+    their order in the feed.
+    """
+    feed = feed[["equipment_id", "alert_type", "message"]]
+    occurrence = feed.groupby(["equipment_id", "alert_type"], sort=False, observed=True).cumcount()
+    keys = (feed["equipment_id"].astype(str) + "|" + feed["alert_type"].astype(str) + "|" +
+            occurrence.astype(str))
+    records = frame_records(feed.assign(key=keys.to_numpy()))
+    return {record["key"]: record for record in records}
+
+
+def diff_alerts(previous: Dict[str, Dict[str, Any]],
+                current: Dict[str, Dict[str, Any]]) -> Dict[str, List[Any]]:
+    """New and changed alert records and the keys of resolved ones, in feed order."""
+    return {
+        "new": [record for key, record in current.items() if key not in previous],
+        "changed": [record for key, record in current.items() if key in previous and previous[key] != record],
+        "resolved": [key for key in previous if key not in current],
+    }
+
+
+def _message(event: str, event_id: str, data: Any) -> bytes:
+    return b"id: %s\nevent: %s\ndata: %s\n\n" % (event_id.encode(), event.encode(), _dumps(data))
+
+
+class AlertStream:
+    """
+    Shared alert snapshots and a bounded replay buffer of their deltas.
+
+    `stamp()` returns a cheap value that changes whenever the feed may have
+    (database version and day); `load_feed()` returns the alert feed. Both run in
+    the thread pool, from a single poller task that only runs while someone is
+    subscribed.
+    """
+
+    def __init__(self, stamp: Callable[[], Hashable], load_feed: Callable[[], pd.DataFrame],
+                 interval: float = 5.0, buffer_size: int = 256):
+        self.stamp = stamp
+        self.load_feed = load_feed
+        self.interval = interval
+        self.computations = 0
+        # Ids restart with the process, so they are prefixed with its start time
+        self._epoch = format(time.time_ns(), "x")
+        self._seq = 0
+        self._stamp: Optional[Hashable] = None
+        self._alerts: Optional[Dict[str, Dict[str, Any]]] = None
+        self._events: Deque[Tuple[int, bytes]] = deque(maxlen=buffer_size)
+        self._refresh_lock = threading.Lock()  # one feed computation at a time
+        self._lock = threading.Lock()  # guards the snapshot and events
+        self._subscribers = 0
+        self._poller: Optional[asyncio.Task] = None
+        self._changed: Optional[asyncio.Event] = None
+
+    def _event_id(self, seq: int) -> str:
+        return f"{self._epoch}-{seq}"
+
+    def refresh(self) -> bool:
+        """Recomputes and diffs the feed if the stamp moved. Returns whether a delta was recorded."""
+        with self._refresh_lock:
+            stamp = self.stamp()
+            if stamp == self._stamp:
+                return False
+            current = keyed_alerts(self.load_feed())
+            self.computations += 1
+            with self._lock:
+                previous, self._alerts, self._stamp = self._alerts, current, stamp
+                delta = diff_alerts(previous, current) if previous is not None else {}
+                if not any(delta.values()):
+                    return False
+                self._seq += 1
+                self._events.append((self._seq, _message("delta", self._event_id(self._seq), delta)))
+                return True
+
+    async def update(self):
+        """Runs `refresh` in the thread pool and wakes the subscribers if it recorded a delta."""
+        if self._changed is None:
+            self._changed = asyncio.Event()
+        if await run_in_threadpool(self.refresh):
+            self._changed.set()
+            self._changed = asyncio.Event()
+
+    def _snapshot(self) -> bytes:
+        return _message("snapshot", self._event_id(self._seq), {"alerts": list(self._alerts.values())})
+
+    def messages_after(self, last_event_id: Optional[str]) -> Tuple[int, List[bytes]]:
+        """
+        The buffered deltas after `last_event_id`, or a snapshot when they can't be
+        replayed, and the sequence number the client is then at.
+        """
+        with self._lock:
+            epoch, _, seq = (last_event_id or "").partition("-")
+            oldest = self._events[0][0] if self._events else self._seq + 1
+            if epoch != self._epoch or not seq.isdigit() or not oldest - 1 <= int(seq) <= self._seq:
+                return self._seq, [self._snapshot()]
+            return self._seq, [message for event_seq, message in self._events if event_seq > int(seq)]
+
+    async def _poll(self):
+        while self._subscribers:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.update()
+            except Exception:
+                # A failed refresh (e.g. database briefly unavailable) is retried next interval
+                continue
+
+    async def subscribe(self, last_event_id: Optional[str] = None) -> AsyncIterator[bytes]:
+        """
+        Server-sent event stream: a snapshot or replayed deltas, then each new delta.
+        Call `update` first, so the stream starts from the current feed.
+        """
+        if self._changed is None:
+            self._changed = asyncio.Event()
+        self._subscribers += 1
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.get_running_loop().create_task(self._poll())
+        try:
+            yield b"retry: %d\n\n" % RETRY_MS
+            seq, messages = self.messages_after(last_event_id)
+            for message in messages:
+                yield message
+            while True:
+                changed = self._changed
+                if self._seq == seq:
+                    try:
+                        await asyncio.wait_for(changed.wait(), HEARTBEAT_SECONDS)
+                    except asyncio.TimeoutError:
+                        yield b": keep-alive\n\n"
+                        continue
+                seq, messages = self.messages_after(self._event_id(seq))
+                for message in messages:
+                    yield message
+        finally:
+            self._subscribers -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "subscribers": self._subscribers,
+                "computations": self.computations,
+                "last_event_id": self._event_id(self._seq),
+                "buffered_events": len(self._events),
+            }
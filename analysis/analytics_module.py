@@ -1,45 +1,157 @@
+import numpy as np
 import pandas as pd
-from typing import Dict
+from typing import Callable, ContextManager, Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+from contextlib import nullcontext
 from datetime import datetime
+import tracemalloc
+
+from geo import SiteIndex, coordinates
 
 def _today():
     """Returns today's date as a pandas datetime object."""
     return pd.to_datetime(datetime.today().strftime("%Y-%m-%d"))
 
-def complete_equipment_profile(dfs: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+# One-to-many tables folded into the profile, with the column that orders their
+# records. Tables without one keep their most recently inserted record.
+PROFILE_TABLES = [
+    ("rentals", "check_out_date"),
+    ("usage", "date"),
+    ("maintenance", "last_service_date"),
+    ("alerts", None),
+    ("financial", None),
+    ("ai", None),
+]
+
+def _latest_per_equipment(df: pd.DataFrame, order_col: Optional[str]) -> pd.DataFrame:
+    """
+    Reduces a table to one row per equipment_id, indexed by equipment_id. Picks the row
+    with the latest `order_col` via groupby-idxmax (no full sort); equipment whose
+    `order_col` is entirely missing keep their first record.
+    """
+    if order_col is None or order_col not in df.columns:
+        return df.drop_duplicates("equipment_id", keep="last").set_index("equipment_id")
+    dated = df[df[order_col].notna()]
+    latest = df.loc[dated.groupby("equipment_id", sort=False, observed=True)[order_col].idxmax().to_numpy()]
+    undated = df[~df["equipment_id"].isin(latest["equipment_id"])].drop_duplicates("equipment_id")
+    return pd.concat([latest, undated]).set_index("equipment_id")
+
+def _record_stage(stats: Optional[List[dict]], stage: str, df: pd.DataFrame, input_rows: Optional[int] = None):
+    """Appends row count, frame size and traced peak memory for one profile stage."""
+    if stats is None:
+        return
+    entry = {
+        "stage": stage,
+        "input_rows": len(df) if input_rows is None else input_rows,
+        "rows": len(df),
+        "columns": df.shape[1],
+        "bytes": int(df.memory_usage(deep=True).sum()),
+        "peak_traced_bytes": tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else None,
+    }
+    stats.append(entry)
+
+RENTAL_STATUSES = pd.CategoricalDtype(["Idle", "Active", "Returned", "Overdue"])
+
+def _rental_status(df: pd.DataFrame) -> pd.Series:
+    """Idle/Active/Returned/Overdue status (categorical) from each row's latest rental dates."""
+    today = _today()
+    status = pd.Series("Idle", index=df.index, dtype=object) # No rental history
+    if "check_out_date" in df.columns:
+        status[(df["check_out_date"].notna()) & (df["check_in_date"].isna())] = "Active"
+        status[df["check_in_date"].notna()] = "Returned"
+    if "expected_return_date" in df.columns:
+        status[(df["expected_return_date"].notna()) &
+               (df["expected_return_date"] < today) &
+               (df["check_in_date"].isna())] = "Overdue"
+    return status.astype(RENTAL_STATUSES)
+
+# Profile columns that select_equipment can filter on, and the table each comes from
+PROFILE_FILTERS = {
+    "type": "equipment",
+    "status": "rentals",
+    "site_id": "rentals",
+    "alert_type": "alerts",
+}
+
+def _for_equipment(df: pd.DataFrame, ids: pd.Series) -> pd.DataFrame:
+    return df[df["equipment_id"].isin(ids)]
+
+def select_equipment(dfs: Dict[str, pd.DataFrame],
+                     filters: Optional[Dict[str, Iterable]] = None,
+                     after: Optional[str] = None,
+                     limit: Optional[int] = None) -> pd.DataFrame:
+    """
+    Returns the equipment master rows whose profile would match `filters`
+    (profile column -> accepted values), ordered by equipment_id, starting after
+    the `after` id and capped at `limit` rows. Status, site and alert filters are
+    evaluated on the latest rental/alert of the remaining candidates only, so
+    nothing is joined for equipment that is filtered out.
+    """
+    filters = {col: list(values) for col, values in (filters or {}).items()}
+    unknown = set(filters) - set(PROFILE_FILTERS)
+    if unknown:
+        raise ValueError(f"Unknown filter(s) {sorted(unknown)}, expected one of {list(PROFILE_FILTERS)}")
+
+    equipment = dfs["equipment"]
+    equipment = equipment[equipment["equipment_id"].notna()]
+    if "type" in filters:
+        equipment = equipment[equipment["type"].isin(filters["type"])]
+    if after is not None:
+        equipment = equipment[equipment["equipment_id"].astype(str) > after]
+
+    if {"status", "site_id"} & set(filters):
+        rentals = dfs.get("rentals", pd.DataFrame(columns=["equipment_id"]))
+        latest = _latest_per_equipment(_for_equipment(rentals, equipment["equipment_id"]), "check_out_date")
+        latest = latest.reindex(equipment["equipment_id"])
+        keep = pd.Series(True, index=latest.index)
+        if "status" in filters:
+            keep &= _rental_status(latest).isin(filters["status"])
+        if "site_id" in filters:
+            keep &= latest["site_id"].isin(filters["site_id"]) if "site_id" in latest.columns else False
+        equipment = equipment[keep.to_numpy()]
+
+    if "alert_type" in filters:
+        table = dfs.get("alerts", pd.DataFrame(columns=["equipment_id"]))
+        latest = _latest_per_equipment(_for_equipment(table, equipment["equipment_id"]), None)
+        latest = latest.reindex(equipment["equipment_id"])
+        if "alert_type" in latest.columns:
+            equipment = equipment[latest["alert_type"].isin(filters["alert_type"]).to_numpy()]
+        else:
+            equipment = equipment.iloc[0:0]
+
+    equipment = equipment.sort_values("equipment_id", kind="stable")
+    return equipment if limit is None else equipment.head(limit)
+
+def complete_equipment_profile(dfs: Dict[str, pd.DataFrame],
+                               stats: Optional[List[dict]] = None,
+                               equipment: Optional[pd.DataFrame] = None) -> pd.DataFrame:
     """
     Creates a complete, wide-format profile for each piece of equipment by merging all
-    related data tables. It intelligently handles one-to-many relationships by
-    selecting the most recent records.
+    related data tables. Every one-to-many table is first reduced to its most recent
+    record per equipment, then all of them are joined on the equipment_id index at once,
+    so the profile always has exactly one row per equipment.
+    Pass a subset of the equipment master (e.g. from select_equipment) as `equipment`
+    to profile only those rows; the other tables are narrowed to them before reducing.
+    Pass a list as `stats` to collect per-stage row counts and memory.
     """
     # Start with the master list of all equipment
-    base = dfs["equipment"].copy()
+    subset = equipment is not None
+    base = (equipment if subset else dfs["equipment"]).set_index("equipment_id")
+    _record_stage(stats, "equipment", base)
 
-    # Get the latest rental transaction for each equipment
-    if "rentals" in dfs and not dfs["rentals"].empty:
-        latest_rentals = dfs["rentals"].sort_values("check_out_date", ascending=False).drop_duplicates("equipment_id")
-        base = base.merge(latest_rentals, on="equipment_id", how="left")
-    
-    # Get the latest usage metric for each equipment
-    if "usage" in dfs and not dfs["usage"].empty:
-        latest_usage = dfs["usage"].sort_values("date", ascending=False).drop_duplicates("equipment_id")
-        base = base.merge(latest_usage, on="equipment_id", how="left")
-
-    # Merge remaining data tables
-    for table_name in ["maintenance", "alerts", "financial", "ai"]:
+    latest = []
+    for table_name, order_col in PROFILE_TABLES:
         if table_name in dfs and not dfs[table_name].empty:
-            base = base.merge(dfs[table_name], on="equipment_id", how="left")
+            table = _for_equipment(dfs[table_name], base.index.to_series()) if subset else dfs[table_name]
+            reduced = _latest_per_equipment(table, order_col)
+            _record_stage(stats, table_name, reduced, input_rows=len(dfs[table_name]))
+            latest.append(reduced)
+
+    base = base.join(latest, how="left") if latest else base.copy()
+    base = base.reset_index()
+    _record_stage(stats, "joined", base)
 
     # Calculate status based on dates
-    today = _today()
-    base["status"] = "Idle" # Default status for equipment with no rental history
-    if "check_out_date" in base.columns:
-        base.loc[(base["check_out_date"].notna()) & (base["check_in_date"].isna()), "status"] = "Active"
-        base.loc[base["check_in_date"].notna(), "status"] = "Returned"
-    if "expected_return_date" in base.columns:
-        base.loc[(base["expected_return_date"].notna()) &
-                 (base["expected_return_date"] < today) &
-                 (base["check_in_date"].isna()), "status"] = "Overdue"
+    base["status"] = _rental_status(base)
 
     # Calculate snapshot utilization percentage
     if "engine_hours_per_day" in base.columns and "idle_hours_per_day" in base.columns:
@@ -68,16 +180,20 @@ def complete_equipment_profile(dfs: Dict[str, pd.DataFrame]) -> pd.DataFrame:
     for col in expected_columns:
         if col not in base.columns:
             base[col] = None
-            
-    return base[expected_columns]
 
-def asset_dashboard(dfs: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    profile = base[expected_columns]
+    _record_stage(stats, "profile", profile)
+    return profile
+
+def asset_dashboard(dfs: Dict[str, pd.DataFrame],
+                    profile: Optional[pd.DataFrame] = None) -> pd.DataFrame:
     """
     Provides a summary view of the complete equipment profile, focusing on
     live status and key operational metrics.
+    An already computed profile can be passed in to avoid rebuilding it.
     """
     # Get the full profile first
-    full_profile = complete_equipment_profile(dfs)
+    full_profile = profile if profile is not None else complete_equipment_profile(dfs)
 
     # Define the columns needed for the dashboard view
     dashboard_columns = [
@@ -97,17 +213,98 @@ def usage_metrics(dfs: Dict[str, pd.DataFrame]) -> pd.DataFrame:
     usage = dfs["usage"].copy()
     usage["total_hours"] = usage["engine_hours_per_day"] + usage["idle_hours_per_day"]
 
-    metrics = usage.groupby("equipment_id").agg({
+    metrics = usage.groupby("equipment_id", observed=True).agg({
         "engine_hours_per_day":"sum",
         "idle_hours_per_day":"sum",
         "total_hours":"sum"
     }).reset_index()
 
+    return _finish_usage_metrics(metrics)
+
+def _finish_usage_metrics(metrics: pd.DataFrame) -> pd.DataFrame:
+    """Derives utilization from per-equipment hour totals (shared with the SQL backend)."""
     metrics["utilization_pct"] = (metrics["engine_hours_per_day"] /
                                   metrics["total_hours"].replace(0, pd.NA)) * 100
     metrics["underutilized"] = (metrics["utilization_pct"] < 50).astype(int)
     return metrics
 
+# Usage rollup grains (see migration 4 in dataset_preparation/migrate.py), coarsest first
+USAGE_ROLLUP_GRAINS = ("month", "week")
+
+# Per-equipment sums kept by the rollups and returned for any usage window
+USAGE_SUMS = ["engine_hours_per_day", "idle_hours_per_day", "total_hours", "downtime_hours",
+              "fuel_consumption_per_day", "operating_days", "row_count"]
+
+class UsageSegment(NamedTuple):
+    """
+    Part of a usage window: the half-open day range [start, end), unbounded where None,
+    read from the rollup of `grain` ("month"/"week"), from raw rows ("day") or, for
+    whole-history windows, the raw rows without a parseable date ("undated").
+    """
+    grain: str
+    start: Optional[pd.Timestamp]
+    end: Optional[pd.Timestamp]
+
+def _period_floor(day: pd.Timestamp, grain: str) -> pd.Timestamp:
+    """Start of the week (Monday) or month containing `day`."""
+    if grain == "month":
+        return day.replace(day=1)
+    return day - pd.Timedelta(days=day.weekday())
+
+def _period_ceil(day: pd.Timestamp, grain: str) -> pd.Timestamp:
+    """First week/month start on or after `day`."""
+    floor = _period_floor(day, grain)
+    if floor == day:
+        return day
+    return floor + (pd.DateOffset(months=1) if grain == "month" else pd.Timedelta(days=7))
+
+def plan_usage_window(start: Optional[pd.Timestamp] = None, end: Optional[pd.Timestamp] = None,
+                      grains: Sequence[str] = USAGE_ROLLUP_GRAINS) -> List[UsageSegment]:
+    """
+    Splits the usage window [start, end) into segments: the whole periods of the
+    coarsest grain that fit, then the partial periods at either edge planned the
+    same way with the finer grains, down to raw rows for what no rollup covers.
+    """
+    start = None if start is None else pd.Timestamp(start).normalize()
+    end = None if end is None else pd.Timestamp(end).normalize()
+    if start is not None and end is not None and start >= end:
+        return []
+    if not grains:
+        return [UsageSegment("day", start, end)]
+    if start is None and end is None:
+        return [UsageSegment(grains[0], None, None), UsageSegment("undated", None, None)]
+
+    grain, finer = grains[0], grains[1:]
+    lo = None if start is None else _period_ceil(start, grain)
+    hi = None if end is None else _period_floor(end, grain)
+    if lo is not None and hi is not None and lo >= hi:
+        return plan_usage_window(start, end, finer)
+    left = plan_usage_window(start, lo, finer) if start is not None else []
+    right = plan_usage_window(hi, end, finer) if end is not None else []
+    return left + [UsageSegment(grain, lo, hi)] + right
+
+def usage_window_totals(read_segment: Callable[[UsageSegment], pd.DataFrame],
+                        start: Optional[pd.Timestamp] = None, end: Optional[pd.Timestamp] = None,
+                        grains: Sequence[str] = USAGE_ROLLUP_GRAINS) -> pd.DataFrame:
+    """
+    Per-equipment USAGE_SUMS over [start, end) (the whole history by default).
+    `read_segment(segment)` returns those sums per equipment for one planned segment;
+    pass only the rollup grains that exist.
+    """
+    parts = [part for part in map(read_segment, plan_usage_window(start, end, grains)) if not part.empty]
+    if not parts:
+        return pd.DataFrame(columns=["equipment_id"] + USAGE_SUMS)
+    totals = pd.concat(parts).groupby("equipment_id")[USAGE_SUMS].sum().reset_index()
+    return totals.astype({"operating_days": "int64", "row_count": "int64"})
+
+def usage_window_metrics(read_segment: Callable[[UsageSegment], pd.DataFrame],
+                         start: Optional[pd.Timestamp] = None, end: Optional[pd.Timestamp] = None,
+                         grains: Sequence[str] = USAGE_ROLLUP_GRAINS) -> pd.DataFrame:
+    """usage_metrics restricted to the days in [start, end), answered through usage_window_totals."""
+    totals = usage_window_totals(read_segment, start, end, grains)
+    return _finish_usage_metrics(totals[["equipment_id", "engine_hours_per_day", "idle_hours_per_day",
+                                         "total_hours"]].copy())
+
 def detect_overdue(dfs: Dict[str, pd.DataFrame]) -> pd.DataFrame:
     rentals = dfs["rentals"].copy()
     today = _today()
@@ -117,27 +314,142 @@ def detect_overdue(dfs: Dict[str, pd.DataFrame]) -> pd.DataFrame:
     overdue["overdue_days"] = (today - overdue["expected_return_date"]).dt.days
     return overdue[["equipment_id","site_id","expected_return_date","overdue_days"]]
 
-def maintenance_alerts(dfs: Dict[str, pd.DataFrame],
-                       threshold_hours: int = 200,
-                       threshold_days: int = 180) -> pd.DataFrame:
-    maint = dfs["maintenance"].copy()
-    usage = dfs["usage"].copy()
+# Window of recent usage the burn rate is taken from, and how far ahead a
+# threshold crossing is projected before it is reported as unknown
+BURN_RATE_DAYS = 30
+PROJECTION_HORIZON_DAYS = 3650
+
+# Engine hours are logged to the hundredth, so a total within this of the threshold
+# has reached it, whatever order the backend added it up in
+HOURS_TOLERANCE = 1e-6
+
+# Days to the threshold are rounded to this many places before taking the ceiling,
+# so a burn rate summed in a different order can't move the projection by a day
+DAYS_PRECISION = 6
 
-    last_maint = maint.groupby("equipment_id")["last_service_date"].max().reset_index()
-    merged = usage.merge(last_maint, on="equipment_id", how="left")
-    eng_hours = merged.groupby("equipment_id")["engine_hours_per_day"].sum().reset_index()
+_DAY_OFFSET = 1 << 31
+_NS_PER_DAY = 86_400_000_000_000
+
+def _equipment_day_keys(codes: np.ndarray, days: np.ndarray) -> np.ndarray:
+    """Sortable int64 keys ordering rows by equipment code, then by day number."""
+    return (codes.astype(np.int64) << 32) + (days + _DAY_OFFSET)
+
+def _range_sums(values: np.ndarray, start: np.ndarray, end: np.ndarray) -> np.ndarray:
+    """Sums of values[start[i]:end[i]] for each i (0 for empty ranges), in one reduceat pass."""
+    sums = np.add.reduceat(np.append(values, 0.0), np.column_stack((start, end)).ravel())[::2]
+    return np.where(end > start, sums, 0.0)
+
+def _service_hours(usage: pd.DataFrame, last_service: pd.Series,
+                   threshold_hours: float, burn_rate_days: int = BURN_RATE_DAYS) -> pd.DataFrame:
+    """
+    Per-equipment inputs of the hour-based service check for the equipment in
+    `last_service` (indexed by equipment_id, NaT when no service date is known).
+    Dated usage rows are sorted once by (equipment, day) key; each equipment's
+    ranges are then found with searchsorted on the sorted keys and summed in one
+    reduceat pass, so no per-row merge with the service dates is needed. Returns
+    the engine hours logged on days after the last service (every day when it is
+    unknown), the day they reached `threshold_hours`, the latest usage day and the
+    mean engine hours per logged day over the `burn_rate_days` days up to it.
+    """
+    equipment = last_service.index
+    ids = usage["equipment_id"]
+    if isinstance(ids.dtype, pd.CategoricalDtype):
+        lookup = np.append(equipment.get_indexer(ids.cat.categories), -1)
+        codes = lookup[ids.cat.codes.to_numpy()]
+    else:
+        codes = equipment.get_indexer(ids)
+    dates = usage["date"].to_numpy("datetime64[ns]")
+    days = dates.view(np.int64) // _NS_PER_DAY
+    hours = usage["engine_hours_per_day"].to_numpy("float64", na_value=0.0)
+    keep = (codes >= 0) & ~np.isnat(dates)
+    if not keep.all():
+        codes, days, hours = codes[keep], days[keep], hours[keep]
+    keys = _equipment_day_keys(codes, days)
+
+    # Usage is usually stored in equipment/date or date order, which a stable sort
+    # handles in close to linear time; already sorted rows skip it altogether
+    if len(keys) and (np.diff(keys) < 0).any():
+        order = np.argsort(keys, kind="stable")
+        keys, hours = keys[order], hours[order]
+    row_codes = keys >> 32
+    # Distinct (equipment, day) keys among the first i sorted rows
+    new_day = np.ones(len(keys), dtype=bool)
+    np.not_equal(keys[1:], keys[:-1], out=new_day[1:])
+    logged = np.concatenate(([0], np.cumsum(new_day)))
+
+    n = np.arange(len(equipment), dtype=np.int64)
+    first = np.searchsorted(keys, n << 32)
+    end = np.searchsorted(keys, (n + 1) << 32)
+    has_usage = end > first
+    last_day = np.where(has_usage, np.append(keys, 0)[end - 1] - (n << 32) - _DAY_OFFSET, 0)
+    last_usage = np.where(has_usage, last_day.astype("datetime64[D]"), np.datetime64("NaT"))
+
+    service = last_service.to_numpy("datetime64[ns]")
+    known = ~np.isnat(service)
+    service_day = np.where(known, service.astype("datetime64[D]").astype(np.int64), 0)
+    since = np.where(known, np.searchsorted(keys, _equipment_day_keys(n, service_day), side="right"), first)
+    hours_since = _range_sums(hours, since, end)
+
+    recent = np.where(has_usage, np.searchsorted(keys, _equipment_day_keys(n, last_day - burn_rate_days),
+                                                 side="right"), end)
+    recent_days = logged[end] - logged[recent]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        burn_rate = np.where(recent_days > 0, _range_sums(hours, recent, end) / recent_days, np.nan)
+
+    # First row whose running total since the service reaches the threshold
+    crossing = (since < end) & (hours_since >= threshold_hours - HOURS_TOLERANCE)
+    after = np.flatnonzero((np.arange(len(keys)) >= since[row_codes]) & crossing[row_codes])
+    running = pd.Series(hours[after]).groupby(row_codes[after]).cumsum().to_numpy()
+    reached = after[running >= threshold_hours - HOURS_TOLERANCE]
+    crossed_codes, first_reached = np.unique(row_codes[reached], return_index=True)
+    crossed_day = np.full(len(equipment), np.datetime64("NaT"), dtype="datetime64[D]")
+    crossed_day[crossed_codes] = keys[reached[first_reached]] - (crossed_codes << 32) - _DAY_OFFSET
+
+    return pd.DataFrame({
+        "equipment_id": equipment,
+        "last_service_date": last_service.to_numpy(),
+        "engine_hours_since_service": hours_since,
+        "daily_engine_hours": burn_rate,
+        "last_usage_date": last_usage.astype("datetime64[ns]"),
+        "hours_crossed_date": crossed_day.astype("datetime64[ns]"),
+    })
 
-    alerts = last_maint.merge(eng_hours, on="equipment_id", how="left")
-    alerts["service_due_hours"] = alerts["engine_hours_per_day"] >= threshold_hours
+def maintenance_alerts(dfs: Dict[str, pd.DataFrame],
+                       threshold_hours: int = 200,
+                       threshold_days: int = 180,
+                       burn_rate_days: int = BURN_RATE_DAYS) -> pd.DataFrame:
+    """
+    Flags equipment due for service by engine hours logged since its last service
+    or by days since it, with the date the hour threshold was (or, at the recent
+    burn rate, will be) reached.
+    """
+    last_service = dfs["maintenance"].groupby("equipment_id", observed=True)["last_service_date"].max()
+    alerts = _service_hours(dfs["usage"], last_service, threshold_hours, burn_rate_days)
+    return _finish_maintenance_alerts(alerts, threshold_hours, threshold_days)
+
+def _finish_maintenance_alerts(alerts: pd.DataFrame,
+                               threshold_hours: int,
+                               threshold_days: int) -> pd.DataFrame:
+    """Flags service due by hours/days from per-equipment totals (shared with the SQL and incremental backends)."""
+    remaining = (threshold_hours - alerts["engine_hours_since_service"]) / alerts["daily_engine_hours"]
+    ahead = np.ceil(remaining.round(DAYS_PRECISION).where((alerts["daily_engine_hours"] > 0) & (remaining <= PROJECTION_HORIZON_DAYS)))
+    projected = alerts["last_usage_date"] + pd.to_timedelta(ahead, unit="D")
+    alerts["hours_due_date"] = alerts["hours_crossed_date"].fillna(projected)
+    alerts["service_due_hours"] = alerts["engine_hours_since_service"] >= threshold_hours - HOURS_TOLERANCE
     alerts["service_due_days"] = alerts["last_service_date"].notna() & \
-                                 ((_today()) - alerts["last_service_date"]).dt.days >= threshold_days
+                                 (((_today()) - alerts["last_service_date"]).dt.days >= threshold_days)
     alerts["service_alert"] = (alerts["service_due_hours"] | alerts["service_due_days"]).astype(int)
-    return alerts[["equipment_id","last_service_date","engine_hours_per_day",
-                   "service_due_hours","service_due_days","service_alert"]]
-
-def anomalies(dfs: Dict[str, pd.DataFrame]) -> pd.DataFrame:
-    profile = complete_equipment_profile(dfs)
-    usage = usage_metrics(dfs)[["equipment_id","utilization_pct","underutilized"]]
+    return alerts[["equipment_id","last_service_date","engine_hours_since_service","daily_engine_hours",
+                   "hours_due_date","service_due_hours","service_due_days","service_alert"]]
+
+def anomalies(dfs: Dict[str, pd.DataFrame],
+              profile: Optional[pd.DataFrame] = None,
+              metrics: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    if profile is None:
+        profile = complete_equipment_profile(dfs)
+    if metrics is None:
+        metrics = usage_metrics(dfs)
+    usage = metrics[["equipment_id","utilization_pct","underutilized"]]
 
     issues = profile.copy()
     issues["anom_no_site"] = issues["site_id"].isna().astype(int)
@@ -152,33 +464,97 @@ def anomalies(dfs: Dict[str, pd.DataFrame]) -> pd.DataFrame:
         "anom_no_site","anom_low_util","anomaly_flag","utilization_pct"
     ]]
 
-def predictive_allocation(dfs: Dict[str, pd.DataFrame]) -> pd.DataFrame:
-    ai = dfs["ai"].copy()
-    equipment = dfs["equipment"].copy()
+# Score added for a site at the asset's location, falling linearly to 0 at
+# LOCATION_RADIUS_KM of haversine distance
+LOCATION_BONUS = 20
+LOCATION_RADIUS_KM = 50.0
+
+def predictive_allocation(dfs: Dict[str, pd.DataFrame], k: int = 5) -> pd.DataFrame:
+    """
+    Recommends a site for every AI-scored asset. A site is a candidate when its
+    required_type matches the asset type; candidates score the asset's
+    predicted_demand_score plus the location bonus for their distance from the
+    asset (located by its latest usage record when `usage` is given, otherwise
+    by its own location_coordinates), and the first best-scoring site in
+    `sites` order wins. Only the `k` nearest sites of the type are scored, as sites
+    farther away score no higher; an asset without coordinates or with no site
+    in range goes to the first site of its type. Coordinates come from
+    latitude/longitude columns when a table has them, otherwise from the text.
+    """
+    ai = dfs["ai"]
+    equipment = dfs["equipment"]
     sites = dfs.get("sites", pd.DataFrame(columns=["site_id","required_type","location"]))
     merged = ai.merge(equipment, on="equipment_id", how="left")
-
-    allocations = []
-    for _, row in merged.iterrows():
-        eq_id = row["equipment_id"]
-        eq_type = row["type"]
-        eq_loc = row.get("location_coordinates", None)
-        score = row["predicted_demand_score"]
-
-        site_candidates = sites[sites["required_type"] == eq_type].copy()
-        if site_candidates.empty:
-            allocations.append([eq_id, None, "No matching site"])
+    usage = dfs.get("usage")
+    if usage is not None:
+        # Coordinates parsed at load stand in for the location text
+        located_cols = ["latitude", "longitude"] if {"latitude", "longitude"} <= set(usage.columns) \
+            else ["location_coordinates"]
+        cols = [col for col in ["equipment_id", "date"] + located_cols if col in usage.columns]
+        latest = _latest_per_equipment(usage[cols], "date")
+        lat, lon = coordinates(latest, "location_coordinates")
+        located = pd.DataFrame({"latitude": lat, "longitude": lon}, index=latest.index.astype(object))
+        located = located.reindex(merged["equipment_id"].astype(object).to_numpy())
+        eq_lat, eq_lon = located["latitude"].to_numpy(), located["longitude"].to_numpy()
+    else:
+        eq_lat, eq_lon = coordinates(merged, "location_coordinates")
+    eq = pd.DataFrame({
+        "equipment_id": merged["equipment_id"],
+        "type": merged["type"].astype(object),
+        "score": merged["predicted_demand_score"],
+    })
+    sites = sites.reindex(columns=["site_id","required_type","location"] +
+                                  [col for col in ("latitude","longitude") if col in sites.columns])
+    sites = sites[sites["required_type"].notna()]
+    site_lat, site_lon = coordinates(sites, "location")
+    sites = sites[["site_id","required_type","location"]].astype({"required_type": object, "location": object})
+    sites = sites.reset_index(drop=True)
+
+    # Without a bonus every candidate ties, so the first site of the type wins
+    first_of_type = sites.drop_duplicates("required_type")
+    by_type = eq.merge(first_of_type, left_on="type", right_on="required_type", how="left")
+    has_site = by_type["required_type"].notna().to_numpy()
+    site = np.full(len(eq), -1, dtype=np.int64)  # row in `sites` of the winning site in range
+    bonus = np.zeros(len(eq))
+
+    # Otherwise the nearest site of the type wins (ties in sites order); scores
+    # are shared, so ranking the k nearest by bonus ranks them by score
+    eq_type = eq["type"].to_numpy()
+    scored = eq["score"].notna().to_numpy()
+    for site_type, candidates in sites.groupby("required_type", sort=False).indices.items():
+        assets = np.flatnonzero((eq_type == site_type) & scored)
+        if not len(assets):
             continue
-
-        site_candidates["score"] = site_candidates.apply(
-            lambda s: score + (20 if s.get("location") == eq_loc else 0), axis=1
-        )
-        best_site = site_candidates.sort_values("score", ascending=False).iloc[0]
-        allocations.append([eq_id, best_site["site_id"], f"Allocate to {best_site.get('location')} (score={best_site['score']})"])
-
-    return pd.DataFrame(allocations, columns=["equipment_id","recommended_site_id","recommendation"])
-
-def rollback_with_allocation(dfs: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+        index = SiteIndex(site_lat[candidates], site_lon[candidates])
+        nearest, distance = index.nearest(eq_lat[assets], eq_lon[assets], k)
+        candidate_bonus = LOCATION_BONUS * np.clip(1 - distance / LOCATION_RADIUS_KM, 0, None)
+        best = candidate_bonus.argmax(axis=1)
+        best_bonus = candidate_bonus[np.arange(len(assets)), best]
+        in_range = best_bonus > 0
+        site[assets[in_range]] = candidates[nearest[in_range, best[in_range]]]
+        bonus[assets[in_range]] = best_bonus[in_range]
+
+    # Copies: to_numpy() can return a read-only view of a shared snapshot's column
+    near = site >= 0
+    site_id = by_type["site_id"].to_numpy(dtype=object, copy=True)
+    site_id[near] = sites["site_id"].to_numpy()[site[near]]
+    site_location = pd.Series(by_type["location"].to_numpy(dtype=object, copy=True))
+    site_location[near] = sites["location"].to_numpy()[site[near]]
+    best_score = pd.Series(eq["score"].to_numpy(dtype=float, na_value=np.nan) + bonus)
+    best_score[near] = best_score[near].round(3)
+
+    # str() per value, as the f-string this replaced formatted it: a missing score
+    # reads "score=nan" (astype(str) keeps it missing on pandas 3)
+    recommendation = ("Allocate to " + site_location.map(str) +
+                      " (score=" + best_score.map(str) + ")")
+    return pd.DataFrame({
+        "equipment_id": eq["equipment_id"].to_numpy(),
+        "recommended_site_id": np.where(has_site, site_id, None),
+        "recommendation": np.where(has_site, recommendation, "No matching site"),
+    }, columns=["equipment_id","recommended_site_id","recommendation"])
+
+def rollback_with_allocation(dfs: Dict[str, pd.DataFrame],
+                             allocation: Optional[pd.DataFrame] = None) -> pd.DataFrame:
     rentals = dfs["rentals"].copy()
     today = _today()
 
@@ -189,72 +565,179 @@ def rollback_with_allocation(dfs: Dict[str, pd.DataFrame]) -> pd.DataFrame:
     if ended.empty:
         return pd.DataFrame(columns=["equipment_id","action"])
 
-    realloc = predictive_allocation(dfs)
+    realloc = allocation if allocation is not None else predictive_allocation(dfs)
     result = ended.merge(realloc, on="equipment_id", how="left")
     result["action"] = result["recommendation"].fillna("Return to warehouse")
     return result[["equipment_id","site_id","expected_return_date","action"]]
 
-def alerts(dfs: Dict[str, pd.DataFrame]) -> pd.DataFrame:
-    alerts_list = []
-
-    overdue = detect_overdue(dfs)
-    for _, r in overdue.iterrows():
-        alerts_list.append([r["equipment_id"], "Contract", f"Overdue by {r['overdue_days']} days"])
-
-    maint = maintenance_alerts(dfs)
-    for _, r in maint[maint["service_alert"] == 1].iterrows():
-        alerts_list.append([r["equipment_id"], "Maintenance", "Service due (hours/days exceeded)"])
-
-    anoms = anomalies(dfs)
-    for _, r in anoms[anoms["anomaly_flag"] == 1].iterrows():
-        alerts_list.append([r["equipment_id"], "Anomaly", "Operational anomaly detected"])
-
-    rollback = rollback_with_allocation(dfs)
-    for _, r in rollback.iterrows():
-        alerts_list.append([r["equipment_id"], "Rollback", r["action"]])
-
-    pred = predictive_allocation(dfs)
-    for _, r in pred.iterrows():
-        alerts_list.append([r["equipment_id"], "Predictive", r["recommendation"]])
-
-    return pd.DataFrame(alerts_list, columns=["equipment_id","alert_type","message"])
-
-def run_all(dfs: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+# Lower numbers are more urgent; used to order the alert feed when prioritized.
+ALERT_PRIORITY = {
+    "Contract": 1,
+    "Maintenance": 2,
+    "Rollback": 2,
+    "Anomaly": 3,
+    "Predictive": 4,
+}
+
+def _alert_frame(equipment_ids: pd.Series, alert_type: str, message) -> pd.DataFrame:
+    """Builds one category of the alert feed; `message` is a Series or a constant string."""
+    return pd.DataFrame({
+        "equipment_id": equipment_ids.to_numpy(),
+        "alert_type": alert_type,
+        "message": message.to_numpy() if isinstance(message, pd.Series) else message,
+    }, columns=["equipment_id","alert_type","message"])
+
+def alerts(dfs: Dict[str, pd.DataFrame],
+           overdue: Optional[pd.DataFrame] = None,
+           maint: Optional[pd.DataFrame] = None,
+           anoms: Optional[pd.DataFrame] = None,
+           rollback: Optional[pd.DataFrame] = None,
+           pred: Optional[pd.DataFrame] = None,
+           prioritize: bool = False) -> pd.DataFrame:
+    """
+    Aggregates every alert category into one feed. With `prioritize`, a
+    `priority` column is added (see ALERT_PRIORITY) and the feed is stably
+    sorted on it, so alerts keep their category order within a priority.
+    """
+    if overdue is None:
+        overdue = detect_overdue(dfs)
+    if maint is None:
+        maint = maintenance_alerts(dfs)
+    if anoms is None:
+        anoms = anomalies(dfs)
+    if rollback is None:
+        rollback = rollback_with_allocation(dfs)
+    if pred is None:
+        pred = predictive_allocation(dfs)
+
+    due = maint[maint["service_alert"] == 1]
+    flagged = anoms[anoms["anomaly_flag"] == 1]
+    feed = pd.concat([
+        _alert_frame(overdue["equipment_id"], "Contract",
+                     "Overdue by " + overdue["overdue_days"].astype(str) + " days"),
+        _alert_frame(due["equipment_id"], "Maintenance", "Service due (hours/days exceeded)"),
+        _alert_frame(flagged["equipment_id"], "Anomaly", "Operational anomaly detected"),
+        _alert_frame(rollback["equipment_id"], "Rollback", rollback["action"]),
+        _alert_frame(pred["equipment_id"], "Predictive", pred["recommendation"]),
+    ], ignore_index=True)
+
+    return prioritize_alerts(feed) if prioritize else feed
+
+def prioritize_alerts(feed: pd.DataFrame) -> pd.DataFrame:
+    """The alert feed with a `priority` column, stably sorted on it."""
+    feed = feed.assign(priority=feed["alert_type"].map(ALERT_PRIORITY))
+    return feed.sort_values("priority", kind="stable", ignore_index=True)
+
+class AnalyticsNode(NamedTuple):
+    """
+    A named analytics output. `deps` maps keyword arguments of `func` to the
+    nodes that feed them, `tables` lists the input tables the node reads itself.
+    """
+    func: Callable[..., pd.DataFrame]
+    deps: Dict[str, str] = {}
+    tables: Tuple[str, ...] = ()
+
+def _raw_table(key: str) -> Callable[[Dict[str, pd.DataFrame]], pd.DataFrame]:
+    return lambda dfs: dfs.get(key, pd.DataFrame())
+
+ALL_TABLES = ("equipment", "rentals", "usage", "maintenance", "alerts", "financial", "ai", "sites")
+
+# Every output produced by run_all, in response order, with its dependencies.
+ANALYTICS_GRAPH: Dict[str, AnalyticsNode] = {
+    # CORE OUTPUTS
+    "equipment_data": AnalyticsNode(complete_equipment_profile, tables=ALL_TABLES),
+    "asset_dashboard": AnalyticsNode(asset_dashboard, deps={"profile": "equipment_data"}),
+    "alerts": AnalyticsNode(alerts, deps={
+        "overdue": "overdue_alerts",
+        "maint": "maintenance_alerts",
+        "anoms": "anomalies",
+        "rollback": "rollback_with_allocation",
+        "pred": "predictive_allocation",
+    }),
+
+    # INDIVIDUAL ANALYTICS
+    "usage_metrics": AnalyticsNode(usage_metrics, tables=("usage",)),
+    "overdue_alerts": AnalyticsNode(detect_overdue, tables=("rentals",)),
+    "maintenance_alerts": AnalyticsNode(maintenance_alerts, tables=("maintenance", "usage")),
+    "anomalies": AnalyticsNode(anomalies, deps={"profile": "equipment_data", "metrics": "usage_metrics"}),
+    "predictive_allocation": AnalyticsNode(predictive_allocation, tables=("ai", "equipment", "usage", "sites")),
+    "rollback_with_allocation": AnalyticsNode(rollback_with_allocation,
+                                              deps={"allocation": "predictive_allocation"},
+                                              tables=("rentals",)),
+
+    # RAW INPUT DATA (for flexibility)
+    "equipment_master": AnalyticsNode(_raw_table("equipment"), tables=("equipment",)),
+    "rental_transactions": AnalyticsNode(_raw_table("rentals"), tables=("rentals",)),
+    "usage_metrics_raw": AnalyticsNode(_raw_table("usage"), tables=("usage",)),
+    "maintenance_health": AnalyticsNode(_raw_table("maintenance"), tables=("maintenance",)),
+    "financial_data": AnalyticsNode(_raw_table("financial"), tables=("financial",)),
+    "alerts_notifications": AnalyticsNode(_raw_table("alerts"), tables=("alerts",)),
+    "ai_features": AnalyticsNode(_raw_table("ai"), tables=("ai",)),
+}
+
+def _check_outputs(names: Iterable[str]) -> List[str]:
+    names = list(names)
+    unknown = [n for n in names if n not in ANALYTICS_GRAPH]
+    if unknown:
+        raise ValueError(f"Unknown analytics output(s): {', '.join(unknown)}")
+    return names
+
+def dependency_closure(names: Iterable[str]) -> Set[str]:
+    """Returns the requested outputs plus every node they depend on."""
+    closure: Set[str] = set()
+    pending = _check_outputs(names)
+    while pending:
+        name = pending.pop()
+        if name not in closure:
+            closure.add(name)
+            pending.extend(ANALYTICS_GRAPH[name].deps.values())
+    return closure
+
+def required_tables(names: Iterable[str]) -> List[str]:
+    """Returns the input table keys needed to compute the requested outputs."""
+    needed = {t for n in dependency_closure(names) for t in ANALYTICS_GRAPH[n].tables}
+    return [t for t in ALL_TABLES if t in needed]
+
+class AnalyticsContext:
+    """
+    Evaluation context for a single data snapshot. Each node of ANALYTICS_GRAPH
+    is computed at most once and shared by every output that depends on it.
+    `timer(name)`, if given, is a context manager wrapped around each node's own
+    computation (dependencies are timed separately).
+    """
+    def __init__(self, dfs: Dict[str, pd.DataFrame],
+                 timer: Optional[Callable[[str], ContextManager]] = None):
+        self.dfs = dfs
+        self.timer = timer
+        self.results: Dict[str, pd.DataFrame] = {}
+
+    def get(self, name: str) -> pd.DataFrame:
+        if name not in self.results:
+            node = ANALYTICS_GRAPH[name]
+            kwargs = {arg: self.get(dep) for arg, dep in node.deps.items()}
+            with self.timer(name) if self.timer is not None else nullcontext():
+                self.results[name] = node.func(self.dfs, **kwargs)
+        return self.results[name]
+
+    def evaluate(self, names: Optional[Iterable[str]] = None) -> Dict[str, pd.DataFrame]:
+        names = list(ANALYTICS_GRAPH) if names is None else _check_outputs(names)
+        return {name: self.get(name) for name in names}
+
+def run_all(dfs: Dict[str, pd.DataFrame],
+            outputs: Optional[Iterable[str]] = None,
+            timer: Optional[Callable[[str], ContextManager]] = None) -> Dict[str, pd.DataFrame]:
     """
     Executes all analytics functions and returns a dictionary of resulting DataFrames.
     The main output 'equipment_data' contains the complete, unabridged profile for each asset.
+    Pass `outputs` to compute only those results (and their dependencies), and
+    `timer` to time each analytics function (see AnalyticsContext).
     """
-    # The complete equipment profile is now the central, most important result
-    complete_profile = complete_equipment_profile(dfs)
-    
-    # All other analytics are derived or supplementary
-    analytics_results = {
-        # CORE OUTPUTS
-        "equipment_data": complete_profile, # The main, complete profile
-        "asset_dashboard": asset_dashboard(dfs), # The summarized dashboard view
-        "alerts": alerts(dfs), # The final aggregated alert feed
-        
-        # INDIVIDUAL ANALYTICS
-        "usage_metrics": usage_metrics(dfs),
-        "overdue_alerts": detect_overdue(dfs),
-        "maintenance_alerts": maintenance_alerts(dfs),
-        "anomalies": anomalies(dfs),
-        "predictive_allocation": predictive_allocation(dfs),
-        "rollback_with_allocation": rollback_with_allocation(dfs),
-        
-        # RAW INPUT DATA (for flexibility)
-        "equipment_master": dfs.get("equipment", pd.DataFrame()),
-        "rental_transactions": dfs.get("rentals", pd.DataFrame()),
-        "usage_metrics_raw": dfs.get("usage", pd.DataFrame()),
-        "maintenance_health": dfs.get("maintenance", pd.DataFrame()),
-        "financial_data": dfs.get("financial", pd.DataFrame()),
-        "alerts_notifications": dfs.get("alerts", pd.DataFrame()),
-        "ai_features": dfs.get("ai", pd.DataFrame()),
-    }
-    
-    return analytics_results
+    return AnalyticsContext(dfs, timer).evaluate(outputs)
 
 if __name__ == "__main__":
+    import sqlite3
+    from dates import parse_iso_dates
+
     db_name = "equipment_management.db"
     conn = sqlite3.connect(db_name)
 
@@ -294,7 +777,7 @@ if __name__ == "__main__":
     for df_key, columns in date_columns_map.items():
         if not data_frames[df_key].empty:
             for col in columns:
-                data_frames[df_key][col] = pd.to_datetime(data_frames[df_key][col], errors='coerce')
+                data_frames[df_key][col] = parse_iso_dates(data_frames[df_key][col])
 
     # 3. Now, run the analysis with the complete set of data
     print("\nRunning all analytics...")
@@ -0,0 +1,72 @@
+import sys
+import numpy as np
+import pandas as pd
+
+from analytics_module import predictive_allocation
+from bench_analytics import EQUIPMENT_TYPES, measure, synthetic_fleet
+from geo import parse_coordinates
+
+
+def exact_match_allocation(dfs) -> pd.DataFrame:
+    """The previous predictive_allocation: the +20 bonus only goes to sites whose location text equals the asset's."""
+    located = dfs["equipment"].merge(dfs["usage"][["equipment_id", "location_coordinates"]], on="equipment_id")
+    merged = dfs["ai"].merge(located, on="equipment_id", how="left")
+    eq = pd.DataFrame({
+        "equipment_id": merged["equipment_id"],
+        "type": merged["type"].astype(object),
+        "location": merged["location_coordinates"].astype(object),
+        "score": merged["predicted_demand_score"],
+    })
+    sites = dfs["sites"].astype({"required_type": object, "location": object})
+    first_of_type = sites.drop_duplicates("required_type")
+    first_at_location = sites.drop_duplicates(["required_type", "location"])
+    first_at_location = first_at_location.assign(location_site=first_at_location["location"])
+    by_type = eq.merge(first_of_type, left_on="type", right_on="required_type", how="left", suffixes=("", "_site"))
+    by_location = eq.merge(first_at_location, left_on=["type", "location"], right_on=["required_type", "location"],
+                           how="left", indicator=True)
+    at_location = ((by_location["_merge"] == "both") & eq["score"].notna()).to_numpy()
+    return pd.DataFrame({
+        "equipment_id": eq["equipment_id"].to_numpy(),
+        "recommended_site_id": np.where(at_location, by_location["site_id"], by_type["site_id"]),
+    })
+
+
+def synthetic_sites(equipment: pd.DataFrame, usage: pd.DataFrame, sites: int, seed: int = 0) -> pd.DataFrame:
+    """`sites` sites over the fleet's area: half at an asset's last location, half anywhere in it."""
+    rng = np.random.default_rng(seed)
+    at_asset = rng.integers(0, len(equipment), sites // 2)
+    location = equipment.merge(usage, on="equipment_id", how="left")["location_coordinates"]
+    scattered = sites - len(at_asset)
+    return pd.DataFrame({
+        "site_id": pd.Series(np.arange(1, sites + 1)).map("SITE{:05d}".format),
+        "required_type": np.concatenate([equipment["type"].to_numpy()[at_asset],
+                                         rng.choice(EQUIPMENT_TYPES, scattered)]),
+        "location": np.concatenate([location.to_numpy()[at_asset],
+                                    [f"{lat:.4f},{lon:.4f}" for lat, lon in
+                                     zip(rng.uniform(13.0, 28.6, scattered), rng.uniform(77.2, 80.2, scattered))]]),
+    })
+
+
+def bench_allocation(equipment: int = 20000, sites: int = 5000, repeat: int = 3):
+    """Times exact-location allocation against nearest-site allocation over thousands of sites."""
+    tables = synthetic_fleet(equipment, 1, rentals_per_equipment=1)
+    dfs = {"ai": tables["AIFeatures"], "equipment": tables["EquipmentMaster"],
+           "usage": tables["UsageMetrics"].drop_duplicates("equipment_id", keep="last")}
+    dfs["sites"] = synthetic_sites(dfs["equipment"], dfs["usage"], sites)
+    # Coordinates are parsed once when tables are loaded, as main does
+    for table, col in (("usage", "location_coordinates"), ("sites", "location")):
+        dfs[table] = dfs[table].join(parse_coordinates(dfs[table][col]))
+
+    print(f"predictive_allocation for {equipment:,} assets over {sites:,} sites (best of {repeat})...")
+    before = measure(lambda: exact_match_allocation(dfs), repeat)["seconds"]
+    after = measure(lambda: predictive_allocation(dfs), repeat)["seconds"]
+    old, new = exact_match_allocation(dfs), predictive_allocation(dfs)
+    print(f"  - exact location match:  {before * 1000:8.1f} ms")
+    print(f"  - nearest site in range: {after * 1000:8.1f} ms")
+
+    moved = (old["recommended_site_id"] != new["recommended_site_id"]).sum()
+    print(f"  - {moved:,} assets now go to a nearer site than the first of their type")
+
+
+if __name__ == "__main__":
+    bench_allocation(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,375 @@
+"""
+Benchmarks the analytics on deterministic synthetic fleets.
+
+    python bench_analytics.py                         # 1k assets, 30 days of usage
+    python bench_analytics.py --equipment 100000 --days 365 --http
+    python bench_analytics.py --save-baseline         # record bench_baseline.json
+    python bench_analytics.py --threshold 0.25        # fail on >25% slowdowns
+
+Every public analytics function and run_all is timed on in-memory frames shaped
+like the ones fetch_data_from_db returns. With --http the fleet is also written
+to a SQLite file and each API endpoint is timed through the app with result
+caching disabled. Wall time is the best of --repeat runs; peak RSS is the
+highest resident set size sampled during a run, above the level at its start.
+Results are compared with the stored baseline for the same fleet size, and the
+script exits with status 1 when anything is slower, or grows RSS more, than the
+baseline by more than --threshold.
+
+Timings only compare on the kind of machine that recorded them. The checked-in
+bench_baseline.json is one developer machine's; re-record it with
+--save-baseline on the machine that runs the check. A baseline from a machine
+with another architecture or CPU count is reported as such and still fails the
+run on a regression unless --allow-foreign-baseline is given.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import analytics_module as am
+
+BASELINE_PATH = Path(__file__).resolve().parent / "bench_baseline.json"
+
+EQUIPMENT_TYPES = ["Excavator", "Bulldozer", "Crane", "Loader", "Grader"]
+JOB_TYPES = ["Road Construction", "Land Clearing", "Bridge Building", "Foundation Work", "Pipeline Work", "Demolition"]
+ALERT_TYPES = ["Maintenance Due", "Overdue Return", "Low Fuel", "Breakdown Alert", "None"]
+CONDITIONS = ["Good", "Needs Repair", "Critical"]
+
+FUNCTIONS: Dict[str, Callable[[Dict[str, pd.DataFrame]], object]] = {
+    "complete_equipment_profile": am.complete_equipment_profile,
+    "asset_dashboard": am.asset_dashboard,
+    "usage_metrics": am.usage_metrics,
+    "detect_overdue": am.detect_overdue,
+    "maintenance_alerts": am.maintenance_alerts,
+    "anomalies": am.anomalies,
+    "predictive_allocation": am.predictive_allocation,
+    "rollback_with_allocation": am.rollback_with_allocation,
+    "alerts": am.alerts,
+    "run_all": am.run_all,
+}
+
+ENDPOINTS = ["/run-all", "/asset-dashboard", "/usage-metrics", "/overdue-alerts", "/maintenance-alerts",
+             "/anomalies", "/predictive-allocation", "/rollback-allocation", "/alerts",
+             "/complete-equipment-profile"]
+
+
+def synthetic_fleet(equipment: int, days: int, rentals_per_equipment: int = 3,
+                    seed: int = 0) -> Dict[str, pd.DataFrame]:
+    """
+    Raw tables (keyed like TABLE_COLUMNS) for `equipment` assets with `days` daily
+    usage records each, ending today. The same arguments always give the same fleet,
+    apart from the dates shifting with today.
+    """
+    rng = np.random.default_rng(seed)
+    today = am._today()
+    start = today - pd.Timedelta(days=days)
+    n_sites = max(10, equipment // 100)
+    eq_index = np.arange(1, equipment + 1)
+    eq_ids = pd.Series(eq_index).map("EQ{:07d}".format)
+    sites = pd.Series(np.arange(1, n_sites + 1)).map("SITE{:05d}".format).to_numpy()
+    coords = pd.Series([f"{lat:.4f},{lon:.4f}" for lat, lon in
+                        zip(rng.uniform(13.0, 28.6, equipment), rng.uniform(77.2, 80.2, equipment))])
+
+    tables = {"EquipmentMaster": pd.DataFrame({
+        "equipment_id": eq_ids,
+        "type": rng.choice(EQUIPMENT_TYPES, equipment),
+        "qr_tag_id": pd.Series(eq_index).map("QR{:07d}".format),
+    })}
+
+    n = equipment * rentals_per_equipment
+    owner = np.repeat(np.arange(equipment), rentals_per_equipment)
+    check_out = start + pd.to_timedelta(rng.integers(0, max(days, 1), n), unit="D")
+    expected = check_out + pd.to_timedelta(rng.integers(10, 46, n), unit="D")
+    check_in = pd.Series(expected + pd.to_timedelta(rng.integers(-2, 6, n), unit="D"))
+    check_in[(rng.random(n) < 0.2) | (check_in > today).to_numpy()] = pd.NaT
+    tables["RentalTransactions"] = pd.DataFrame({
+        "transaction_id": np.arange(1, n + 1),
+        "equipment_id": eq_ids.to_numpy()[owner],
+        "site_id": rng.choice(sites, n),
+        "check_out_date": check_out,
+        "check_in_date": check_in,
+        "expected_return_date": expected,
+        "operator_id": pd.Series(rng.integers(1, max(equipment // 2, 2), n)).map("OP{:06d}".format),
+        "purpose_job_type": rng.choice(JOB_TYPES, n),
+    })
+
+    n = equipment * days
+    owner = np.repeat(np.arange(equipment), days)
+    engine = rng.uniform(0.0, 10.0, n).round(2)
+    tables["UsageMetrics"] = pd.DataFrame({
+        "usage_id": np.arange(1, n + 1),
+        "equipment_id": eq_ids.to_numpy()[owner],
+        "date": start + pd.to_timedelta(np.tile(np.arange(days), equipment), unit="D"),
+        "engine_hours_per_day": engine,
+        "idle_hours_per_day": rng.uniform(0.0, 4.0, n).round(2),
+        "operating_days": rng.integers(0, 2, n),
+        "fuel_consumption_per_day": (engine * 6.5).round(2),
+        "location_coordinates": coords.to_numpy()[owner],
+        "downtime_hours": rng.uniform(0.0, 2.0, n).round(2),
+    })
+
+    last_service = today - pd.to_timedelta(rng.integers(1, 365, equipment), unit="D")
+    tables["MaintenanceHealth"] = pd.DataFrame({
+        "record_id": eq_index,
+        "equipment_id": eq_ids,
+        "last_service_date": last_service,
+        "next_service_due": last_service + pd.Timedelta(days=90),
+        "breakdowns_reported": rng.integers(0, 4, equipment),
+        "condition_status": rng.choice(CONDITIONS, equipment),
+        "maintenance_costs": rng.uniform(500.0, 5000.0, equipment).round(2),
+    })
+
+    alert_type = rng.choice(ALERT_TYPES, equipment)
+    reminder = pd.Series(today - pd.to_timedelta(rng.integers(1, 10, equipment), unit="D"))
+    reminder[alert_type == "None"] = pd.NaT
+    tables["AlertsNotifications"] = pd.DataFrame({
+        "alert_id": eq_index,
+        "equipment_id": eq_ids,
+        "overdue_status": (alert_type == "Overdue Return").astype(int),
+        "reminder_sent_date": reminder,
+        "alert_type": alert_type,
+    })
+
+    rate = rng.uniform(100.0, 1000.0, equipment).round(2)
+    tables["FinancialData"] = pd.DataFrame({
+        "financial_id": eq_index,
+        "equipment_id": eq_ids,
+        "rental_rate_per_day": rate,
+        "total_rental_cost": (rate * rng.integers(10, 46, equipment)).round(2),
+        "penalty_cost": rng.uniform(0.0, 500.0, equipment).round(2),
+        "fuel_cost": rng.uniform(100.0, 2000.0, equipment).round(2),
+        "maintenance_cost": rng.uniform(50.0, 1500.0, equipment).round(2),
+    })
+
+    tables["AIFeatures"] = pd.DataFrame({
+        "ai_id": eq_index,
+        "equipment_id": eq_ids,
+        "utilization_rate": rng.uniform(0.0, 1.0, equipment).round(3),
+        "idle_ratio": rng.uniform(0.0, 0.5, equipment).round(3),
+        "predicted_demand_score": rng.uniform(0.0, 1.0, equipment).round(3),
+        "anomaly_flag": (rng.random(equipment) < 0.05).astype(int),
+        "recommended_site": rng.choice(sites, equipment),
+    })
+    return tables
+
+
+def write_fleet_db(tables: Dict[str, pd.DataFrame], path: str):
+    """Writes the fleet to a SQLite file, storing dates as ISO text like the real database."""
+    conn = sqlite3.connect(path)
+    try:
+        for table, df in tables.items():
+            df = df.copy()
+            for col in df.columns:
+                if pd.api.types.is_datetime64_any_dtype(df[col]):
+                    df[col] = df[col].dt.strftime("%Y-%m-%d").astype(object).where(df[col].notna(), None)
+            df.to_sql(table, conn, index=False, if_exists="replace", chunksize=100_000)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+class _RssSampler:
+    """Samples resident set size on a background thread while a call runs."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.start_rss = _rss_bytes()
+        self.peak = self.start_rss
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _rss_bytes())
+
+    def __enter__(self):
+        if self.start_rss is not None:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self.start_rss is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _rss_bytes())
+
+    @property
+    def growth(self) -> Optional[int]:
+        return None if self.start_rss is None else self.peak - self.start_rss
+
+
+def measure(func: Callable[[], object], repeat: int) -> Dict[str, Optional[float]]:
+    """Best wall time of `repeat` calls and the largest RSS growth seen during any of them."""
+    best, peak = float("inf"), None
+    for _ in range(repeat):
+        with _RssSampler() as rss:
+            start = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - start)
+        if rss.growth is not None:
+            peak = max(peak or 0, rss.growth)
+    return {"seconds": best, "peak_rss_bytes": peak}
+
+
+def _print_result(name: str, entry: dict):
+    rss = entry["peak_rss_bytes"]
+    rss_text = f", peak RSS +{rss / 2**20:.1f} MiB" if rss is not None else ""
+    print(f"  - {name}: {entry['seconds'] * 1000:.1f} ms{rss_text}")
+
+
+def bench_functions(tables: Dict[str, pd.DataFrame], repeat: int) -> Dict[str, dict]:
+    from main import TABLE_ALIASES, _parse_coordinates, compact_table
+    # Loaded as main loads them: compact dtypes and coordinates parsed once
+    dfs = {TABLE_ALIASES[table]: _parse_coordinates(compact_table(df, table), table) for table, df in tables.items()}
+    results = {}
+    for name, func in FUNCTIONS.items():
+        results[name] = measure(lambda: func(dfs), repeat)
+        _print_result(name, results[name])
+    return results
+
+
+def bench_endpoints(db_path: str, repeat: int) -> Dict[str, dict]:
+    """Times each endpoint against `db_path`; main must not have been imported yet."""
+    # Every request recomputes: no cached tables or results between runs
+    os.environ["EQUIPMENT_DB_PATH"] = db_path
+    os.environ["SNAPSHOT_CACHE_SIZE"] = "0"
+    from fastapi.testclient import TestClient
+    from main import app, db_pool
+    client = TestClient(app)
+    results = {}
+    try:
+        for endpoint in ENDPOINTS:
+            results[f"GET {endpoint}"] = measure(lambda: client.get(endpoint).raise_for_status(), repeat)
+            _print_result(f"GET {endpoint}", results[f"GET {endpoint}"])
+    finally:
+        db_pool.close()
+    return results
+
+
+def machine() -> Dict[str, object]:
+    """Identifies the kind of machine a run was timed on (not the host, so CI runners compare)."""
+    return {"machine": platform.machine(), "cpus": os.cpu_count()}
+
+
+def _regressed(before: Optional[float], after: Optional[float], threshold: float, min_delta: float) -> bool:
+    if before is None or after is None:
+        return False
+    return after > before * (1 + threshold) and after - before > min_delta
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float, min_delta: float,
+            min_rss_delta: int) -> bool:
+    """
+    Prints timings and peak RSS against the baseline and returns False if any is
+    higher by more than `threshold` (relative) and by more than `min_delta` seconds
+    or `min_rss_delta` bytes, which absorb timer and sampling noise on small calls.
+    """
+    ok = True
+    for name, entry in results.items():
+        if name not in baseline:
+            continue
+        before, after = baseline[name]["seconds"], entry["seconds"]
+        ratio = after / before if before > 0 else 1.0
+        slower = _regressed(before, after, threshold, min_delta)
+        rss_before, rss_after = baseline[name].get("peak_rss_bytes"), entry["peak_rss_bytes"]
+        larger = _regressed(rss_before, rss_after, threshold, min_rss_delta)
+        ok = ok and not (slower or larger)
+        status = "REGRESSION" if slower or larger else "ok"
+        rss_text = (f", peak RSS +{rss_before / 2**20:.1f} -> +{rss_after / 2**20:.1f} MiB"
+                    if rss_before is not None and rss_after is not None else "")
+        print(f"  - {name}: {before * 1000:.1f} ms -> {after * 1000:.1f} ms ({ratio:.2f}x){rss_text} {status}")
+    return ok
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--equipment", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=30, help="daily UsageMetrics rows per asset")
+    parser.add_argument("--rentals", type=int, default=3, help="rentals per asset")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--http", action="store_true", help="also time the API endpoints")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH))
+    # Run-to-run spread of small fleets on a busy machine is up to ~1.5x
+    parser.add_argument("--threshold", type=float, default=0.5, help="allowed slowdown or RSS growth, 0.5 = 50%%")
+    parser.add_argument("--min-delta", type=float, default=0.005,
+                        help="ignore slowdowns smaller than this many seconds")
+    parser.add_argument("--min-rss-delta", type=float, default=16,
+                        help="ignore peak RSS growth smaller than this many MiB")
+    parser.add_argument("--allow-foreign-baseline", action="store_true",
+                        help="report but do not fail on a baseline from another kind of machine")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--output", help="write results JSON here")
+    args = parser.parse_args(argv)
+
+    fleet_key = f"equipment={args.equipment},days={args.days},rentals={args.rentals},seed={args.seed}"
+    print(f"Generating synthetic fleet ({fleet_key})...")
+    start = time.perf_counter()
+    tables = synthetic_fleet(args.equipment, args.days, args.rentals, args.seed)
+    print(f"  {sum(len(df) for df in tables.values()):,} rows in {time.perf_counter() - start:.1f}s")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.http:
+            db_path = os.path.join(tmp, "fleet.db")
+            write_fleet_db(tables, db_path)
+            print("Timing API endpoints...")
+            results = bench_endpoints(db_path, args.repeat)
+        else:
+            results = {}
+        print("Timing analytics functions...")
+        results = {**bench_functions(tables, args.repeat), **results}
+
+    run = {
+        "fleet": fleet_key,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "machine": machine(),
+        "max_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        "results": results,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(run, indent=2) + "\n")
+
+    baseline_path = Path(args.baseline)
+    baselines = json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+    if args.save_baseline:
+        baselines[fleet_key] = run
+        baseline_path.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n")
+        print(f"Baseline for {fleet_key} saved to {baseline_path}")
+        return 0
+    if fleet_key not in baselines:
+        print(f"No baseline for {fleet_key} in {baseline_path}; run with --save-baseline to record one.")
+        return 0
+
+    baseline = baselines[fleet_key]
+    print(f"Comparing with baseline (threshold {args.threshold:.0%})...")
+    ok = compare(results, baseline["results"], args.threshold, args.min_delta, int(args.min_rss_delta * 2**20))
+    if baseline.get("machine") != run["machine"]:
+        print(f"Baseline was recorded on another kind of machine ({baseline.get('machine')}, this one is "
+              f"{run['machine']}); run with --save-baseline to record one here.")
+        if args.allow_foreign_baseline:
+            return 0
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+import sys
+import pandas as pd
+
+from analytics_module import _today, maintenance_alerts
+from bench_analytics import measure, synthetic_fleet
+
+
+def all_hours_maintenance_alerts(dfs, threshold_hours: int = 200, threshold_days: int = 180) -> pd.DataFrame:
+    """The previous maintenance_alerts: every engine hour ever logged counts towards the threshold."""
+    maint = dfs["maintenance"].copy()
+    usage = dfs["usage"].copy()
+
+    last_maint = maint.groupby("equipment_id", observed=True)["last_service_date"].max().reset_index()
+    merged = usage.merge(last_maint, on="equipment_id", how="left")
+    eng_hours = merged.groupby("equipment_id", observed=True)["engine_hours_per_day"].sum().reset_index()
+
+    alerts = last_maint.merge(eng_hours, on="equipment_id", how="left")
+    alerts["service_due_hours"] = alerts["engine_hours_per_day"] >= threshold_hours
+    alerts["service_due_days"] = alerts["last_service_date"].notna() & \
+                                 ((_today() - alerts["last_service_date"]).dt.days >= threshold_days)
+    alerts["service_alert"] = (alerts["service_due_hours"] | alerts["service_due_days"]).astype(int)
+    return alerts
+
+
+def bench_maintenance(equipment: int = 2000, days: int = 1095, repeat: int = 3, threshold_hours: int = 200):
+    """Times the all-hours maintenance_alerts against the since-last-service one on long usage histories."""
+    tables = synthetic_fleet(equipment, days, rentals_per_equipment=1)
+    dfs = {"maintenance": tables["MaintenanceHealth"], "usage": tables["UsageMetrics"]}
+    for df in dfs.values():
+        df["equipment_id"] = df["equipment_id"].astype("category")
+
+    print(f"maintenance_alerts on {equipment:,} assets x {days:,} days of usage (best of {repeat})...")
+    before = measure(lambda: all_hours_maintenance_alerts(dfs, threshold_hours), repeat)["seconds"]
+    after = measure(lambda: maintenance_alerts(dfs, threshold_hours), repeat)["seconds"]
+    old, new = all_hours_maintenance_alerts(dfs, threshold_hours), maintenance_alerts(dfs, threshold_hours)
+    print(f"  - all hours (merge + groupby): {before * 1000:8.1f} ms")
+    print(f"  - since last service:          {after * 1000:8.1f} ms  ({before / after:.1f}x)")
+
+    print(f"  - due by hours: {int(old['service_due_hours'].sum()):,} with all hours, "
+          f"{int(new['service_due_hours'].sum()):,} counting from the last service")
+    upcoming = new[~new["service_due_hours"] & new["hours_due_date"].notna()]
+    print(f"  - {len(upcoming):,} more projected to reach {threshold_hours} hours, "
+          f"the next on {upcoming['hours_due_date'].min():%Y-%m-%d}" if len(upcoming) else
+          "  - no further threshold crossings projected")
+
+
+if __name__ == "__main__":
+    bench_maintenance(*(int(arg) for arg in sys.argv[1:3]))
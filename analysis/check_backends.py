@@ -0,0 +1,101 @@
+import sqlite3
+import sys
+import pandas as pd
+from typing import Iterator, Tuple
+
+from analytics_module import complete_equipment_profile, detect_overdue, maintenance_alerts, usage_metrics
+from dates import parse_iso_dates
+from incremental import IncrementalAnalytics
+from main import DB_PATH, LATEST_TABLES, PROFILE_TABLES, TABLE_ALIASES, _read_latest, _read_table, _source_table
+from sql_backend import detect_overdue_sql, maintenance_alerts_sql, usage_metrics_sql, usage_window_metrics_sql
+
+
+def _check_window(dates: pd.Series):
+    """A window starting and ending mid-period, so the rollup plan has raw and weekly edges."""
+    days = dates.dropna().dt.normalize()
+    if days.empty:
+        return None, None
+    start, end = days.min() + pd.Timedelta(days=10), days.max() - pd.Timedelta(days=3)
+    return (start, end) if start < end else (days.min(), days.max() + pd.Timedelta(days=1))
+
+
+def _usage_in_window(dfs):
+    usage = dfs["usage"]
+    start, end = _check_window(usage["date"])
+    if start is None:
+        return usage_metrics(dfs)
+    day = usage["date"].dt.normalize()
+    return usage_metrics({"usage": usage[(day >= start) & (day < end)]})
+
+
+def _usage_window_sql(conn):
+    dates = parse_iso_dates(pd.read_sql_query("SELECT date FROM UsageMetrics", conn)["date"])
+    return usage_window_metrics_sql(conn, *_check_window(dates))
+
+
+def _profile_from_latest(conn):
+    dfs = {TABLE_ALIASES[_source_table(t)]: _read_latest(conn, t) if t in LATEST_TABLES else _read_table(conn, t)
+           for t in PROFILE_TABLES}
+    return complete_equipment_profile(dfs)
+
+
+# Pandas analytics, their equivalents on the other backends (called with a connection
+# and an incremental engine refreshed on it), and the tables the pandas side reads
+CHECKS = [
+    ("usage_metrics", usage_metrics, {
+        "sql": lambda conn, engine: usage_metrics_sql(conn),
+        "incremental": lambda conn, engine: engine.usage_metrics(),
+        "rollup": lambda conn, engine: usage_window_metrics_sql(conn),
+    }, ["UsageMetrics"]),
+    ("usage_metrics (date window)", _usage_in_window, {
+        "rollup": lambda conn, engine: _usage_window_sql(conn),
+    }, ["UsageMetrics"]),
+    ("detect_overdue", detect_overdue, {
+        "sql": lambda conn, engine: detect_overdue_sql(conn),
+    }, ["RentalTransactions"]),
+    ("maintenance_alerts", maintenance_alerts, {
+        "sql": lambda conn, engine: maintenance_alerts_sql(conn),
+        "incremental": lambda conn, engine: engine.maintenance_alerts(),
+    }, ["MaintenanceHealth", "UsageMetrics"]),
+    ("complete_equipment_profile", complete_equipment_profile, {
+        "latest": lambda conn, engine: _profile_from_latest(conn),
+    }, [_source_table(t) for t in PROFILE_TABLES]),
+]
+
+
+def backend_results(conn: sqlite3.Connection) -> Iterator[Tuple[str, str, pd.DataFrame, pd.DataFrame]]:
+    """(analytic, backend, pandas result, backend result) for every check in CHECKS."""
+    engine = IncrementalAnalytics(_read_table)
+    engine.refresh(conn)
+    for name, pandas_func, backends, tables in CHECKS:
+        dfs = {TABLE_ALIASES[t]: _read_table(conn, t) for t in tables}
+        expected = pandas_func(dfs).reset_index(drop=True)
+        for backend, func in backends.items():
+            yield name, backend, expected, func(conn, engine).reset_index(drop=True)
+
+
+def assert_same_result(expected: pd.DataFrame, actual: pd.DataFrame):
+    pd.testing.assert_frame_equal(expected, actual, check_dtype=False, rtol=1e-9)
+
+
+def check_backends(db_path: str) -> bool:
+    """Runs each analytic on every backend and reports whether the results match pandas."""
+    conn = sqlite3.connect(db_path)
+    all_match = True
+    try:
+        for name, backend, expected, actual in backend_results(conn):
+            try:
+                assert_same_result(expected, actual)
+                print(f"  - {name} [{backend}]: OK ({len(actual)} rows)")
+            except AssertionError as e:
+                all_match = False
+                print(f"  - {name} [{backend}]: MISMATCH\n{e}")
+    finally:
+        conn.close()
+    return all_match
+
+
+if __name__ == "__main__":
+    db_path = sys.argv[1] if len(sys.argv) > 1 else DB_PATH
+    print(f"Comparing pandas, SQL, incremental, rollup and latest-state backends on {db_path}...")
+    sys.exit(0 if check_backends(db_path) else 1)
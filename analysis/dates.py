@@ -0,0 +1,27 @@
+"""
+Date parsing for the ISO-8601 text columns in the database.
+
+Dates are written as ISO-8601 text: plain dates by dataset_preparation and full
+timestamps by the telemetry simulator. Parsing them with an explicit ISO8601
+format accepts both layouts regardless of which one comes first; format
+inference guesses from the first value and turns every row in another layout
+into NaT. Offsets are converted to UTC and dropped, as SQLite's julianday() does.
+
+Date columns repeat heavily (one value per day across the fleet), so each
+distinct string is parsed once and the results are scattered back by code.
+"""
+import numpy as np
+import pandas as pd
+
+ISO_FORMAT = "ISO8601"
+
+
+def parse_iso_dates(values: pd.Series) -> pd.Series:
+    """Parses ISO-8601 text to naive datetime64[ns]; missing or unparseable values become NaT."""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    codes, uniques = pd.factorize(values)
+    parsed = pd.to_datetime(pd.Series(uniques, dtype=object), format=ISO_FORMAT, errors="coerce", utc=True)
+    # Missing values have code -1, which picks the trailing NaT
+    parsed = np.append(parsed.dt.tz_localize(None).to_numpy(dtype="datetime64[ns]"), np.datetime64("NaT", "ns"))
+    return pd.Series(parsed[codes], index=values.index, name=values.name)
@@ -0,0 +1,129 @@
+import io
+import json
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Union
+
+from fastapi import HTTPException
+from fastapi.responses import Response
+
+# Optional fast paths (the "fast" extra): orjson for JSON, pyarrow for Arrow IPC streams
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+FORMATS = ("records", "columnar", "ndjson", "arrow")
+
+MEDIA_TYPES = {
+    "records": "application/json",
+    "columnar": "application/json",
+    "ndjson": "application/x-ndjson",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+Payload = Union[pd.DataFrame, Dict[str, Any]]
+
+
+def _default(obj):
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, pd.Timestamp):
+        return obj.isoformat()
+    return str(obj)
+
+
+def _dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default)
+    return json.dumps(obj, default=_default, separators=(",", ":")).encode()
+
+
+def _json_column(series: pd.Series) -> List[Any]:
+    """Column values as JSON-ready Python objects; NaN, NaT and NA become None."""
+    missing = series.isna()
+    if pd.api.types.is_datetime64_any_dtype(series):
+        has_fraction = bool((series.dt.microsecond[~missing] != 0).any())
+        text = series.dt.strftime("%Y-%m-%dT%H:%M:%S.%f" if has_fraction else "%Y-%m-%dT%H:%M:%S")
+        return text.astype(object).where(~missing, None).tolist()
+    if not missing.any() and series.dtype.kind in "biuf":
+        return series.tolist()
+    return series.astype(object).where(~missing, None).tolist()
+
+
+def frame_columns(df: pd.DataFrame) -> Dict[str, List[Any]]:
+    return {str(col): _json_column(df[col]) for col in df.columns}
+
+
+def frame_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    columns = frame_columns(df)
+    names = list(columns)
+    return [dict(zip(names, row)) for row in zip(*columns.values())]
+
+
+def _arrow_stream(df: pd.DataFrame) -> bytes:
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Object columns mixing value types have no Arrow equivalent; send them as text
+        mixed = {col: "string" for col in df.columns if df[col].dtype == object}
+        table = pa.Table.from_pandas(df.astype(mixed), preserve_index=False)
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def _to_json_ready(value, as_columns: bool):
+    if isinstance(value, pd.DataFrame):
+        return frame_columns(value) if as_columns else frame_records(value)
+    return value
+
+
+def encode(payload: Payload, fmt: str = "records") -> bytes:
+    """
+    Encodes a DataFrame, or a dict of DataFrames (as returned by run_all), to bytes:
+      records  - JSON array of row objects (the API's historical shape)
+      columnar - JSON object of column name -> list of values
+      ndjson   - one JSON row object per line; dict payloads add an "output" key
+      arrow    - Arrow IPC stream; dict payloads become a table of (output, stream)
+                 where each stream holds one output's own IPC stream
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format '{fmt}', expected one of {FORMATS}")
+
+    if fmt == "arrow":
+        if pa is None:
+            raise HTTPException(status_code=406, detail="Arrow format requires pyarrow to be installed")
+        if isinstance(payload, pd.DataFrame):
+            return _arrow_stream(payload)
+        frames = {k: v for k, v in payload.items() if isinstance(v, pd.DataFrame)}
+        return _arrow_stream(pd.DataFrame({
+            "output": list(frames),
+            "stream": [_arrow_stream(df) for df in frames.values()],
+        }))
+
+    if fmt == "ndjson":
+        if isinstance(payload, pd.DataFrame):
+            rows = frame_records(payload)
+        else:
+            rows = [{"output": name, **row}
+                    for name, value in payload.items() if isinstance(value, pd.DataFrame)
+                    for row in frame_records(value)]
+        return b"".join(_dumps(row) + b"\n" for row in rows)
+
+    as_columns = fmt == "columnar"
+    if isinstance(payload, pd.DataFrame):
+        return _dumps(_to_json_ready(payload, as_columns))
+    return _dumps({name: _to_json_ready(value, as_columns) for name, value in payload.items()})
+
+
+def encode_response(payload: Payload, fmt: str = "records") -> Response:
+    if fmt not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format '{fmt}', expected one of {FORMATS}")
+    return Response(content=encode(payload, fmt), media_type=MEDIA_TYPES[fmt])
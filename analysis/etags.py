@@ -0,0 +1,92 @@
+"""
+Conditional GET for the analysis endpoints.
+
+Every analytics response is a function of the database contents, today's date
+(overdue days, service windows) and the request path and query. ETagMiddleware
+hashes those into a strong ETag before the endpoint runs, so a request whose
+If-None-Match still matches is answered 304 Not Modified without loading a
+table or running an analytic. The tag also carries a per-process token:
+PRAGMA data_version is only comparable on one connection, so tags issued by
+another worker (or before a restart) never match and are simply refreshed.
+"""
+import hashlib
+import os
+import sqlite3
+import time
+from datetime import date
+from typing import Callable, Hashable, Iterable, Optional, Sequence
+from urllib.parse import parse_qsl
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.routing import BaseRoute, Match
+
+_PROCESS_TOKEN = f"{os.getpid()}-{time.time_ns()}"
+
+
+def make_etag(version: Hashable, path: str, query_string: bytes) -> str:
+    """Strong ETag for `path` with its query (parameter order ignored) at database `version`."""
+    query = sorted(parse_qsl(query_string.decode("latin-1"), keep_blank_values=True))
+    key = repr((_PROCESS_TOKEN, version, date.today().isoformat(), path, query))
+    return '"%s"' % hashlib.sha1(key.encode()).hexdigest()[:32]
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match uses the weak comparison, so W/ prefixes are ignored."""
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
+
+
+class ETagMiddleware:
+    """
+    ASGI middleware adding ETag and `Cache-Control: no-cache` (always revalidate)
+    to successful GET/HEAD responses, and answering 304 when If-None-Match
+    matches. `version()` is the database version stamp; paths in `exclude`
+    (counters, metrics, streams) change without the data and are left alone, as
+    are responses that set their own Cache-Control.
+    """
+
+    def __init__(self, app, version: Callable[[], Hashable], exclude: Sequence[str] = (),
+                 routes: Iterable[BaseRoute] = ()):
+        self.app = app
+        self.version = version
+        self.exclude = set(exclude)
+        self.routes = routes
+
+    def _route(self, scope) -> Optional[BaseRoute]:
+        for route in self.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD") or scope["path"] in self.exclude:
+            await self.app(scope, receive, send)
+            return
+        try:
+            etag = make_etag(self.version(), scope["path"], scope["query_string"])
+        except (OSError, sqlite3.Error):
+            # Database missing or unreadable; let the endpoint report it
+            await self.app(scope, receive, send)
+            return
+
+        if_none_match = Headers(scope=scope).get("if-none-match")
+        if if_none_match and etag_matches(if_none_match, etag):
+            route = self._route(scope)
+            if route is not None:
+                scope["route"] = route  # labels the request in the timing metrics
+            await send({"type": "http.response.start", "status": 304,
+                        "headers": [(b"etag", etag.encode()), (b"cache-control", b"no-cache")]})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        async def send_with_etag(message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                headers = MutableHeaders(scope=message)
+                # A response with its own caching policy (e.g. a stale precomputed result) is not tagged
+                if "cache-control" not in headers:
+                    headers["ETag"] = etag
+                    headers["Cache-Control"] = "no-cache"
+            await send(message)
+
+        await self.app(scope, receive, send_with_etag)
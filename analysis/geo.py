@@ -0,0 +1,226 @@
+"""
+Geocoordinates and nearest-site lookup.
+
+location_coordinates is text in the database ("lat,long", as the QR scanner and
+dataset_preparation write it) or a {"lat": .., "long": ..} object from the
+telemetry simulator, which may also arrive serialized. parse_coordinates turns
+either into float latitude/longitude, parsing each distinct value once.
+
+SiteIndex answers k-nearest queries by great-circle distance for a whole batch
+of points at once. Points are placed on the unit sphere and indexed by a k-d
+tree; the straight-line (chord) distance between two points orders them exactly
+like the haversine distance, so the search is exact without special cases at
+the poles or the antimeridian.
+"""
+import re
+from typing import Any, Tuple
+
+import numpy as np
+import pandas as pd
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Query points searched together; bounds the size of the intermediate arrays
+BATCH_QUERIES = 20_000
+
+_NUMBER = r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?"
+_PAIR = re.compile(rf"^\s*[(\[]?\s*({_NUMBER})\s*,\s*({_NUMBER})\s*[)\]]?\s*$")
+_LAT = re.compile(rf"""["']?lat(?:itude)?["']?\s*[:=]\s*({_NUMBER})""", re.IGNORECASE)
+_LON = re.compile(rf"""["']?(?:long|longitude|lon|lng)["']?\s*[:=]\s*({_NUMBER})""", re.IGNORECASE)
+
+
+def _parse_one(value: Any) -> Tuple[float, float]:
+    if isinstance(value, dict):
+        lat = value.get("lat", value.get("latitude"))
+        lon = next((value[key] for key in ("long", "longitude", "lon", "lng") if key in value), None)
+        try:
+            return float(lat), float(lon)
+        except (TypeError, ValueError):
+            return np.nan, np.nan
+    if not isinstance(value, str):
+        return np.nan, np.nan
+    pair = _PAIR.match(value)
+    if pair:
+        return float(pair.group(1)), float(pair.group(2))
+    lat, lon = _LAT.search(value), _LON.search(value)
+    if lat and lon:
+        return float(lat.group(1)), float(lon.group(1))
+    return np.nan, np.nan
+
+
+def parse_coordinates(values: pd.Series) -> pd.DataFrame:
+    """
+    Float `latitude` and `longitude` columns for `values`; missing, unparseable or
+    out-of-range coordinates become NaN.
+    """
+    try:
+        codes, uniques = pd.factorize(values)
+    except TypeError:
+        # dicts are unhashable; parse every value
+        codes, uniques = np.arange(len(values)), values.to_numpy(dtype=object)
+    uniques = pd.Series(np.asarray(uniques, dtype=object))
+    # "lat,long" text in one vectorized pass, anything else value by value
+    pairs = uniques.str.split(",", n=1, expand=True).reindex(columns=[0, 1])
+    parsed = np.column_stack([pd.to_numeric(pairs[i], errors="coerce").to_numpy(dtype=float) for i in (0, 1)])
+    other = np.flatnonzero(np.isnan(parsed).any(axis=1) & uniques.notna().to_numpy())
+    if len(other):
+        parsed[other] = [_parse_one(value) for value in uniques.iloc[other]]
+    # Missing values have code -1, which picks the trailing NaN pair
+    parsed = np.vstack([parsed, [np.nan, np.nan]])[codes]
+    parsed[(np.abs(parsed[:, 0]) > 90) | (np.abs(parsed[:, 1]) > 180)] = np.nan
+    return pd.DataFrame(parsed, index=values.index, columns=["latitude", "longitude"])
+
+
+def coordinates(df: pd.DataFrame, column: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Latitude and longitude arrays for the rows of `df`: its own latitude/longitude
+    columns when it has them, otherwise `column` parsed (all NaN if it is missing).
+    """
+    if "latitude" in df.columns and "longitude" in df.columns:
+        return (df["latitude"].to_numpy(dtype=float, na_value=np.nan),
+                df["longitude"].to_numpy(dtype=float, na_value=np.nan))
+    if column not in df.columns:
+        return np.full(len(df), np.nan), np.full(len(df), np.nan)
+    parsed = parse_coordinates(df[column])
+    return parsed["latitude"].to_numpy(), parsed["longitude"].to_numpy()
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Great-circle distance in km between points given in degrees (broadcasts like numpy)."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(x, dtype=float)) for x in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _unit_vectors(latitude: np.ndarray, longitude: np.ndarray) -> np.ndarray:
+    lat, lon = np.radians(latitude), np.radians(longitude)
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def _chord_to_km(chord: np.ndarray) -> np.ndarray:
+    km = 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(chord / 2, 0.0, 1.0))
+    return np.where(np.isinf(chord), np.inf, km)
+
+
+class SiteIndex:
+    """
+    k-d tree over site coordinates for batched k-nearest queries.
+
+    Each query descends to the leaf holding its position, whose k-th nearest site
+    bounds the answer; the tree is then walked level by level for all queries at
+    once, skipping every node whose bounding box is farther than that bound, and
+    the sites of the remaining leaves are ranked. Sites without coordinates are
+    never returned.
+    """
+
+    def __init__(self, latitude, longitude, leaf_size: int = 16):
+        latitude, longitude = np.asarray(latitude, dtype=float), np.asarray(longitude, dtype=float)
+        self.leaf_size = leaf_size
+        self.positions = np.flatnonzero(~(np.isnan(latitude) | np.isnan(longitude)))
+        points = _unit_vectors(latitude[self.positions], longitude[self.positions])
+
+        # Nodes cover the slice [start, stop) of the sites reordered by the tree
+        order = np.arange(len(points))
+        start, stop, low, high, axis, split, children = [], [], [], [], [], [], []
+        pending = [(0, len(points), None)] if len(points) else []
+        while pending:
+            lo, hi, parent = pending.pop()
+            node = len(start)
+            if parent is not None:
+                children[parent[0]][parent[1]] = node
+            box = points[order[lo:hi]]
+            start.append(lo), stop.append(hi), low.append(box.min(axis=0)), high.append(box.max(axis=0))
+            children.append([-1, -1])
+            if hi - lo <= leaf_size:
+                axis.append(0), split.append(0.0)
+                continue
+            dim = int(np.argmax(high[node] - low[node]))
+            mid = (lo + hi) // 2
+            order[lo:hi] = order[lo:hi][np.argpartition(box[:, dim], mid - lo)]
+            axis.append(dim), split.append(float(points[order[mid], dim]))
+            pending.append((lo, mid, (node, 0)))
+            pending.append((mid, hi, (node, 1)))
+
+        self.positions = self.positions[order]
+        self.points = points[order]
+        self._start, self._stop = np.array(start, dtype=np.int64), np.array(stop, dtype=np.int64)
+        self._low, self._high = np.array(low).reshape(-1, 3), np.array(high).reshape(-1, 3)
+        self._axis, self._split = np.array(axis, dtype=np.int64), np.array(split)
+        self._children = np.array(children, dtype=np.int64).reshape(-1, 2)
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def _sites(self, query: np.ndarray, leaf: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(query, site) pairs for every site of each (query, leaf) pair."""
+        counts = self._stop[leaf] - self._start[leaf]
+        first = np.repeat(np.cumsum(counts) - counts, counts)
+        site = np.repeat(self._start[leaf], counts) + np.arange(int(counts.sum())) - first
+        return np.repeat(query, counts), site
+
+    def _chords(self, points: np.ndarray, query: np.ndarray, site: np.ndarray) -> np.ndarray:
+        return np.linalg.norm(self.points[site] - points[query], axis=1)
+
+    def _leaf_bound(self, points: np.ndarray, k: int) -> np.ndarray:
+        """Chord distance to the k-th nearest site in each query's own leaf (inf if it has fewer)."""
+        node = np.zeros(len(points), dtype=np.int64)
+        inner = self._children[node, 0] >= 0
+        while inner.any():
+            right = points[inner, self._axis[node[inner]]] >= self._split[node[inner]]
+            node[inner] = self._children[node[inner], right.astype(np.int64)]
+            inner = self._children[node, 0] >= 0
+        if k > self.leaf_size:
+            return np.full(len(points), np.inf)
+        # Leaves hold at most leaf_size sites; pad each query's row with inf
+        site = self._start[node, None] + np.arange(self.leaf_size)
+        inside = site < self._stop[node, None]
+        chord = np.linalg.norm(self.points[np.where(inside, site, 0)] - points[:, None, :], axis=2)
+        return np.partition(np.where(inside, chord, np.inf), k - 1, axis=1)[:, k - 1]
+
+    def _nearest(self, points: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        bound = self._leaf_bound(points, k)
+        query, node = np.arange(len(points)), np.zeros(len(points), dtype=np.int64)
+        leaf_query, leaf_node = [], []
+        while len(query):
+            # Distance from each query to the node's bounding box
+            gap = np.maximum(np.maximum(self._low[node] - points[query], points[query] - self._high[node]), 0)
+            near = np.linalg.norm(gap, axis=1) <= bound[query]
+            query, node = query[near], node[near]
+            leaf = self._children[node, 0] < 0
+            leaf_query.append(query[leaf]), leaf_node.append(node[leaf])
+            query = np.repeat(query[~leaf], 2)
+            node = self._children[node[~leaf]].ravel()
+
+        query, site = self._sites(np.concatenate(leaf_query), np.concatenate(leaf_node))
+        chord = self._chords(points, query, site)
+        near = chord <= bound[query]
+        query, site, chord = query[near], site[near], chord[near]
+        # Nearest first, ties in site order
+        order = np.lexsort((self.positions[site], chord, query))
+        query, site, chord = query[order], site[order], chord[order]
+        rank = np.arange(len(query)) - np.searchsorted(query, query, side="left")
+        keep = rank < k
+        positions = np.full((len(points), k), -1, dtype=np.int64)
+        chords = np.full((len(points), k), np.inf)
+        positions[query[keep], rank[keep]] = self.positions[site[keep]]
+        chords[query[keep], rank[keep]] = chord[keep]
+        return positions, chords
+
+    def nearest(self, latitude, longitude, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        The `k` nearest sites to each query point, nearest first (ties in site order):
+        an (n, k) array of positions in the coordinates the index was built from,
+        padded with -1, and the matching haversine distances in km, padded with inf.
+        Queries without coordinates get no sites.
+        """
+        latitude, longitude = np.asarray(latitude, dtype=float), np.asarray(longitude, dtype=float)
+        positions = np.full((len(latitude), k), -1, dtype=np.int64)
+        distances = np.full((len(latitude), k), np.inf)
+        located = np.flatnonzero(~(np.isnan(latitude) | np.isnan(longitude)))
+        if not len(self) or not len(located) or k < 1:
+            return positions, distances
+        for i in range(0, len(located), BATCH_QUERIES):
+            batch = located[i:i + BATCH_QUERIES]
+            positions[batch], chords = self._nearest(_unit_vectors(latitude[batch], longitude[batch]), k)
+            distances[batch] = _chord_to_km(chords)
+        return positions, distances
@@ -0,0 +1,167 @@
+"""
+Incremental versions of usage_metrics and maintenance_alerts.
+
+Per-equipment aggregates are kept in memory and only rows above each table's
+high-water mark (its INTEGER PRIMARY KEY) are folded in on refresh, so the cost
+of a refresh follows the number of new rows rather than the table size.
+maintenance_alerts keeps the dated usage rows that can still count towards it:
+those after each equipment's last service or within the burn-rate window of its
+latest usage day. Both bounds only move forward, so older rows are dropped.
+Appends are the only change that can be folded. UPDATEs, DELETEs and inserts
+below the mark are detected through the TableRevisions counters maintained by
+triggers (migration 2 in dataset_preparation/migrate.py) and trigger a full
+rebuild. Without that table every refresh is a full rebuild.
+"""
+import sqlite3
+import threading
+import pandas as pd
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from analytics_module import (
+    BURN_RATE_DAYS,
+    _finish_maintenance_alerts,
+    _finish_usage_metrics,
+    _latest_per_equipment,
+    _service_hours,
+)
+
+# Tracked tables and their monotonically increasing row keys
+ROW_KEYS = {
+    "UsageMetrics": "usage_id",
+    "RentalTransactions": "transaction_id",
+    "MaintenanceHealth": "record_id",
+}
+
+HOUR_COLUMNS = ["engine_hours_per_day", "idle_hours_per_day", "total_hours"]
+SERVICE_USAGE_COLUMNS = ["equipment_id", "date", "engine_hours_per_day"]
+
+# read_rows(conn, table, key, after) -> rows of `table` with `key` > `after`, ordered by key
+RowReader = Callable[[sqlite3.Connection, str, str, int], pd.DataFrame]
+
+
+def _table_revisions(conn: sqlite3.Connection) -> Optional[Dict[str, int]]:
+    try:
+        return dict(conn.execute("SELECT table_name, revision FROM TableRevisions").fetchall())
+    except sqlite3.OperationalError:
+        return None
+
+
+def _fold_latest(current: Optional[pd.DataFrame], rows: pd.DataFrame, order_col: str) -> pd.DataFrame:
+    """Merges the latest-per-equipment rows of a new batch into `current`, keeping ties as they were."""
+    newest = _latest_per_equipment(rows, order_col)
+    if current is None or current.empty:
+        return newest
+    known = current[order_col].reindex(newest.index)
+    take = (~newest.index.isin(current.index) |
+            (newest[order_col] > known) |
+            (known.isna() & newest[order_col].notna()))
+    kept, added = current.drop(newest.index[take], errors="ignore"), newest[take]
+    if added.empty or kept.empty:
+        return kept if added.empty else added
+    return pd.concat([kept, added.astype(kept.dtypes.to_dict(), errors="ignore")])
+
+
+class IncrementalAnalytics:
+    """
+    Running per-equipment aggregates: engine/idle/total hours, latest rental,
+    latest usage record, latest service date and the usage rows since it. Call `refresh` with a connection
+    before reading results; it is safe to call from several threads.
+    """
+
+    def __init__(self, read_rows: RowReader):
+        self.read_rows = read_rows
+        self.full_rebuilds = 0
+        self.incremental_refreshes = 0
+        self.rows_folded = 0
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._marks = {table: 0 for table in ROW_KEYS}
+        self._revisions: Optional[Dict[str, int]] = None
+        self._source: Optional[Hashable] = None
+        self.hours = pd.DataFrame(columns=HOUR_COLUMNS, dtype="float64").rename_axis("equipment_id")
+        self.last_service = pd.Series(dtype="datetime64[ns]", name="last_service_date").rename_axis("equipment_id")
+        self.latest_rental: Optional[pd.DataFrame] = None
+        self.latest_usage: Optional[pd.DataFrame] = None
+        self.service_usage = pd.DataFrame(columns=SERVICE_USAGE_COLUMNS)
+
+    def refresh(self, conn: sqlite3.Connection, source: Optional[Hashable] = None) -> str:
+        """
+        Folds in rows added since the last refresh, or rebuilds from scratch when
+        history was rewritten or `source` (the database file identity) changed.
+        Returns "incremental" or "full".
+        """
+        with self._lock:
+            conn.execute("BEGIN")  # one consistent snapshot for revisions and rows
+            try:
+                revisions = _table_revisions(conn)
+                full = revisions is None or revisions != self._revisions or source != self._source
+                if full:
+                    self._reset()
+                for table, key in ROW_KEYS.items():
+                    rows = self.read_rows(conn, table, key, self._marks[table])
+                    if not rows.empty:
+                        self._fold(table, rows)
+                        self._marks[table] = int(rows[key].max())
+                        self.rows_folded += len(rows)
+                self._prune_service_usage()
+            finally:
+                conn.rollback()
+            self._revisions = revisions
+            self._source = source
+            if full:
+                self.full_rebuilds += 1
+            else:
+                self.incremental_refreshes += 1
+            return "full" if full else "incremental"
+
+    def _fold(self, table: str, rows: pd.DataFrame):
+        if table == "UsageMetrics":
+            rows = rows.assign(total_hours=rows["engine_hours_per_day"] + rows["idle_hours_per_day"])
+            batch = rows.groupby("equipment_id")[HOUR_COLUMNS].sum()
+            self.hours = self.hours.add(batch, fill_value=0).sort_index()
+            self.latest_usage = _fold_latest(self.latest_usage, rows.drop(columns="total_hours"), "date")
+            dated = rows.loc[rows["date"].notna(), SERVICE_USAGE_COLUMNS]
+            dated = dated.assign(date=dated["date"].dt.normalize())
+            self.service_usage = dated if self.service_usage.empty else pd.concat([self.service_usage, dated])
+        elif table == "RentalTransactions":
+            self.latest_rental = _fold_latest(self.latest_rental, rows, "check_out_date")
+        elif table == "MaintenanceHealth":
+            batch = rows.groupby("equipment_id")["last_service_date"].max()
+            self.last_service = pd.concat([self.last_service, batch]).groupby(level=0).max().rename("last_service_date")
+
+    def _prune_service_usage(self):
+        """Drops usage rows on or before both the last service day and the burn-rate window."""
+        usage = self.service_usage
+        if usage.empty:
+            return
+        service_day = usage["equipment_id"].map(self.last_service.dt.normalize())
+        window_start = usage.groupby("equipment_id", observed=True)["date"].transform("max") - \
+                       pd.Timedelta(days=BURN_RATE_DAYS)
+        spent = (usage["date"] <= service_day) & (usage["date"] <= window_start)
+        if spent.any():
+            self.service_usage = usage[~spent]
+
+    def usage_metrics(self) -> pd.DataFrame:
+        """Same result as analytics_module.usage_metrics on the refreshed snapshot."""
+        with self._lock:
+            metrics = self.hours.rename_axis("equipment_id").reset_index()
+        return _finish_usage_metrics(metrics)
+
+    def maintenance_alerts(self, threshold_hours: int = 200, threshold_days: int = 180) -> pd.DataFrame:
+        """Same result as analytics_module.maintenance_alerts (default burn rate) on the refreshed snapshot."""
+        with self._lock:
+            alerts = _service_hours(self.service_usage, self.last_service.rename_axis("equipment_id"),
+                                    threshold_hours)
+        return _finish_maintenance_alerts(alerts, threshold_hours, threshold_days)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "high_water_marks": dict(self._marks),
+            "revisions": self._revisions,
+            "full_rebuilds": self.full_rebuilds,
+            "incremental_refreshes": self.incremental_refreshes,
+            "rows_folded": self.rows_folded,
+            "service_usage_rows": len(self.service_usage),
+        }
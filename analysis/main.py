@@ -1,8 +1,17 @@
+import os
 import sqlite3
+import sys
+import time
+import tracemalloc
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from datetime import date
+from pathlib import Path
 import pandas as pd
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Dict
+from fastapi.responses import Response, StreamingResponse
+from typing import Callable, Dict, List, Optional, Tuple
 
 from analytics_module import (
     asset_dashboard,
@@ -14,15 +23,100 @@ from analytics_module import (
     rollback_with_allocation,
     alerts,
     complete_equipment_profile,
-    run_all
+    prioritize_alerts,
+    required_tables,
+    run_all,
+    select_equipment
+)
+import encoders
+from alert_stream import AlertStream
+from dates import parse_iso_dates
+from etags import ETagMiddleware
+from geo import parse_coordinates
+from incremental import IncrementalAnalytics
+from precompute import PrecomputeScheduler
+from profile_index import ProfileIndex
+from shared_snapshot import SharedSnapshot
+from snapshot_cache import SnapshotCache
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from common.sqlite_pool import SQLitePool
+from common.timing import install_timing, stage
+from sql_backend import (
+    BACKENDS,
+    detect_overdue_sql,
+    maintenance_alerts_sql,
+    usage_metrics_sql,
+    usage_window_metrics_sql,
+    usage_window_totals_sql,
+)
+
+DB_PATH = os.getenv(
+    "EQUIPMENT_DB_PATH",
+    "/Users/hardikchhallani/PycharmProjects/Smart-Rental-Tracking/dataset_preparation/equipment_management.db"
+)
+
+# Default execution backend for usage/overdue/maintenance analytics: "pandas", "sql",
+# "incremental" (usage and maintenance only) or "rollup" (usage only); analytics a
+# backend does not cover use pandas instead
+ANALYTICS_BACKEND = os.getenv("ANALYTICS_BACKEND", "pandas")
+
+# Shared read-only connections; set SQLITE_IMMUTABLE=1 only for database files nothing writes to
+db_pool = SQLitePool(
+    DB_PATH,
+    size=int(os.getenv("SQLITE_POOL_SIZE", "8")),
+    immutable=os.getenv("SQLITE_IMMUTABLE") == "1"
 )
 
-DB_PATH = "/Users/hardikchhallani/PycharmProjects/Smart-Rental-Tracking/dataset_preparation/equipment_management.db"
+# With several workers, set SHARED_SNAPSHOT_DIR (requires pyarrow) so tables are loaded
+# once, published as memory-mapped Arrow files and mapped by every worker;
+# SHARED_SNAPSHOT_PROFILE=1 publishes the complete equipment profile too
+SHARED_SNAPSHOT_DIR = os.getenv("SHARED_SNAPSHOT_DIR")
+SHARED_SNAPSHOT_PROFILE = os.getenv("SHARED_SNAPSHOT_PROFILE") == "1"
+shared_snapshot = SharedSnapshot(
+    SHARED_SNAPSHOT_DIR,
+    lambda: snapshot_cache.db_version(),
+    lambda: _snapshot_tables(),
+    poll=float(os.getenv("SHARED_SNAPSHOT_POLL", "1")),
+) if SHARED_SNAPSHOT_DIR else None
+
+# Loaded tables and analytics results, reused until the database (or shared snapshot) changes
+snapshot_cache = SnapshotCache(DB_PATH, max_entries=int(os.getenv("SNAPSHOT_CACHE_SIZE", "64")),
+                               generation=shared_snapshot.generation if shared_snapshot else None)
+
+# Per-asset profiles for single-equipment lookups, refreshed only for changed assets
+profile_index = ProfileIndex()
+
+# Set PRECOMPUTE=0 to compute analytics on the request thread only
+PRECOMPUTE = os.getenv("PRECOMPUTE", "1") == "1"
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if shared_snapshot is not None:
+        shared_snapshot.start()
+    if PRECOMPUTE:
+        precompute.start()
+    yield
+    precompute.stop()
+    if shared_snapshot is not None:
+        shared_snapshot.stop()
+
 
 app = FastAPI(
     title="Equipment Analytics API",
     description="Backend API for Equipment Rental Analytics, Predictive Allocation, Rollback, Maintenance & Alerts",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
+)
+
+# ETag on analytics responses; a matching If-None-Match is answered 304 before any work
+app.add_middleware(
+    ETagMiddleware,
+    version=snapshot_cache.version,
+    exclude=["/alerts/stream", "/cache-stats", "/db-pool-stats", "/memory-report",
+             "/complete-equipment-profile/stats", "/metrics"],
+    routes=app.router.routes,
 )
 
 # Enable CORS
@@ -32,8 +126,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "X-Result-Age", "X-Result-Stale"],
 )
 
+# Server-Timing header on every response and Prometheus histograms at /metrics
+install_timing(app)
+
 
 # Table-to-column mapping to enforce correct schema
 TABLE_COLUMNS = {
@@ -66,9 +164,15 @@ TABLE_COLUMNS = {
     "AIFeatures": [
         "ai_id", "equipment_id", "utilization_rate",
         "idle_ratio", "predicted_demand_score", "anomaly_flag", "recommended_site"
+    ],
+    "Sites": [
+        "site_id", "required_type", "location"
     ]
 }
 
+# Tables a database may not have; they load as empty frames with their columns
+OPTIONAL_TABLES = {"Sites"}
+
 TABLE_ALIASES = {
     "RentalTransactions": "rentals",
     "EquipmentMaster": "equipment",
@@ -76,9 +180,24 @@ TABLE_ALIASES = {
     "MaintenanceHealth": "maintenance",
     "AlertsNotifications": "alerts",
     "FinancialData": "financial",
-    "AIFeatures": "ai"
+    "AIFeatures": "ai",
+    "Sites": "sites"
+}
+ALIAS_TABLES = {alias: table for table, alias in TABLE_ALIASES.items()}
+
+# Latest-state tables (migration 5 in dataset_preparation/migrate.py) holding the key of
+# each equipment's latest record, kept current by triggers; loaded as their source table
+# narrowed to those records, or as the whole source table in databases without them
+LATEST_TABLES = {
+    "LatestRental": ("RentalTransactions", "transaction_id"),
+    "LatestUsage": ("UsageMetrics", "usage_id"),
 }
 
+# Tables feeding complete_equipment_profile, which only reads each equipment's latest
+# rental and usage record
+PROFILE_TABLES = ["LatestRental", "EquipmentMaster", "LatestUsage", "AlertsNotifications",
+                  "AIFeatures", "MaintenanceHealth", "FinancialData"]
+
 # Explicit date columns for conversion
 DATE_COLS = {
     "RentalTransactions": ["check_out_date", "check_in_date", "expected_return_date"],
@@ -87,24 +206,271 @@ DATE_COLS = {
     "AlertsNotifications": ["reminder_sent_date"]
 }
 
+# Coordinate text parsed into float latitude/longitude columns at load (see geo.parse_coordinates)
+COORDINATE_COLS = {
+    "UsageMetrics": "location_coordinates",
+    "Sites": "location",
+}
+
+# Compact in-memory dtypes applied to loaded tables: categoricals for repeated text,
+# nullable Int8 for 0/1 flags (still serialized as 1/0) and "integer" for columns
+# downcast to the smallest integer type that holds them. Floats stay float64 so
+# sums and serialized values are unchanged.
+COMPACT_DTYPES = {
+    "EquipmentMaster": {"equipment_id": "category", "type": "category"},
+    "RentalTransactions": {"transaction_id": "integer", "equipment_id": "category", "site_id": "category",
+                           "operator_id": "category", "purpose_job_type": "category"},
+    "UsageMetrics": {"usage_id": "integer", "equipment_id": "category", "operating_days": "integer",
+                     "location_coordinates": "category"},
+    "MaintenanceHealth": {"record_id": "integer", "equipment_id": "category", "breakdowns_reported": "integer",
+                          "condition_status": "category"},
+    "AlertsNotifications": {"alert_id": "integer", "equipment_id": "category", "overdue_status": "Int8",
+                            "alert_type": "category"},
+    "FinancialData": {"financial_id": "integer", "equipment_id": "category"},
+    "AIFeatures": {"ai_id": "integer", "equipment_id": "category", "anomaly_flag": "Int8",
+                   "recommended_site": "category"},
+}
+
+# Set COMPACT_DTYPES=0 to keep tables exactly as read
+COMPACT_TABLES = os.getenv("COMPACT_DTYPES", "1") == "1"
+
+def _read_table(conn: sqlite3.Connection, table: str,
+                key: Optional[str] = None, after: Optional[int] = None) -> pd.DataFrame:
+    """Reads `table`, or only its rows whose `key` is above `after` (in key order)."""
+    cols = ", ".join(TABLE_COLUMNS[table])
+    if table in OPTIONAL_TABLES and not _table_exists(conn, table):
+        df = pd.DataFrame(columns=TABLE_COLUMNS[table])
+    elif key is None:
+        df = pd.read_sql_query(f"SELECT {cols} FROM {table}", conn)
+    else:
+        df = pd.read_sql_query(f"SELECT {cols} FROM {table} WHERE {key} > ? ORDER BY {key}", conn, params=(after,))
+    return _parse_coordinates(_parse_dates(df, table), table)
+
+
+def _table_exists(conn: sqlite3.Connection, table: str) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone() is not None
+
+
+def _read_latest(conn: sqlite3.Connection, table: str) -> pd.DataFrame:
+    """
+    The source rows referenced by latest-state `table`, in key order, so reducing them
+    per equipment picks the same records as reducing the whole source table.
+    """
+    source, key = LATEST_TABLES[table]
+    if not _table_exists(conn, table):
+        return _read_table(conn, source)
+    cols = ", ".join(f"s.{col}" for col in TABLE_COLUMNS[source])
+    df = pd.read_sql_query(f"SELECT {cols} FROM {table} l JOIN {source} s ON s.{key} = l.{key} ORDER BY s.{key}",
+                           conn)
+    return _parse_coordinates(_parse_dates(df, source), source)
+
+
+def _parse_dates(df: pd.DataFrame, table: str) -> pd.DataFrame:
+    # Convert date columns to datetime where needed
+    if table in DATE_COLS:
+        for col in DATE_COLS[table]:
+            if col in df.columns:
+                df[col] = parse_iso_dates(df[col])
+    return df
+
+
+def _parse_coordinates(df: pd.DataFrame, table: str) -> pd.DataFrame:
+    # Add float latitude/longitude parsed from the table's coordinate text
+    col = COORDINATE_COLS.get(table)
+    if col in df.columns:
+        df[["latitude", "longitude"]] = parse_coordinates(df[col])
+    return df
+
+
+def compact_table(df: pd.DataFrame, table: str) -> pd.DataFrame:
+    """Applies COMPACT_DTYPES to a loaded table; columns that do not fit their type are left alone."""
+    df = df.copy()
+    for col, dtype in COMPACT_DTYPES.get(table, {}).items():
+        if col not in df.columns:
+            continue
+        if dtype == "integer":
+            if pd.api.types.is_integer_dtype(df[col]):
+                df[col] = pd.to_numeric(df[col], downcast="integer")
+            continue
+        try:
+            df[col] = df[col].astype(dtype)
+        except (TypeError, ValueError):
+            pass
+    return df
+
+
+def _source_table(table: str) -> str:
+    return LATEST_TABLES[table][0] if table in LATEST_TABLES else table
+
+
+def _load_table(conn: sqlite3.Connection, table: str) -> pd.DataFrame:
+    df = _read_latest(conn, table) if table in LATEST_TABLES else _read_table(conn, table)
+    return compact_table(df, _source_table(table)) if COMPACT_TABLES else df
+
+
+def _snapshot_tables() -> Dict[str, pd.DataFrame]:
+    """Every table (and optionally the profile) as published to the shared snapshot."""
+    tables = db_pool.map(lambda table: db_pool.run(_load_table, table, label=f"table_load:{table}"),
+                         list(TABLE_COLUMNS) + list(LATEST_TABLES))
+    if SHARED_SNAPSHOT_PROFILE:
+        tables["profile"] = complete_equipment_profile(
+            {TABLE_ALIASES[_source_table(table)]: tables[table] for table in PROFILE_TABLES})
+    return tables
+
+
+def _mapped_or_loaded(table: str) -> pd.DataFrame:
+    df = shared_snapshot.table(table) if shared_snapshot is not None else None
+    return df if df is not None else db_pool.run(_load_table, table, label=f"table_load:{table}")
+
+
 def fetch_data_from_db(tables: list) -> Dict[str, pd.DataFrame]:
+    """
+    Returns the requested tables, keyed by alias (a latest-state table by its source's).
+    Tables are mapped from the shared snapshot when one is published; otherwise those not
+    cached for the current database version are read concurrently, each on its own
+    pooled read-only connection.
+    """
+    try:
+        with stage("db_fetch"):
+            version = snapshot_cache.version()
+
+            def load(table):
+                return snapshot_cache.get(("table", table), lambda: _mapped_or_loaded(table), version)
+
+            loaded = db_pool.map(load, tables)
+        return {TABLE_ALIASES[_source_table(table)]: df for table, df in loaded.items()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+# When the analytics result behind the current response was computed (time.monotonic)
+# and whether it is stale; reported by encode_response
+_result_source: ContextVar[Optional[Tuple[float, bool]]] = ContextVar("result_source", default=None)
+
+
+def cached_result(key: tuple, tables: list, compute):
+    """
+    Returns `compute(dfs)` for the current database snapshot, reusing the cached
+    result while the database is unchanged. Results are shared; do not mutate them.
+    A computed result is timed as the stage named by `key[0]`.
+    """
     try:
-        conn = sqlite3.connect(DB_PATH)
-        dfs = {}
-        for table in tables:
-            cols = ", ".join(TABLE_COLUMNS[table])
-            df = pd.read_sql_query(f"SELECT {cols} FROM {table}", conn)
-
-            # Convert date columns to datetime where needed
-            if table in DATE_COLS:
-                for col in DATE_COLS[table]:
-                    if col in df.columns:
-                        df[col] = pd.to_datetime(df[col], errors="coerce")
-
-            dfs[TABLE_ALIASES[table]] = df
-
-        conn.close()
-        return dfs
+        version = snapshot_cache.version()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    # Overdue days and service windows are relative to today, so results expire daily
+    key = key + (date.today().isoformat(),)
+
+    def load():
+        started = time.monotonic()
+        dfs = fetch_data_from_db(tables)
+        with stage(key[0]):
+            return compute(dfs), started
+
+    result, computed_at = snapshot_cache.get(key, load, version)
+    _result_source.set((computed_at, False))
+    return result
+
+
+def _stamp():
+    return snapshot_cache.version(), date.today().isoformat()
+
+
+def _precompute_all() -> Dict[str, pd.DataFrame]:
+    dfs = fetch_data_from_db(list(TABLE_COLUMNS))
+    with stage("precompute"):
+        return run_all(dfs)
+
+
+# Every run_all output, recomputed in the background after the database changes
+precompute = PrecomputeScheduler(
+    _stamp,
+    _precompute_all,
+    debounce=float(os.getenv("PRECOMPUTE_DEBOUNCE", "2")),
+    interval=float(os.getenv("PRECOMPUTE_INTERVAL", "0")),
+    max_staleness=float(os.getenv("PRECOMPUTE_MAX_STALENESS", "30")),
+    poll=float(os.getenv("PRECOMPUTE_POLL", "1")),
+)
+
+
+def precomputed_result(select: Callable[[Dict[str, pd.DataFrame]], encoders.Payload],
+                       key: tuple, tables: list, compute):
+    """
+    `select(results)` on the latest precomputed run_all outputs when they are current
+    or were superseded less than PRECOMPUTE_MAX_STALENESS seconds ago, otherwise
+    cached_result(key, tables, compute).
+    """
+    try:
+        served = precompute.latest(_stamp())
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    if served is None:
+        return cached_result(key, tables, compute)
+    materialized, stale = served
+    _result_source.set((materialized.computed_at, stale))
+    return select(materialized.results)
+
+
+def encode_response(payload: encoders.Payload, fmt: str = "records") -> Response:
+    """
+    encoders.encode_response, timed as the `encode` stage. `X-Result-Age` gives the
+    seconds since the result was computed; a stale precomputed result is marked with
+    `X-Result-Stale: 1` and `Cache-Control: no-store`, so it is never revalidated.
+    """
+    with stage("encode"):
+        response = encoders.encode_response(payload, fmt)
+    source = _result_source.get()
+    if source is not None:
+        computed_at, stale = source
+        response.headers["X-Result-Age"] = f"{time.monotonic() - computed_at:.3f}"
+        if stale:
+            response.headers["X-Result-Stale"] = "1"
+            response.headers["Cache-Control"] = "no-store"
+    return response
+
+
+# Running aggregates behind backend=incremental
+incremental_engine = IncrementalAnalytics(_read_table)
+
+ANALYTICS_BACKENDS = BACKENDS + ("incremental", "rollup")
+
+
+def _resolve_backend(backend: Optional[str]) -> str:
+    backend = backend or ANALYTICS_BACKEND
+    if backend not in ANALYTICS_BACKENDS:
+        raise HTTPException(status_code=400,
+                            detail=f"Unknown backend '{backend}', expected one of {ANALYTICS_BACKENDS}")
+    return backend
+
+
+def run_incremental() -> IncrementalAnalytics:
+    """Folds rows added since the last call into the incremental engine."""
+    try:
+        source = snapshot_cache.version()[:2]  # file identity; a replaced file starts over
+        db_pool.run(incremental_engine.refresh, source, label="incremental_refresh")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    return incremental_engine
+
+
+# Allocation places each asset at the location of its latest usage record
+ALLOCATION_TABLES = ["AIFeatures", "EquipmentMaster", "LatestUsage", "Sites"]
+
+ALERT_TABLES = ["RentalTransactions", "EquipmentMaster", "UsageMetrics", "MaintenanceHealth", "AIFeatures", "Sites"]
+
+# Alert deltas behind /alerts/stream, checked every ALERT_STREAM_INTERVAL seconds while anyone listens
+alert_stream = AlertStream(
+    _stamp,
+    lambda: cached_result(("alerts", False), ALERT_TABLES, lambda dfs: alerts(dfs, prioritize=False)),
+    interval=float(os.getenv("ALERT_STREAM_INTERVAL", "5")),
+    buffer_size=int(os.getenv("ALERT_STREAM_BUFFER", "256")),
+)
+
+
+def run_pushdown(query_func, *args):
+    """Runs one of the sql_backend analytics on a pooled connection."""
+    try:
+        return db_pool.run(query_func, *args, label=f"pushdown:{query_func.__name__}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
@@ -115,100 +481,337 @@ def root():
 
 
 @app.get("/run-all")
-def run_all_analysis():
+def run_all_analysis(outputs: Optional[str] = None, fmt: str = Query("records", alias="format")):
+    """
+    Runs every analytics output, or only the comma-separated `outputs`
+    (e.g. `?outputs=alerts,usage_metrics`) and the tables they depend on.
+    Like every analytics endpoint, `?format=records|columnar|ndjson|arrow`
+    selects the response encoding (see encoders.encode).
+    """
     print("=== Run All Analysis API Called ===")
-    tables = list(TABLE_COLUMNS.keys())
-    dfs = fetch_data_from_db(tables)
-    print(f"Tables loaded: {tables}")
-    print(f"Dataframes loaded: {list(dfs.keys())}")
-    
-    results = run_all(dfs)
+    names = _split(outputs) if outputs is not None else None
+    if names == []:
+        raise HTTPException(status_code=400, detail="outputs must name at least one analytics output")
+    if names is None:
+        tables = list(TABLE_COLUMNS.keys())
+    else:
+        try:
+            tables = [ALIAS_TABLES[alias] for alias in required_tables(names)]
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    print(f"Tables required: {tables}")
+
+    results = precomputed_result(lambda results: results if names is None else {n: results[n] for n in names},
+                                 ("run_all", tuple(names) if names is not None else None), tables,
+                                 lambda dfs: run_all(dfs, outputs=names, timer=stage))
     print(f"Results keys: {list(results.keys())}")
     
-    # Convert all dataframes to records
-    response = {}
-    for k, v in results.items():
-        if isinstance(v, pd.DataFrame):
-            response[k] = v.to_dict(orient="records")
-        else:
-            response[k] = v
-    
-    return response
+    return encode_response(results, fmt)
 
 
 # -------------------------------------
 # Individual Endpoints (no db_path input)
 # -------------------------------------
 
+def _split(value: Optional[str]) -> List[str]:
+    return [item.strip() for item in value.split(",") if item.strip()] if value else []
+
+
+def _complete_profile(dfs: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """The unfiltered profile, mapped from the shared snapshot when it was published with one."""
+    profile = shared_snapshot.table("profile") if shared_snapshot is not None else None
+    return profile if profile is not None else complete_equipment_profile(dfs)
+
+
+def profile_page(fmt: str, limit: Optional[int], cursor: Optional[str], fields: Optional[str],
+                 filters: Dict[str, Optional[str]]):
+    """
+    Complete equipment profile, optionally filtered, paginated and projected.
+    Filters take comma-separated values and are applied before the profile join.
+    Pages are ordered by equipment_id; when more rows follow, the `X-Next-Cursor`
+    response header holds the cursor for the next page.
+    """
+    filters = {col: _split(values) for col, values in filters.items() if values}
+    columns = _split(fields)
+
+    if not filters and limit is None and cursor is None:
+        result, next_cursor = precomputed_result(lambda results: results["equipment_data"],
+                                                 ("complete_equipment_profile",), PROFILE_TABLES,
+                                                 _complete_profile), None
+    else:
+        def compute(dfs):
+            # One extra row tells whether another page follows
+            selected = select_equipment(dfs, filters, after=cursor, limit=None if limit is None else limit + 1)
+            more = limit is not None and len(selected) > limit
+            page = complete_equipment_profile(dfs, equipment=selected.head(limit) if more else selected)
+            return page, str(page["equipment_id"].iloc[-1]) if more else None
+
+        key = ("complete_equipment_profile", tuple(sorted((col, tuple(v)) for col, v in filters.items())),
+               cursor, limit)
+        result, next_cursor = cached_result(key, PROFILE_TABLES, compute)
+
+    if columns:
+        unknown = [col for col in columns if col not in result.columns]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown field(s) {unknown}")
+        result = result[columns]
+
+    response = encode_response(result, fmt)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return result, response
+
+
 @app.get("/asset-dashboard")
-def get_asset_dashboard():
+def get_asset_dashboard(fmt: str = Query("records", alias="format"),
+                        limit: Optional[int] = Query(None, ge=1), cursor: Optional[str] = None,
+                        fields: Optional[str] = None, status: Optional[str] = None,
+                        site_id: Optional[str] = None, type_: Optional[str] = Query(None, alias="type"),
+                        alert_type: Optional[str] = None):
+    """
+    Complete equipment profile; see profile_page for `limit`, `cursor`, `fields`
+    and the `status`, `site_id`, `type` and `alert_type` filters.
+    """
     print("=== Asset Dashboard API Called ===")
-    dfs = fetch_data_from_db(["RentalTransactions", "EquipmentMaster", "UsageMetrics", "AlertsNotifications", "AIFeatures", "MaintenanceHealth", "FinancialData"])
-    print(f"Dataframes loaded: {list(dfs.keys())}")
-    print(f"Alerts dataframe shape: {dfs['alerts'].shape if 'alerts' in dfs else 'Not found'}")
-    result = complete_equipment_profile(dfs)  # Use complete profile instead of basic asset_dashboard
+    # Use complete profile instead of basic asset_dashboard
+    result, response = profile_page(fmt, limit, cursor, fields,
+                                    {"status": status, "site_id": site_id, "type": type_, "alert_type": alert_type})
     print(f"Result shape: {result.shape}")
     print(f"Result columns: {list(result.columns)}")
     print(f"Alert fields present: {'alert_type' in result.columns}, {'overdue_status' in result.columns}, {'anomaly_flag' in result.columns}")
-    return result.to_dict(orient="records")
+    return response
+
+
+def _usage_window(start: Optional[date], end: Optional[date]):
+    """The half-open [start, end) window for an inclusive start..end date range."""
+    if start is not None and end is not None and end < start:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    return (None if start is None else pd.Timestamp(start),
+            None if end is None else pd.Timestamp(end) + pd.Timedelta(days=1))
 
 
 @app.get("/usage-metrics")
-def get_usage_metrics():
-    dfs = fetch_data_from_db(["UsageMetrics"])
-    result = usage_metrics(dfs)
-    return result.to_dict(orient="records")
+def get_usage_metrics(backend: Optional[str] = None, fmt: str = Query("records", alias="format"),
+                      start: Optional[date] = None, end: Optional[date] = None):
+    """
+    Per-equipment usage totals and utilization. `start`/`end` (inclusive ISO dates)
+    restrict it to a date range; ranges and `backend=rollup` are answered from the
+    weekly/monthly usage rollups, reading raw rows only for partial periods.
+    """
+    backend = _resolve_backend(backend)
+    if start is not None or end is not None or backend == "rollup":
+        window = _usage_window(start, end)
+        result = cached_result(("usage_metrics", "rollup", window), [],
+                               lambda _: run_pushdown(usage_window_metrics_sql, *window))
+    elif backend == "sql":
+        result = cached_result(("usage_metrics", backend), [], lambda _: run_pushdown(usage_metrics_sql))
+    elif backend == "incremental":
+        result = cached_result(("usage_metrics", backend), [], lambda _: run_incremental().usage_metrics())
+    else:
+        result = precomputed_result(lambda results: results["usage_metrics"],
+                                    ("usage_metrics", backend), ["UsageMetrics"], usage_metrics)
+    return encode_response(result, fmt)
+
+
+@app.get("/usage-totals")
+def get_usage_totals(start: Optional[date] = None, end: Optional[date] = None,
+                     fmt: str = Query("records", alias="format")):
+    """
+    Per-equipment sums of engine, idle, total and downtime hours, fuel, operating
+    days and usage rows between the inclusive `start`/`end` dates (whole history
+    by default), answered from the usage rollups.
+    """
+    window = _usage_window(start, end)
+    result = cached_result(("usage_totals", window), [], lambda _: run_pushdown(usage_window_totals_sql, *window))
+    return encode_response(result, fmt)
 
 
 @app.get("/overdue-alerts")
-def get_overdue_alerts():
-    dfs = fetch_data_from_db(["RentalTransactions"])
-    result = detect_overdue(dfs)
-    return result.to_dict(orient="records")
+def get_overdue_alerts(backend: Optional[str] = None, fmt: str = Query("records", alias="format")):
+    backend = _resolve_backend(backend)
+    if backend == "sql":
+        result = cached_result(("detect_overdue", backend), [], lambda _: run_pushdown(detect_overdue_sql))
+    else:
+        result = precomputed_result(lambda results: results["overdue_alerts"],
+                                    ("detect_overdue", backend), ["RentalTransactions"], detect_overdue)
+    return encode_response(result, fmt)
 
 
 @app.get("/maintenance-alerts")
-def get_maintenance_alerts():
-    dfs = fetch_data_from_db(["MaintenanceHealth", "UsageMetrics"])
-    result = maintenance_alerts(dfs)
-    return result.to_dict(orient="records")
+def get_maintenance_alerts(backend: Optional[str] = None, fmt: str = Query("records", alias="format")):
+    backend = _resolve_backend(backend)
+    if backend == "sql":
+        result = cached_result(("maintenance_alerts", backend), [], lambda _: run_pushdown(maintenance_alerts_sql))
+    elif backend == "incremental":
+        result = cached_result(("maintenance_alerts", backend), [],
+                               lambda _: run_incremental().maintenance_alerts())
+    else:
+        result = precomputed_result(lambda results: results["maintenance_alerts"],
+                                    ("maintenance_alerts", backend), ["MaintenanceHealth", "UsageMetrics"],
+                                    maintenance_alerts)
+    return encode_response(result, fmt)
 
 
 @app.get("/anomalies")
-def get_anomalies():
-    dfs = fetch_data_from_db(["RentalTransactions", "EquipmentMaster", "UsageMetrics"])
-    result = anomalies(dfs)
-    return result.to_dict(orient="records")
+def get_anomalies(fmt: str = Query("records", alias="format")):
+    result = precomputed_result(lambda results: results["anomalies"],
+                                ("anomalies",), ["RentalTransactions", "EquipmentMaster", "UsageMetrics"], anomalies)
+    return encode_response(result, fmt)
 
 
 @app.get("/predictive-allocation")
-def get_predictive_allocation():
-    dfs = fetch_data_from_db(["AIFeatures", "EquipmentMaster"])
-    result = predictive_allocation(dfs)
-    return result.to_dict(orient="records")
+def get_predictive_allocation(fmt: str = Query("records", alias="format")):
+    result = precomputed_result(lambda results: results["predictive_allocation"],
+                                ("predictive_allocation",), ALLOCATION_TABLES, predictive_allocation)
+    return encode_response(result, fmt)
 
 
 @app.get("/rollback-allocation")
-def get_rollback_allocation():
-    dfs = fetch_data_from_db(["RentalTransactions", "AIFeatures", "EquipmentMaster"])
-    result = rollback_with_allocation(dfs)
-    return result.to_dict(orient="records")
+def get_rollback_allocation(fmt: str = Query("records", alias="format")):
+    result = precomputed_result(lambda results: results["rollback_with_allocation"],
+                                ("rollback_with_allocation",), ["RentalTransactions"] + ALLOCATION_TABLES,
+                                rollback_with_allocation)
+    return encode_response(result, fmt)
 
 
 @app.get("/alerts")
-def get_alerts():
-    dfs = fetch_data_from_db(
-        ["RentalTransactions", "EquipmentMaster", "UsageMetrics", "MaintenanceHealth", "AIFeatures"]
-    )
-    result = alerts(dfs)
-    return result.to_dict(orient="records")
+def get_alerts(prioritize: bool = False, limit: Optional[int] = Query(None, ge=1),
+               fmt: str = Query("records", alias="format")):
+    """
+    Returns the aggregated alert feed. `prioritize=true` adds a `priority`
+    column and orders the feed by it, so `limit` returns the top N alerts.
+    """
+    result = precomputed_result(
+        lambda results: prioritize_alerts(results["alerts"]) if prioritize else results["alerts"],
+        ("alerts", prioritize), ALERT_TABLES, lambda dfs: alerts(dfs, prioritize=prioritize))
+    if limit is not None:
+        result = result.head(limit)
+    return encode_response(result, fmt)
+
+
+@app.get("/alerts/stream")
+async def stream_alerts(last_event_id: Optional[str] = Header(None)):
+    """
+    Server-sent events for the alert feed: a `snapshot` event with every alert,
+    then a `delta` event with the new, changed and resolved alerts each time the
+    feed changes. EventSource reconnects with Last-Event-ID and receives only the
+    deltas it missed. All subscribers share one feed computation per change.
+    """
+    await alert_stream.update()
+    return StreamingResponse(alert_stream.subscribe(last_event_id), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 
 @app.get("/complete-equipment-profile")
-def get_complete_equipment_profile():
-    dfs = fetch_data_from_db(["RentalTransactions", "EquipmentMaster", "UsageMetrics", "AlertsNotifications", "AIFeatures", "MaintenanceHealth", "FinancialData"])
-    result = complete_equipment_profile(dfs)
-    return result.to_dict(orient="records")
+def get_complete_equipment_profile(fmt: str = Query("records", alias="format"),
+                                   limit: Optional[int] = Query(None, ge=1), cursor: Optional[str] = None,
+                                   fields: Optional[str] = None, status: Optional[str] = None,
+                                   site_id: Optional[str] = None, type_: Optional[str] = Query(None, alias="type"),
+                                   alert_type: Optional[str] = None):
+    """Same parameters as /asset-dashboard (see profile_page)."""
+    _, response = profile_page(fmt, limit, cursor, fields,
+                               {"status": status, "site_id": site_id, "type": type_, "alert_type": alert_type})
+    return response
+
+
+def _current_profile_index() -> ProfileIndex:
+    try:
+        version = snapshot_cache.version()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    day = date.today().isoformat()
+    if not profile_index.is_current(version, day):
+        dfs = fetch_data_from_db(PROFILE_TABLES)
+        with stage("profile_index_refresh"):
+            profile_index.refresh(dfs, version, day)
+    return profile_index
+
+
+@app.get("/equipment/{equipment_id}")
+def get_equipment(equipment_id: str):
+    """Complete profile of one asset, served from the in-memory profile index."""
+    profile = _current_profile_index().get(equipment_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"Equipment '{equipment_id}' not found")
+    return Response(content=profile, media_type="application/json")
+
+
+@app.get("/equipment/by-qr/{qr_tag_id}")
+def get_equipment_by_qr(qr_tag_id: str):
+    """Complete profile of the asset carrying QR tag `qr_tag_id`."""
+    profile = _current_profile_index().get_by_qr(qr_tag_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"No equipment with QR tag '{qr_tag_id}'")
+    return Response(content=profile, media_type="application/json")
+
+
+@app.get("/complete-equipment-profile/stats")
+def get_complete_equipment_profile_stats():
+    """Row counts, frame sizes and traced peak memory for each profile-building stage."""
+    dfs = fetch_data_from_db(PROFILE_TABLES)
+    stats = []
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        complete_equipment_profile(dfs, stats=stats)
+    finally:
+        if started:
+            tracemalloc.stop()
+    return stats
+
+
+def _frame_bytes(value) -> Optional[int]:
+    return int(value.memory_usage(deep=True).sum()) if isinstance(value, pd.DataFrame) else None
+
+
+@app.get("/memory-report")
+def get_memory_report():
+    """
+    Bytes per loaded table and per analytics result, with the tables as read
+    ("plain") and after COMPACT_DTYPES ("compact"). Reloads and recomputes
+    everything, so it is meant for diagnostics only.
+    """
+    try:
+        plain = db_pool.map(lambda table: db_pool.run(_read_table, table), list(TABLE_COLUMNS))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    compact = {table: compact_table(df, table) for table, df in plain.items()}
+
+    plain_results = run_all({TABLE_ALIASES[t]: df for t, df in plain.items()})
+    compact_results = run_all({TABLE_ALIASES[t]: df for t, df in compact.items()})
+
+    def report(before: Dict[str, pd.DataFrame], after: Dict[str, pd.DataFrame]):
+        entries = {name: {"plain_bytes": _frame_bytes(before[name]), "compact_bytes": _frame_bytes(after[name])}
+                   for name in before}
+        total_plain = sum(e["plain_bytes"] or 0 for e in entries.values())
+        total_compact = sum(e["compact_bytes"] or 0 for e in entries.values())
+        return {"items": entries, "plain_bytes": total_plain, "compact_bytes": total_compact}
+
+    return {
+        "compact_dtypes_enabled": COMPACT_TABLES,
+        "tables": report(plain, compact),
+        "results": report(plain_results, compact_results),
+    }
+
+
+@app.get("/cache-stats")
+def get_cache_stats():
+    """
+    Hit/miss counters and size of the snapshot cache, plus profile index, incremental
+    engine, alert stream, precompute scheduler and shared snapshot counters.
+    """
+    return {**snapshot_cache.stats(), "profile_index": profile_index.stats(),
+            "incremental": incremental_engine.stats(), "alert_stream": alert_stream.stats(),
+            "precompute": precompute.stats(),
+            "shared_snapshot": shared_snapshot.stats() if shared_snapshot is not None else None}
+
+
+@app.get("/db-pool-stats")
+def get_db_pool_stats():
+    """Connection pool occupancy, pool-wait and per-table load latencies."""
+    return db_pool.metrics()
 
 
 if __name__ == "__main__":
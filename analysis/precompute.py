@@ -0,0 +1,143 @@
+"""
+Background precomputation of the analytics outputs.
+
+A PrecomputeScheduler thread polls the database version and recomputes every
+run_all output once the version has been stable for `debounce` seconds (or has
+kept changing for `max_staleness` seconds), and optionally every `interval`
+seconds regardless. Each completed run is kept in memory with the version stamp
+it was computed from, so endpoints answer from it without computing on the
+request thread. A result whose version has been superseded is still served for
+up to `max_staleness` seconds while the next run completes; after that callers
+fall back to computing synchronously.
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, NamedTuple, Optional, Tuple
+
+
+class Materialized(NamedTuple):
+    """One completed run: the stamp it was computed at, when it started (time.monotonic) and its outputs."""
+    stamp: Hashable
+    computed_at: float
+    results: Dict[str, Any]
+
+
+class PrecomputeScheduler:
+    """
+    Keeps the latest Materialized run of `compute()` for the stamp returned by
+    `stamp()` (database version and day). Use `latest` to read it; `start` runs
+    the polling thread, `run_pending` one poll of it.
+    """
+
+    def __init__(self, stamp: Callable[[], Hashable], compute: Callable[[], Dict[str, Any]],
+                 debounce: float = 2.0, interval: float = 0.0, max_staleness: float = 30.0, poll: float = 1.0):
+        self.stamp = stamp
+        self.compute = compute
+        self.debounce = debounce
+        self.interval = interval
+        self.max_staleness = max_staleness
+        self.poll = poll
+        self.computations = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+        self.last_duration: Optional[float] = None
+        self._latest: Optional[Materialized] = None
+        self._stamp: Optional[Hashable] = None  # last stamp observed, and since when
+        self._stamp_since = 0.0
+        self._superseded_at: Optional[float] = None  # when a newer stamp than the latest run's was first seen
+        self._computing: Optional[Hashable] = None
+        self._diverged_at: Optional[float] = None  # same, for the run in progress
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _observe(self, stamp: Hashable, now: float):
+        if stamp != self._stamp:
+            self._stamp, self._stamp_since = stamp, now
+        if self._latest is not None and stamp != self._latest.stamp and self._superseded_at is None:
+            self._superseded_at = now
+        if self._computing is not None and stamp != self._computing and self._diverged_at is None:
+            self._diverged_at = now
+
+    def latest(self, stamp: Hashable) -> Optional[Tuple[Materialized, bool]]:
+        """
+        The latest run and whether it is stale, if it was computed at `stamp` or was
+        superseded less than `max_staleness` seconds ago; otherwise None.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._observe(stamp, now)
+            if self._latest is None:
+                return None
+            if self._latest.stamp == stamp:
+                return self._latest, False
+            if now - self._superseded_at < self.max_staleness:
+                return self._latest, True
+            return None
+
+    def _due(self, stamp: Hashable, now: float) -> bool:
+        if self._latest is None:
+            return True
+        if stamp != self._latest.stamp:
+            # Wait for writes to settle, but not past the staleness bound
+            return now - self._stamp_since >= self.debounce or now - self._superseded_at >= self.max_staleness
+        return self.interval > 0 and now - self._latest.computed_at >= self.interval
+
+    def run_pending(self) -> bool:
+        """Recomputes if the stamp moved (debounced) or the interval elapsed. Returns whether it did."""
+        stamp = self.stamp()
+        started = time.monotonic()
+        with self._lock:
+            self._observe(stamp, started)
+            if not self._due(stamp, started):
+                return False
+            self._computing, self._diverged_at = stamp, None
+        try:
+            results = self.compute()
+        finally:
+            with self._lock:
+                self._computing = None
+        with self._lock:
+            self._latest = Materialized(stamp, started, results)
+            self._superseded_at = self._diverged_at
+            self.computations += 1
+            self.last_duration = time.monotonic() - started
+        return True
+
+    def _run(self):
+        while True:
+            try:
+                self.run_pending()
+            except Exception as e:
+                # e.g. database briefly unavailable; retried on the next poll
+                self.errors += 1
+                self.last_error = str(e)
+            if self._stop.wait(self.poll):
+                return
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="precompute", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            latest = self._latest
+            return {
+                "running": self._thread is not None and self._thread.is_alive(),
+                "computations": self.computations,
+                "errors": self.errors,
+                "last_error": self.last_error,
+                "last_duration_ms": None if self.last_duration is None else round(self.last_duration * 1000, 3),
+                "result_age_seconds": None if latest is None else round(now - latest.computed_at, 3),
+                "stale_seconds": None if self._superseded_at is None else round(now - self._superseded_at, 3),
+                "computing": self._computing is not None,
+            }
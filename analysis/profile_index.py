@@ -0,0 +1,99 @@
+import threading
+import pandas as pd
+from typing import Any, Dict, Hashable, Optional
+
+from analytics_module import PROFILE_TABLES, complete_equipment_profile
+from encoders import _dumps, frame_records
+
+# Tables whose rows feed a profile: the equipment master plus every table folded into it
+INDEXED_TABLES = ["equipment"] + [name for name, _ in PROFILE_TABLES]
+
+
+def _fingerprints(dfs: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    One content hash per equipment_id and table. Row hashes are combined with the
+    row's position within its equipment, so reordered duplicates count as a change.
+    """
+    columns = {}
+    for name in INDEXED_TABLES:
+        df = dfs.get(name)
+        if df is None or df.empty:
+            continue
+        ids = df["equipment_id"]
+        hashed = pd.util.hash_pandas_object(df.assign(_position=ids.groupby(ids, observed=True).cumcount()), index=False)
+        columns[name] = hashed.groupby(ids.to_numpy()).sum()
+    return pd.DataFrame(columns).fillna(0).astype("uint64")
+
+
+class ProfileIndex:
+    """
+    Complete equipment profiles pre-encoded as JSON, keyed by equipment_id and qr_tag_id.
+
+    `refresh` compares per-equipment fingerprints of every source table with the
+    previous snapshot and rebuilds only the profiles whose rows changed. Profiles
+    also depend on today's date through `status`, so a new day rebuilds everything.
+    Lookups are plain dict reads of already encoded bytes.
+    """
+
+    def __init__(self):
+        self.version: Optional[Hashable] = None
+        self.full_rebuilds = 0
+        self.refreshed_assets = 0
+        self._day: Optional[str] = None
+        self._fingerprints: Optional[pd.DataFrame] = None
+        self._by_id: Dict[str, bytes] = {}
+        self._by_qr: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def refresh(self, dfs: Dict[str, pd.DataFrame], version: Hashable, day: str):
+        """Brings the index up to date with `dfs`, the tables of database `version`."""
+        with self._lock:
+            if version == self.version and day == self._day:
+                return
+            fingerprints = _fingerprints(dfs)
+            equipment = dfs["equipment"]
+            equipment = equipment[equipment["equipment_id"].notna()]
+
+            if self._fingerprints is None or day != self._day:
+                by_id = {}
+                changed = equipment
+                self.full_rebuilds += 1
+            else:
+                columns = fingerprints.columns.union(self._fingerprints.columns)
+                previous = self._fingerprints.reindex(index=fingerprints.index, columns=columns)
+                differs = (previous != fingerprints.reindex(columns=columns, fill_value=0)).any(axis=1)
+                current = set(equipment["equipment_id"].astype(str))
+                by_id = {key: value for key, value in self._by_id.items() if key in current}
+                changed = equipment[equipment["equipment_id"].isin(differs.index[differs])]
+
+            if not changed.empty:
+                profile = complete_equipment_profile(dfs, equipment=changed)
+                for record in frame_records(profile):
+                    by_id[str(record["equipment_id"])] = _dumps(record)
+                self.refreshed_assets += len(profile)
+
+            qr = equipment[equipment["qr_tag_id"].notna()].drop_duplicates("qr_tag_id")
+            self._by_qr = dict(zip(qr["qr_tag_id"].astype(str), qr["equipment_id"].astype(str)))
+            self._by_id = by_id
+            self._fingerprints = fingerprints
+            self.version = version
+            self._day = day
+
+    def is_current(self, version: Hashable, day: str) -> bool:
+        return version == self.version and day == self._day
+
+    def get(self, equipment_id: str) -> Optional[bytes]:
+        return self._by_id.get(equipment_id)
+
+    def get_by_qr(self, qr_tag_id: str) -> Optional[bytes]:
+        equipment_id = self._by_qr.get(qr_tag_id)
+        return None if equipment_id is None else self._by_id.get(equipment_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "assets": len(self._by_id),
+            "qr_tags": len(self._by_qr),
+            "full_rebuilds": self.full_rebuilds,
+            "refreshed_assets": self.refreshed_assets,
+            "version": list(self.version) if self.version else None,
+        }
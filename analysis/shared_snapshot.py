@@ -0,0 +1,238 @@
+"""
+Loaded tables shared between uvicorn workers through memory-mapped Arrow files.
+
+One worker at a time (whoever holds the publisher lock in the snapshot
+directory) watches the database and, when it changes, writes every typed table
+to a new generation directory of uncompressed Arrow IPC (Feather v2) files, then
+points CURRENT at it with an atomic rename. Every worker maps the tables of the
+current generation: numeric and datetime columns are numpy views of the mapped
+file, so the data lives once in the page cache however many workers read it.
+Only text and categorical columns are materialized per process, and compact
+dtypes keep those to the categories.
+
+After a database change, workers keep reading the previous generation until the
+publisher has written the next one (within `poll` seconds plus the write); the
+generation is part of the snapshot cache version, so nothing computed from the
+previous one outlives the swap.
+
+Mapped arrays are read-only; like every cached table they must not be mutated.
+"""
+import fcntl
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+POINTER = "CURRENT"
+LOCK = "publisher.lock"
+
+# How each column is stored, recorded in the file's schema metadata:
+#   numpy    - plain numeric/bool array without nulls (NaN stays a value), mapped zero-copy
+#   datetime - datetime64[ns] stored as its int64 view (NaT as the minimum), mapped zero-copy
+#   arrow    - anything else, converted by pyarrow and restored to the recorded dtype
+_KINDS_KEY = b"shared_snapshot.kinds"
+
+
+def _column(series: pd.Series) -> Tuple[str, Any]:
+    dtype = series.dtype
+    if isinstance(dtype, np.dtype) and dtype.kind in "biuf":
+        return "numpy", pa.array(series.to_numpy(), from_pandas=False)
+    if isinstance(dtype, np.dtype) and dtype == np.dtype("datetime64[ns]"):
+        return "datetime", pa.array(series.to_numpy().view("int64"), from_pandas=False)
+    return "arrow", pa.Array.from_pandas(series)
+
+
+def write_table(df: pd.DataFrame, path: str):
+    """Writes `df` (index dropped) as a single-batch Arrow IPC file."""
+    kinds, arrays = {}, []
+    for name in df.columns:
+        kind, array = _column(df[name])
+        kinds[name] = [kind, str(df[name].dtype)]
+        arrays.append(array)
+    table = pa.Table.from_arrays(arrays, names=[str(name) for name in df.columns],
+                                 metadata={_KINDS_KEY: json.dumps(kinds).encode()})
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def read_table(path: str) -> pd.DataFrame:
+    """Maps a file written by write_table; numpy and datetime columns share the mapping."""
+    table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+    kinds = json.loads(table.schema.metadata[_KINDS_KEY])
+    columns = {}
+    for name, (kind, dtype) in kinds.items():
+        array = table.column(name).combine_chunks()
+        if kind == "numpy":
+            columns[name] = array.to_numpy(zero_copy_only=True)
+        elif kind == "datetime":
+            columns[name] = array.to_numpy(zero_copy_only=True).view("datetime64[ns]")
+        else:
+            values = array.to_pandas()
+            columns[name] = values if str(values.dtype) == dtype else values.astype(dtype)
+    return pd.DataFrame(columns, copy=False)
+
+
+class SharedSnapshot:
+    """
+    Publisher and reader of the table snapshots in `directory`.
+
+    `stamp()` is the database version as seen by this process and `load()` returns
+    the tables to publish, by name. `start` runs a thread that tries to become the
+    publisher every `poll` seconds and, once it is, publishes whenever the stamp
+    changes. `generation()` and `table()` read the published snapshot.
+    """
+
+    def __init__(self, directory: str, stamp: Callable[[], Hashable], load: Callable[[], Dict[str, pd.DataFrame]],
+                 poll: float = 1.0, keep: int = 2):
+        if pa is None:
+            raise RuntimeError("Shared snapshots require pyarrow to be installed")
+        self.directory = directory
+        self.stamp = stamp
+        self.load = load
+        self.poll = poll
+        self.keep = keep
+        self.publications = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+        self._publisher_lock = None  # open lock file while this process publishes
+        self._published: Optional[Hashable] = None
+        self._pointer: Optional[Tuple[int, int]] = None  # (inode, mtime_ns) of CURRENT when read
+        self._generation: Optional[str] = None
+        self._tables: Dict[str, pd.DataFrame] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        os.makedirs(directory, exist_ok=True)
+
+    # Reading
+
+    def generation(self) -> Optional[str]:
+        """The published generation, re-read when CURRENT was replaced; None before the first one."""
+        path = os.path.join(self.directory, POINTER)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            if (st.st_ino, st.st_mtime_ns) != self._pointer:
+                with open(path) as f:
+                    generation = f.read().strip()
+                if generation != self._generation:
+                    # Swap in the new generation; frames mapped from the old one stay valid
+                    self._generation, self._tables = generation, {}
+                self._pointer = (st.st_ino, st.st_mtime_ns)
+            return self._generation
+
+    def table(self, name: str) -> Optional[pd.DataFrame]:
+        """Table `name` of the current generation, mapped on first use; None if it was not published."""
+        generation = self.generation()
+        if generation is None:
+            return None
+        with self._lock:
+            if generation == self._generation and name in self._tables:
+                return self._tables[name]
+        path = os.path.join(self.directory, generation, f"{name}.arrow")
+        try:
+            df = read_table(path)
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            if generation == self._generation:
+                self._tables[name] = df
+        return df
+
+    # Publishing
+
+    def _try_lock(self) -> bool:
+        if self._publisher_lock is None:
+            f = open(os.path.join(self.directory, LOCK), "w")
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                f.close()
+                return False
+            self._publisher_lock = f
+        return True
+
+    def publish(self, tables: Dict[str, pd.DataFrame]) -> str:
+        """Writes `tables` as a new generation, points CURRENT at it and removes older ones."""
+        generation = f"g{time.time_ns():x}"
+        staging = os.path.join(self.directory, f".{generation}")
+        os.makedirs(staging)
+        for name, df in tables.items():
+            try:
+                write_table(df, os.path.join(staging, f"{name}.arrow"))
+            except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+                continue  # not representable (e.g. mixed-type objects); readers load it themselves
+        os.rename(staging, os.path.join(self.directory, generation))
+        pointer = os.path.join(self.directory, f".{POINTER}.{generation}")
+        with open(pointer, "w") as f:
+            f.write(generation)
+        os.replace(pointer, os.path.join(self.directory, POINTER))
+
+        # Generation names sort by creation time; mapped files survive their removal
+        generations = sorted(name for name in os.listdir(self.directory) if name.startswith("g"))
+        for old in generations[:-self.keep]:
+            shutil.rmtree(os.path.join(self.directory, old), ignore_errors=True)
+        self.publications += 1
+        return generation
+
+    def publish_pending(self) -> bool:
+        """Publishes if this process holds the publisher lock and the database changed. Returns whether it did."""
+        if not self._try_lock():
+            return False
+        stamp = self.stamp()
+        if stamp == self._published and self.generation() is not None:
+            return False
+        self.publish(self.load())
+        self._published = stamp
+        return True
+
+    def _run(self):
+        while True:
+            try:
+                self.publish_pending()
+            except Exception as e:
+                # e.g. database briefly unavailable; retried on the next poll
+                self.errors += 1
+                self.last_error = str(e)
+            if self._stop.wait(self.poll):
+                return
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="shared-snapshot", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._publisher_lock is not None:
+            self._publisher_lock.close()
+            self._publisher_lock = None
+
+    def stats(self) -> Dict[str, Any]:
+        generation = self.generation()
+        with self._lock:
+            return {
+                "directory": self.directory,
+                "generation": generation,
+                "publisher": self._publisher_lock is not None,
+                "publications": self.publications,
+                "errors": self.errors,
+                "last_error": self.last_error,
+                "mapped_tables": sorted(self._tables),
+            }
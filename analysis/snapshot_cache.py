@@ -0,0 +1,87 @@
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class SnapshotCache:
+    """
+    In-process LRU cache for loaded tables and derived analytics results.
+
+    Entries are keyed on the database version, made of the file identity and
+    SQLite's `PRAGMA data_version`, which changes whenever another connection
+    commits. A poll against an unchanged database costs a stat and one pragma
+    instead of a reload. Entries from older versions are dropped as soon as a
+    new version is seen. If given, `generation()` (e.g. the shared snapshot the
+    tables are mapped from) is part of the version too.
+    """
+
+    def __init__(self, db_path: str, max_entries: int = 64,
+                 generation: Optional[Callable[[], Hashable]] = None):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.generation = generation
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple, Any]" = OrderedDict()
+        self._current_version: Optional[Tuple] = None
+        self._lock = threading.Lock()
+        self._probe: Optional[sqlite3.Connection] = None
+        self._probe_file: Optional[Tuple[int, int]] = None
+
+    def version(self) -> Tuple:
+        """Returns the current version stamp of the database file and generation."""
+        version = self.db_version()
+        return version if self.generation is None else version + (self.generation(),)
+
+    def db_version(self) -> Tuple:
+        """Returns the current version stamp of the database file alone."""
+        st = os.stat(self.db_path)
+        file_id = (st.st_dev, st.st_ino)
+        with self._lock:
+            # data_version is only comparable on the same connection, so keep one
+            # open and replace it if the database file itself was replaced.
+            if self._probe is None or self._probe_file != file_id:
+                if self._probe is not None:
+                    self._probe.close()
+                self._probe = sqlite3.connect(self.db_path, check_same_thread=False)
+                self._probe_file = file_id
+            data_version = self._probe.execute("PRAGMA data_version").fetchone()[0]
+        return (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size, data_version)
+
+    def get(self, key: Hashable, compute: Callable[[], Any], version: Optional[Tuple] = None) -> Any:
+        """
+        Returns the cached value of `key` for the current version, calling
+        `compute` on a miss. Concurrent misses on the same key may both compute.
+        """
+        version = self.version() if version is None else version
+        with self._lock:
+            if version != self._current_version:
+                self._entries.clear()
+                self._current_version = version
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        value = compute()
+
+        with self._lock:
+            if version == self._current_version:
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "version": list(self._current_version) if self._current_version else None,
+            }
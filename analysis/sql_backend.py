@@ -0,0 +1,209 @@
+"""
+SQL pushdown versions of the aggregate analytics in analytics_module.
+
+Grouping and date filtering run inside SQLite, so only one row per equipment
+(or per overdue rental) is transferred into pandas. The derived flags are then
+computed with the same helpers as the pandas backend, keeping results identical.
+"""
+import sqlite3
+import pandas as pd
+from typing import Optional, Tuple
+
+from analytics_module import (
+    BURN_RATE_DAYS,
+    HOURS_TOLERANCE,
+    USAGE_ROLLUP_GRAINS,
+    UsageSegment,
+    _finish_maintenance_alerts,
+    _finish_usage_metrics,
+    _today,
+    usage_window_metrics,
+    usage_window_totals,
+)
+from dates import parse_iso_dates
+
+BACKENDS = ("pandas", "sql")
+
+USAGE_METRICS_SQL = """
+    SELECT equipment_id,
+           TOTAL(engine_hours_per_day) AS engine_hours_per_day,
+           TOTAL(idle_hours_per_day) AS idle_hours_per_day,
+           TOTAL(engine_hours_per_day + idle_hours_per_day) AS total_hours
+    FROM UsageMetrics
+    WHERE equipment_id IS NOT NULL
+    GROUP BY equipment_id
+    ORDER BY equipment_id
+"""
+
+# julianday() is NULL for missing or unparseable dates, mirroring dates.parse_iso_dates,
+# so blank or malformed check-in dates count as still out, as on the pandas side. The
+# check-in test lets SQLite read only the open rentals through the partial
+# idx_rentals_unreturned index (dataset_preparation/migrate.py). Return dates are
+# compared through julianday() alone: as text, one with a UTC offset can sort after
+# :today while its UTC time is before it.
+OVERDUE_SQL = """
+    SELECT equipment_id, site_id, expected_return_date,
+           CAST(julianday(:today) - julianday(expected_return_date) AS INTEGER) AS overdue_days
+    FROM RentalTransactions
+    WHERE julianday(check_in_date) IS NULL
+      AND julianday(expected_return_date) < julianday(:today)
+    ORDER BY transaction_id
+"""
+
+# Usage is summed per UTC day, as parse_iso_dates and normalize() bucket it on the pandas
+# side; the running total since the last service dates the threshold crossing and the
+# days logged in the burn-rate window up to each equipment's latest day give its rate.
+MAINTENANCE_TOTALS_SQL = """
+    WITH last_maint AS (
+        SELECT equipment_id,
+               MAX(CASE WHEN julianday(last_service_date) IS NOT NULL THEN last_service_date END)
+                   AS last_service_date
+        FROM MaintenanceHealth
+        WHERE equipment_id IS NOT NULL
+        GROUP BY equipment_id
+    ),
+    usage_days AS (
+        SELECT UsageMetrics.equipment_id, date(date) AS day, TOTAL(engine_hours_per_day) AS hours
+        FROM UsageMetrics
+        JOIN last_maint ON last_maint.equipment_id = UsageMetrics.equipment_id
+        WHERE date(date) IS NOT NULL
+        GROUP BY UsageMetrics.equipment_id, day
+    ),
+    since_service AS (
+        SELECT usage_days.equipment_id, day, hours,
+               SUM(hours) OVER (PARTITION BY usage_days.equipment_id ORDER BY day) AS running_hours
+        FROM usage_days
+        JOIN last_maint ON last_maint.equipment_id = usage_days.equipment_id
+        WHERE last_maint.last_service_date IS NULL OR day > date(last_maint.last_service_date)
+    ),
+    since_totals AS (
+        SELECT equipment_id, TOTAL(hours) AS engine_hours_since_service,
+               MIN(CASE WHEN running_hours >= :threshold_hours THEN day END) AS hours_crossed_date
+        FROM since_service
+        GROUP BY equipment_id
+    ),
+    last_days AS (
+        SELECT equipment_id, MAX(day) AS last_usage_date
+        FROM usage_days
+        GROUP BY equipment_id
+    ),
+    burn_rates AS (
+        SELECT usage_days.equipment_id, TOTAL(hours) / COUNT(*) AS daily_engine_hours
+        FROM usage_days
+        JOIN last_days ON last_days.equipment_id = usage_days.equipment_id
+        WHERE day > date(last_usage_date, :burn_rate_window)
+        GROUP BY usage_days.equipment_id
+    )
+    SELECT last_maint.equipment_id, last_maint.last_service_date,
+           COALESCE(since_totals.engine_hours_since_service, 0) AS engine_hours_since_service,
+           burn_rates.daily_engine_hours, last_days.last_usage_date, since_totals.hours_crossed_date
+    FROM last_maint
+    LEFT JOIN since_totals ON since_totals.equipment_id = last_maint.equipment_id
+    LEFT JOIN last_days ON last_days.equipment_id = last_maint.equipment_id
+    LEFT JOIN burn_rates ON burn_rates.equipment_id = last_maint.equipment_id
+    ORDER BY last_maint.equipment_id
+"""
+
+
+# Rollup tables maintained by triggers (migration 4 in dataset_preparation/migrate.py)
+USAGE_ROLLUP_TABLES = {"month": "UsageRollupMonthly", "week": "UsageRollupWeekly"}
+
+ROLLUP_SEGMENT_SQL = """
+    SELECT equipment_id,
+           TOTAL(engine_hours_per_day) AS engine_hours_per_day,
+           TOTAL(idle_hours_per_day) AS idle_hours_per_day,
+           TOTAL(total_hours) AS total_hours,
+           TOTAL(downtime_hours) AS downtime_hours,
+           TOTAL(fuel_consumption_per_day) AS fuel_consumption_per_day,
+           TOTAL(operating_days) AS operating_days,
+           TOTAL(row_count) AS row_count
+    FROM {table}
+    WHERE {where}
+    GROUP BY equipment_id
+"""
+
+# Raw rows are bucketed by date(), the UTC day, as parse_iso_dates does. The plain range
+# on the stored text, one day wider for UTC offsets, lets SQLite search idx_usage_date;
+# "+equipment_id" stops it from skip-scanning the equipment index to avoid the sort.
+# Rows without a parseable date are found through the partial idx_usage_undated.
+RAW_SEGMENT_SQL = """
+    SELECT equipment_id,
+           TOTAL(engine_hours_per_day) AS engine_hours_per_day,
+           TOTAL(idle_hours_per_day) AS idle_hours_per_day,
+           TOTAL(engine_hours_per_day + idle_hours_per_day) AS total_hours,
+           TOTAL(downtime_hours) AS downtime_hours,
+           TOTAL(fuel_consumption_per_day) AS fuel_consumption_per_day,
+           TOTAL(operating_days) AS operating_days,
+           COUNT(*) AS row_count
+    FROM UsageMetrics
+    WHERE {where}
+    GROUP BY +equipment_id
+"""
+
+
+def usage_rollup_grains(conn: sqlite3.Connection) -> Tuple[str, ...]:
+    """The rollup grains whose tables exist in this database, coarsest first."""
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    return tuple(grain for grain in USAGE_ROLLUP_GRAINS if USAGE_ROLLUP_TABLES[grain] in tables)
+
+
+def read_usage_segment(conn: sqlite3.Connection, segment: UsageSegment) -> pd.DataFrame:
+    """Per-equipment usage sums for one segment planned by analytics_module.plan_usage_window."""
+    params = {}
+    if segment.start is not None:
+        params["start"] = segment.start.strftime("%Y-%m-%d")
+    if segment.end is not None:
+        params["end"] = segment.end.strftime("%Y-%m-%d")
+
+    if segment.grain in USAGE_ROLLUP_TABLES:
+        where = ["period_start >= :start" if "start" in params else None,
+                 "period_start < :end" if "end" in params else None]
+        sql = ROLLUP_SEGMENT_SQL.format(table=USAGE_ROLLUP_TABLES[segment.grain],
+                                        where=" AND ".join(w for w in where if w) or "1")
+    elif segment.grain == "undated":
+        sql = RAW_SEGMENT_SQL.format(where="+equipment_id IS NOT NULL AND date(date) IS NULL")
+    else:
+        where = ["+equipment_id IS NOT NULL"]
+        if "start" in params:
+            where += ["date >= date(:start, '-1 day')", "date(date) >= :start"]
+        if "end" in params:
+            where += ["date < date(:end, '+1 day')", "date(date) < :end"]
+        sql = RAW_SEGMENT_SQL.format(where=" AND ".join(where))
+    return pd.read_sql_query(sql, conn, params=params)
+
+
+def usage_window_totals_sql(conn: sqlite3.Connection, start: Optional[pd.Timestamp] = None,
+                            end: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+    """Per-equipment usage sums over [start, end), read through the available rollups."""
+    return usage_window_totals(lambda segment: read_usage_segment(conn, segment), start, end,
+                               usage_rollup_grains(conn))
+
+
+def usage_window_metrics_sql(conn: sqlite3.Connection, start: Optional[pd.Timestamp] = None,
+                             end: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+    """usage_metrics over [start, end) (whole history by default), read through the available rollups."""
+    return usage_window_metrics(lambda segment: read_usage_segment(conn, segment), start, end,
+                                usage_rollup_grains(conn))
+
+
+def usage_metrics_sql(conn: sqlite3.Connection) -> pd.DataFrame:
+    metrics = pd.read_sql_query(USAGE_METRICS_SQL, conn)
+    return _finish_usage_metrics(metrics)
+
+
+def detect_overdue_sql(conn: sqlite3.Connection, today: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+    today = _today() if today is None else today
+    overdue = pd.read_sql_query(OVERDUE_SQL, conn, params={"today": today.strftime("%Y-%m-%d %H:%M:%S")})
+    overdue["expected_return_date"] = parse_iso_dates(overdue["expected_return_date"])
+    return overdue[["equipment_id","site_id","expected_return_date","overdue_days"]]
+
+
+def maintenance_alerts_sql(conn: sqlite3.Connection,
+                           threshold_hours: int = 200,
+                           threshold_days: int = 180,
+                           burn_rate_days: int = BURN_RATE_DAYS) -> pd.DataFrame:
+    alerts = pd.read_sql_query(MAINTENANCE_TOTALS_SQL, conn, params={
+        "threshold_hours": threshold_hours - HOURS_TOLERANCE, "burn_rate_window": f"-{burn_rate_days} days"})
+    for col in ("last_service_date", "last_usage_date", "hours_crossed_date"):
+        alerts[col] = parse_iso_dates(alerts[col])
+    return _finish_maintenance_alerts(alerts, threshold_hours, threshold_days)
@@ -0,0 +1,119 @@
+"""
+Checks predictive_allocation against the row-by-row implementation it replaced.
+
+    python -m unittest test_allocation
+"""
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+import shared_snapshot
+from analytics_module import predictive_allocation
+from main import TABLE_ALIASES, TABLE_COLUMNS, _parse_coordinates, compact_table
+
+# Sites are either at an asset's exact location or hundreds of km from every
+# asset, where the distance bonus is the old exact-match bonus or nothing
+BANGALORE, DELHI, MUMBAI, CHENNAI = "12.9716,77.5946", "28.6139,77.2090", "19.0760,72.8777", "13.0827,80.2707"
+
+
+def baseline_allocation(dfs):
+    """The original iterrows implementation, kept as the reference."""
+    ai = dfs["ai"].copy()
+    equipment = dfs["equipment"].copy()
+    sites = dfs.get("sites", pd.DataFrame(columns=["site_id","required_type","location"]))
+    merged = ai.merge(equipment, on="equipment_id", how="left")
+
+    allocations = []
+    for _, row in merged.iterrows():
+        eq_id = row["equipment_id"]
+        eq_type = row["type"]
+        eq_loc = row.get("location_coordinates", None)
+        score = row["predicted_demand_score"]
+
+        site_candidates = sites[sites["required_type"] == eq_type].copy()
+        if site_candidates.empty:
+            allocations.append([eq_id, None, "No matching site"])
+            continue
+
+        site_candidates["score"] = site_candidates.apply(
+            lambda s: score + (20 if s.get("location") == eq_loc else 0), axis=1
+        )
+        best_site = site_candidates.sort_values("score", ascending=False).iloc[0]
+        allocations.append([eq_id, best_site["site_id"], f"Allocate to {best_site.get('location')} (score={best_site['score']})"])
+
+    return pd.DataFrame(allocations, columns=["equipment_id","recommended_site_id","recommendation"])
+
+
+def fleet():
+    equipment = pd.DataFrame({
+        "equipment_id": ["EQ01", "EQ02", "EQ03", "EQ04", "EQ05", "EQ06", "EQ07", "EQ08"],
+        "type": ["Crane", "Crane", "Crane", "Loader", "Loader", "Grader", "Excavator", "Crane"],
+        "location_coordinates": [BANGALORE, np.nan, DELHI, MUMBAI, np.nan, BANGALORE, DELHI, MUMBAI],
+    })
+    ai = pd.DataFrame({
+        "equipment_id": ["EQ01", "EQ02", "EQ03", "EQ04", "EQ05", "EQ06", "EQ07", "EQ08", "EQ99"],
+        "predicted_demand_score": [50.0, 50.0, np.nan, 12.25, 7.5, 33.0, 80.0, 41.75, 10.0],
+    })
+    sites = pd.DataFrame({
+        "site_id": ["S1", "S2", "S3", "S4", "S5", "S6", "S7", "S8"],
+        "required_type": ["Crane", "Crane", "Loader", "Crane", "Loader", "Grader", "Crane", "Loader"],
+        "location": [CHENNAI, BANGALORE, MUMBAI, np.nan, np.nan, CHENNAI, BANGALORE, MUMBAI],
+    })
+    return {"ai": ai, "equipment": equipment, "sites": sites}
+
+
+class PredictiveAllocationTest(unittest.TestCase):
+    def test_matches_baseline(self):
+        dfs = fleet()
+        pd.testing.assert_frame_equal(predictive_allocation(dfs), baseline_allocation(dfs))
+
+    def test_missing_location_gets_no_bonus(self):
+        # A site without a location is not "at" an asset without one
+        dfs = {"ai": pd.DataFrame({"equipment_id": ["EQ01"], "predicted_demand_score": [50.0]}),
+               "equipment": pd.DataFrame({"equipment_id": ["EQ01"], "type": ["Crane"],
+                                          "location_coordinates": [np.nan]}),
+               "sites": pd.DataFrame({"site_id": ["S1", "S4"], "required_type": ["Crane", "Crane"],
+                                      "location": ["1,2", np.nan]})}
+        result = predictive_allocation(dfs)
+        self.assertEqual(result.loc[0, "recommended_site_id"], "S1")
+        self.assertEqual(result.loc[0, "recommendation"], "Allocate to 1,2 (score=50.0)")
+        pd.testing.assert_frame_equal(result, baseline_allocation(dfs))
+
+    def test_missing_score_is_formatted(self):
+        result = predictive_allocation(fleet()).set_index("equipment_id")
+        self.assertEqual(result.loc["EQ03", "recommendation"], f"Allocate to {CHENNAI} (score=nan)")
+
+
+@unittest.skipIf(shared_snapshot.pa is None, "pyarrow is not installed")
+class SharedSnapshotAllocationTest(unittest.TestCase):
+    def allocate_mapped(self, dfs):
+        """Allocation on `dfs` loaded as main loads them, then mapped back from a shared snapshot."""
+        tables = {TABLE_ALIASES[table]: table for table in ["AIFeatures", "EquipmentMaster", "Sites"]}
+        loaded = {alias: _parse_coordinates(compact_table(df, tables[alias]), tables[alias])
+                  for alias, df in dfs.items()}
+        with tempfile.TemporaryDirectory() as tmp:
+            mapped = {}
+            for alias, df in loaded.items():
+                path = os.path.join(tmp, f"{alias}.arrow")
+                shared_snapshot.write_table(df, path)
+                mapped[alias] = shared_snapshot.read_table(path)
+            result = predictive_allocation(mapped)
+        pd.testing.assert_frame_equal(result, predictive_allocation(loaded))
+        return result
+
+    def test_allocates_on_mapped_tables(self):
+        self.allocate_mapped(fleet())
+
+    def test_allocates_without_sites_table(self):
+        # A database without Sites loads it as an empty frame of object columns, whose
+        # arrays come back from the snapshot as read-only views
+        dfs = {**fleet(), "sites": pd.DataFrame(columns=TABLE_COLUMNS["Sites"])}
+        result = self.allocate_mapped(dfs)
+        self.assertTrue((result["recommendation"] == "No matching site").all())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+"""
+Checks that the SQL, incremental, rollup and latest-state backends return the
+same results as the pandas analytics, on a small generated fleet plus one asset
+whose burn rate is fractional and whose rental is due back at a UTC offset.
+
+    python -m unittest test_backends
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+# After this directory, whose main is the API (dataset_preparation has a main.py too)
+sys.path.append(str(Path(__file__).resolve().parent.parent / "dataset_preparation"))
+import generate_data  # noqa: E402
+import migrate  # noqa: E402
+
+from analytics_module import detect_overdue, maintenance_alerts  # noqa: E402
+from check_backends import assert_same_result, backend_results  # noqa: E402
+from incremental import IncrementalAnalytics  # noqa: E402
+from main import TABLE_ALIASES, _read_table  # noqa: E402
+from sql_backend import detect_overdue_sql, maintenance_alerts_sql  # noqa: E402
+
+FLEET = generate_data.Scale(assets=12, sites=3, days=120, rentals_per_asset=2, seed=7, today="2025-06-24")
+
+# Serviced on May 1st, then 103.36 engine hours before the burn-rate window and
+# 30.20 over five days inside it: 6.04 hours a day, so the remaining 66.44 hours
+# take exactly 11 days. Added up in floating point the quotient is a hair above
+# 11, which must not push the projected date to the 12th day.
+FRACTIONAL_ID = "EQ900"
+FRACTIONAL_USAGE = [(f"2025-05-{day:02d}", 12.92) for day in range(2, 10)] + \
+                   list(zip(["2025-06-20", "2025-06-21", "2025-06-22", "2025-06-23", "2025-06-24"],
+                            [7.91, 3.38, 7.43, 5.67, 5.81]))
+FRACTIONAL_DUE = pd.Timestamp("2025-07-05")
+
+# Due back at 02:00 today at UTC+5, i.e. 21:00 UTC yesterday: overdue, although the
+# text sorts after today's date
+OFFSET_RENTAL_ID = 9000
+OFFSET_RETURN_DATE = pd.Timestamp.today().strftime("%Y-%m-%dT02:00+05:00")
+
+
+def build_database(path: str):
+    """The generated fleet with migrations applied, then the fractional-rate asset written through the triggers."""
+    conn = sqlite3.connect(path)
+    try:
+        generate_data.generate(conn, FLEET)
+        migrate.migrate(conn)
+        with conn:
+            conn.execute("INSERT INTO EquipmentMaster (equipment_id, type, qr_tag_id) VALUES (?, 'Crane', 'QR900')",
+                         (FRACTIONAL_ID,))
+            conn.execute("INSERT INTO MaintenanceHealth (equipment_id, last_service_date, next_service_due, "
+                         "breakdowns_reported, condition_status, maintenance_costs) "
+                         "VALUES (?, '2025-05-01', '2025-08-01', 0, 'Good', 1200.0)", (FRACTIONAL_ID,))
+            conn.executemany("INSERT INTO UsageMetrics (equipment_id, date, engine_hours_per_day, idle_hours_per_day, "
+                             "operating_days, fuel_consumption_per_day, location_coordinates, downtime_hours) "
+                             "VALUES (?, ?, ?, 1.5, 1, 40.0, '24.7871,79.2785', 0.0)",
+                             [(FRACTIONAL_ID, date, hours) for date, hours in FRACTIONAL_USAGE])
+            conn.execute("INSERT INTO RentalTransactions (transaction_id, equipment_id, site_id, check_out_date, "
+                         "check_in_date, expected_return_date, operator_id, purpose_job_type) "
+                         "VALUES (?, ?, 'SITE900', '2025-06-01', NULL, ?, 'OP900', 'Demolition')",
+                         (OFFSET_RENTAL_ID, FRACTIONAL_ID, OFFSET_RETURN_DATE))
+    finally:
+        conn.close()
+
+
+class BackendEquivalenceTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(cls.tmp.name, "fleet.db")
+        build_database(path)
+        cls.conn = sqlite3.connect(path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.conn.close()
+        cls.tmp.cleanup()
+
+    def test_backends_match_pandas(self):
+        checked = 0
+        for name, backend, expected, actual in backend_results(self.conn):
+            with self.subTest(analytic=name, backend=backend):
+                self.assertFalse(expected.empty)
+                assert_same_result(expected, actual)
+            checked += 1
+        self.assertEqual(checked, 8)
+
+    def test_offset_return_date_is_overdue(self):
+        rentals = {"rentals": _read_table(self.conn, "RentalTransactions")}
+        for backend, overdue in [("pandas", detect_overdue(rentals)), ("sql", detect_overdue_sql(self.conn))]:
+            with self.subTest(backend=backend):
+                self.assertIn(FRACTIONAL_ID, set(overdue["equipment_id"]))
+
+    def test_fractional_burn_rate_projects_whole_days(self):
+        dfs = {TABLE_ALIASES[t]: _read_table(self.conn, t) for t in ["MaintenanceHealth", "UsageMetrics"]}
+        engine = IncrementalAnalytics(_read_table)
+        engine.refresh(self.conn)
+        for backend, alerts in [("pandas", maintenance_alerts(dfs)),
+                                ("sql", maintenance_alerts_sql(self.conn)),
+                                ("incremental", engine.maintenance_alerts())]:
+            with self.subTest(backend=backend):
+                row = alerts.set_index("equipment_id").loc[FRACTIONAL_ID]
+                self.assertAlmostEqual(row["daily_engine_hours"], 6.04)
+                self.assertEqual(pd.Timestamp(row["hours_due_date"]), FRACTIONAL_DUE)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import copy_context
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+from urllib.parse import quote
+
+from .timing import record_stage
+
+# Per-connection read tuning; mirrors CONNECTION_PRAGMAS in dataset_preparation/migrate.py
+READ_PRAGMAS = [
+    "PRAGMA cache_size = -65536",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA temp_store = MEMORY",
+]
+
+
+def readonly_uri(db_path: str, immutable: bool = False) -> str:
+    """SQLite URI opening `db_path` read-only; `immutable` also skips all locking and change detection."""
+    uri = f"file:{quote(os.path.abspath(db_path))}?mode=ro"
+    return uri + "&immutable=1" if immutable else uri
+
+
+class LatencyStats:
+    """Thread-safe count/total/max of observed latencies, grouped by name."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            entry = self._stats.setdefault(name, {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+            entry["count"] += 1
+            entry["total_seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                name: dict(entry, avg_seconds=entry["total_seconds"] / entry["count"])
+                for name, entry in self._stats.items()
+            }
+
+
+class SQLitePool:
+    """
+    Bounded pool of long-lived, read-only SQLite connections shared across threads.
+
+    Connections are opened lazily up to `size` and handed out one caller at a time.
+    `map` runs independent queries in parallel on a thread pool of the same size.
+    Time spent waiting for a connection and per-query latencies are recorded in
+    `metrics`. Set `immutable` only for database files nothing writes to.
+    """
+
+    def __init__(self, db_path: str, size: int = 8, immutable: bool = False, timeout: float = 30.0):
+        self.db_path = db_path
+        self.size = size
+        self.immutable = immutable
+        self.timeout = timeout
+        self.wait_stats = LatencyStats()
+        self.query_stats = LatencyStats()
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(readonly_uri(self.db_path, self.immutable), uri=True, check_same_thread=False)
+        for pragma in READ_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._opened < self.size:
+                self._opened += 1
+                try:
+                    return self._connect()
+                except Exception:
+                    self._opened -= 1
+                    raise
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No SQLite connection available after {self.timeout}s")
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        start = time.perf_counter()
+        conn = self._acquire()
+        self.wait_stats.observe("pool_wait", time.perf_counter() - start)
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+
+    def run(self, func: Callable[..., Any], *args, label: Optional[str] = None) -> Any:
+        """
+        Calls `func(conn, *args)` on a pooled connection, timing it under `label`
+        and as a `db` stage of the current request (see common.timing).
+        """
+        with self.connection() as conn:
+            start = time.perf_counter()
+            try:
+                return func(conn, *args)
+            finally:
+                elapsed = time.perf_counter() - start
+                record_stage("db", elapsed, label)
+                if label is not None:
+                    self.query_stats.observe(label, elapsed)
+
+    def map(self, func: Callable[[Any], Any], items: Iterable[Any]) -> Dict[Any, Any]:
+        """Runs `func(item)` for every item concurrently; returns {item: result}."""
+        items = list(items)
+        if len(items) <= 1:
+            return {item: func(item) for item in items}
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="sqlite-pool")
+        # Each task runs in a copy of the caller's context, so stages count towards its request
+        futures = {item: self._executor.submit(copy_context().run, func, item) for item in items}
+        return {item: future.result() for item, future in futures.items()}
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "size": self.size,
+            "opened": self._opened,
+            "idle": self._idle.qsize(),
+            "wait": self.wait_stats.snapshot(),
+            "queries": self.query_stats.snapshot(),
+        }
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
@@ -0,0 +1,168 @@
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from starlette.datastructures import MutableHeaders
+
+# Upper bounds (seconds) of the histogram buckets; +Inf is implied
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Endpoint label for stages timed outside a request (startup, scripts, background threads)
+NO_REQUEST = "background"
+
+
+class Histogram:
+    """Thread-safe Prometheus-style histogram of durations, one series per label combination."""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str], buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, seconds: float, *labels: str):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += seconds
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {labels: list(values) for labels, values in sorted(self._series.items())}
+        for labels, values in series.items():
+            pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labels)]
+            for bound, count in zip(self.buckets + ("+Inf",), values):
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{{{','.join(pairs + [le])}}} {count}")
+            label_text = "{" + ",".join(pairs) + "}" if pairs else ""
+            lines.append(f"{self.name}_sum{label_text} {values[-1]}")
+            lines.append(f"{self.name}_count{label_text} {values[-2]}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REQUEST_SECONDS = Histogram("http_request_duration_seconds", "Time from request to the end of the response body.",
+                            ("method", "endpoint", "status"))
+STAGE_SECONDS = Histogram("request_stage_duration_seconds", "Time spent in one named stage of a request.",
+                          ("endpoint", "stage"))
+
+
+class Stage(NamedTuple):
+    name: str
+    seconds: float
+    desc: Optional[str]
+
+
+class _RequestTiming:
+    """Stages recorded while handling one request; appended to from worker threads too."""
+
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.stages: List[Stage] = []
+
+    @property
+    def endpoint(self) -> str:
+        # The route template (e.g. /equipment/{equipment_id}), so labels stay bounded
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or "unmatched"
+
+
+_current: ContextVar[Optional[_RequestTiming]] = ContextVar("request_timing", default=None)
+
+
+def record_stage(name: str, seconds: float, desc: Optional[str] = None):
+    """Adds a measured stage to the current request's Server-Timing header and to STAGE_SECONDS."""
+    timing = _current.get()
+    if timing is not None:
+        timing.stages.append(Stage(name, seconds, desc))
+    STAGE_SECONDS.observe(seconds, timing.endpoint if timing is not None else NO_REQUEST, name)
+
+
+@contextmanager
+def stage(name: str, desc: Optional[str] = None) -> Iterator[None]:
+    """Times the enclosed block as stage `name` (also on error)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start, desc)
+
+
+# Server-Timing metric names are HTTP tokens
+_NON_TOKEN = re.compile(r"[^A-Za-z0-9!#$%&'*+.^_`|~-]")
+
+
+def server_timing(stages: Sequence[Stage], total: float) -> str:
+    entries = []
+    for s in stages:
+        entry = f"{_NON_TOKEN.sub('_', s.name)};dur={s.seconds * 1000:.3f}"
+        if s.desc:
+            entry += ';desc="' + s.desc.replace("\\", "").replace('"', "") + '"'
+        entries.append(entry)
+    entries.append(f"total;dur={total * 1000:.3f}")
+    return ", ".join(entries)
+
+
+class TimingMiddleware:
+    """
+    ASGI middleware timing every HTTP request. Stages recorded while the request is
+    handled are listed in a Server-Timing header, followed by `total` (time to the
+    response headers); the full request, body included, is observed in REQUEST_SECONDS.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timing = _RequestTiming(scope)
+        token = _current.set(timing)
+        start = time.perf_counter()
+        status = "500"
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", server_timing(timing.stages, time.perf_counter() - start))
+                headers.append("Timing-Allow-Origin", "*")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            REQUEST_SECONDS.observe(time.perf_counter() - start, scope["method"], timing.endpoint, status)
+
+
+def render_metrics() -> str:
+    return "\n".join(REQUEST_SECONDS.render() + STAGE_SECONDS.render()) + "\n"
+
+
+def install_timing(app: FastAPI):
+    """Adds TimingMiddleware and a Prometheus text-format GET /metrics to `app`."""
+    app.add_middleware(TimingMiddleware)
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,333 @@
+"""
+Bulk synthetic data generator for equipment_management.db.
+
+    python generate_data.py                                   # the 30-asset demo fleet
+    python generate_data.py --db load_test.db --assets 100000 --sites 1000 \\
+        --days 365 --rentals-per-asset 12 --workers 4 --migrate
+
+Rows are built per chunk of assets as NumPy arrays, each chunk from its own
+seed, so the output depends only on the parameters and --seed, not on the
+number of workers. Worker processes build chunks while the parent writes them
+with executemany, one transaction per chunk. Primary keys are assigned up front,
+so every table is written in key order.
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, NamedTuple, Tuple
+
+import migrate
+
+db_name = "equipment_management.db"
+
+EQUIPMENT_TYPES = ["Excavator", "Bulldozer", "Crane", "Loader", "Grader"]
+JOB_TYPES = ["Road Construction", "Land Clearing", "Bridge Building", "Foundation Work", "Pipeline Work", "Demolition"]
+ALERT_TYPES = ["Maintenance Due", "Overdue Return", "Low Fuel", "Breakdown Alert", "None"]
+CONDITIONS = ["Good", "Needs Repair", "Critical"]
+
+# Same tables as cretate_dataset.py
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS EquipmentMaster (
+        equipment_id TEXT PRIMARY KEY,
+        type TEXT NOT NULL,
+        qr_tag_id TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS RentalTransactions (
+        transaction_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        equipment_id TEXT NOT NULL,
+        site_id TEXT NOT NULL,
+        check_out_date TEXT,
+        check_in_date TEXT,
+        expected_return_date TEXT,
+        operator_id TEXT,
+        purpose_job_type TEXT,
+        FOREIGN KEY (equipment_id) REFERENCES EquipmentMaster (equipment_id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS UsageMetrics (
+        usage_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        equipment_id TEXT NOT NULL,
+        date TEXT NOT NULL,
+        engine_hours_per_day REAL,
+        idle_hours_per_day REAL,
+        operating_days INTEGER,
+        fuel_consumption_per_day REAL,
+        location_coordinates TEXT,
+        downtime_hours REAL,
+        FOREIGN KEY (equipment_id) REFERENCES EquipmentMaster (equipment_id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS MaintenanceHealth (
+        record_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        equipment_id TEXT NOT NULL,
+        last_service_date TEXT,
+        next_service_due TEXT,
+        breakdowns_reported INTEGER,
+        condition_status TEXT CHECK (condition_status IN ('Good', 'Needs Repair', 'Critical')),
+        maintenance_costs REAL,
+        FOREIGN KEY (equipment_id) REFERENCES EquipmentMaster (equipment_id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS AlertsNotifications (
+        alert_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        equipment_id TEXT NOT NULL,
+        overdue_status INTEGER CHECK (overdue_status IN (0,1)),
+        reminder_sent_date TEXT,
+        alert_type TEXT,
+        FOREIGN KEY (equipment_id) REFERENCES EquipmentMaster (equipment_id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS FinancialData (
+        financial_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        equipment_id TEXT NOT NULL,
+        rental_rate_per_day REAL,
+        total_rental_cost REAL,
+        penalty_cost REAL,
+        fuel_cost REAL,
+        maintenance_cost REAL,
+        FOREIGN KEY (equipment_id) REFERENCES EquipmentMaster (equipment_id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS AIFeatures (
+        ai_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        equipment_id TEXT NOT NULL,
+        utilization_rate REAL,
+        idle_ratio REAL,
+        predicted_demand_score REAL,
+        anomaly_flag INTEGER CHECK (anomaly_flag IN (0,1)),
+        recommended_site TEXT,
+        FOREIGN KEY (equipment_id) REFERENCES EquipmentMaster (equipment_id)
+    )""",
+]
+
+COLUMNS = {
+    "EquipmentMaster": ["equipment_id", "type", "qr_tag_id"],
+    "RentalTransactions": ["transaction_id", "equipment_id", "site_id", "check_out_date", "check_in_date",
+                           "expected_return_date", "operator_id", "purpose_job_type"],
+    "UsageMetrics": ["usage_id", "equipment_id", "date", "engine_hours_per_day", "idle_hours_per_day",
+                     "operating_days", "fuel_consumption_per_day", "location_coordinates", "downtime_hours"],
+    "MaintenanceHealth": ["record_id", "equipment_id", "last_service_date", "next_service_due",
+                          "breakdowns_reported", "condition_status", "maintenance_costs"],
+    "AlertsNotifications": ["alert_id", "equipment_id", "overdue_status", "reminder_sent_date", "alert_type"],
+    "FinancialData": ["financial_id", "equipment_id", "rental_rate_per_day", "total_rental_cost",
+                      "penalty_cost", "fuel_cost", "maintenance_cost"],
+    "AIFeatures": ["ai_id", "equipment_id", "utilization_rate", "idle_ratio", "predicted_demand_score",
+                   "anomaly_flag", "recommended_site"],
+}
+
+RENTAL_SLOT_DAYS = 60  # longest rental: 9 days late to check out + 45 + 5 days late back
+SERVICE_INTERVAL_DAYS = 90
+
+
+class Scale(NamedTuple):
+    assets: int
+    sites: int
+    days: int
+    rentals_per_asset: int
+    seed: int
+    today: str  # ISO date the history ends on
+
+    @property
+    def services_per_asset(self) -> int:
+        return max(1, self.days // SERVICE_INTERVAL_DAYS)
+
+
+# One chunk: table -> column arrays in COLUMNS order. Arrays rather than lists of
+# Python objects, since they pickle as flat buffers on the way back from workers.
+Chunk = Dict[str, List[np.ndarray]]
+
+
+def _ids(prefix: str, numbers: np.ndarray, width: int) -> np.ndarray:
+    return np.char.add(prefix, np.char.zfill(numbers.astype(str), width))
+
+
+def _iso(days: np.ndarray) -> np.ndarray:
+    return np.datetime_as_string(days.astype("datetime64[D]"), unit="D")
+
+
+def _nullable(values: np.ndarray, missing: np.ndarray) -> np.ndarray:
+    out = values.astype(object)
+    out[missing] = None
+    return out
+
+
+def build_chunk(scale: Scale, first: int, count: int) -> Chunk:
+    """Rows for assets first..first+count-1 (0-based); deterministic for a given scale and chunk."""
+    rng = np.random.default_rng([scale.seed, first])
+    today = np.datetime64(scale.today, "D")
+    width = max(3, len(str(scale.assets)))
+    n = np.arange(first, first + count)
+    eq_ids = _ids("EQ", n + 1, width)
+    sites = _ids("SITE", np.arange(101, 101 + scale.sites), 3)
+    home_site = sites[n % scale.sites]
+    types = np.array(EQUIPMENT_TYPES)[rng.integers(0, len(EQUIPMENT_TYPES), count)]
+    chunk: Chunk = {"EquipmentMaster": [eq_ids, types, _ids("QR", n + 1, width)]}
+
+    # Rentals: one per slot of RENTAL_SLOT_DAYS, oldest first, so they never overlap;
+    # only the latest can still be out
+    r = scale.rentals_per_asset
+    owner = np.repeat(np.arange(count), r)
+    check_out = today - r * RENTAL_SLOT_DAYS + np.tile(np.arange(r), count) * RENTAL_SLOT_DAYS + rng.integers(0, 10, count * r)
+    expected = check_out + rng.integers(10, 46, count * r)
+    check_in = expected + rng.integers(-2, 6, count * r)
+    latest = np.tile(np.arange(r) == r - 1, count)
+    still_out = latest & ((check_in > today) | (rng.random(count * r) < 0.2))
+    chunk["RentalTransactions"] = [
+        (first * r + np.arange(1, count * r + 1)),
+        eq_ids[owner],
+        np.where(rng.random(count * r) < 0.7, home_site[owner], sites[rng.integers(0, scale.sites, count * r)]),
+        _iso(check_out),
+        _nullable(_iso(check_in), still_out),
+        _iso(expected),
+        _ids("OP", rng.integers(1, max(scale.assets // 2, 2), count * r), width),
+        np.array(JOB_TYPES)[rng.integers(0, len(JOB_TYPES), count * r)],
+    ]
+
+    # Usage: one row per asset and day, ending today
+    d = max(scale.days, 1)
+    owner = np.repeat(np.arange(count), d)
+    engine = rng.uniform(5.0, 9.0, count * d).round(2)
+    lat, lon = rng.uniform(13.0, 28.6, count), rng.uniform(77.2, 80.2, count)
+    coords = np.char.add(np.char.add(np.char.mod("%.4f", lat), ","), np.char.mod("%.4f", lon))
+    chunk["UsageMetrics"] = [
+        (first * d + np.arange(1, count * d + 1)),
+        eq_ids[owner],
+        _iso(today - d + 1 + np.tile(np.arange(d), count)),
+        engine,
+        rng.uniform(1.0, 3.0, count * d).round(2),
+        np.ones(count * d, dtype=int),
+        (engine * 6.5).round(2),
+        coords[owner],
+        rng.uniform(0.0, 2.0, count * d).round(2),
+    ]
+
+    # Maintenance: one service record per interval of history
+    s = scale.services_per_asset
+    owner = np.repeat(np.arange(count), s)
+    last_service = today - s * SERVICE_INTERVAL_DAYS + np.tile(np.arange(s), count) * SERVICE_INTERVAL_DAYS + rng.integers(0, 30, count * s)
+    maint_cost = rng.uniform(3000, 8000, count * s).round(2)
+    chunk["MaintenanceHealth"] = [
+        (first * s + np.arange(1, count * s + 1)),
+        eq_ids[owner],
+        _iso(last_service),
+        _iso(last_service + rng.integers(60, 91, count * s)),
+        rng.integers(0, 4, count * s),
+        np.array(CONDITIONS)[rng.integers(0, len(CONDITIONS), count * s)],
+        maint_cost,
+    ]
+
+    alert_type = np.array(ALERT_TYPES)[rng.integers(0, len(ALERT_TYPES), count)]
+    overdue = (alert_type == "Overdue Return").astype(int)
+    chunk["AlertsNotifications"] = [
+        (n + 1),
+        eq_ids,
+        overdue,
+        _nullable(_iso(today - rng.integers(1, 11, count)), alert_type == "None"),
+        alert_type,
+    ]
+
+    rate = rng.uniform(4000, 7000, count).round(2)
+    rental_days = rng.integers(10, 46, count)
+    total = (rate * rental_days).round(2)
+    chunk["FinancialData"] = [
+        (n + 1),
+        eq_ids,
+        rate,
+        total,
+        (total * 0.1 * overdue).round(2),
+        (engine[::d] * rental_days * 6.5 * 1.5).round(2),
+        maint_cost[s - 1::s],
+    ]
+
+    utilization = rng.uniform(0.6, 0.95, count).round(2)
+    chunk["AIFeatures"] = [
+        (n + 1),
+        eq_ids,
+        utilization,
+        (1 - utilization - rng.uniform(0.0, 0.05, count)).round(2),
+        rng.uniform(0.6, 0.98, count).round(2),
+        rng.integers(0, 2, count),
+        sites[rng.integers(0, scale.sites, count)],
+    ]
+    return chunk
+
+
+def _build_chunk(job: Tuple[Scale, int, int]) -> Chunk:
+    return build_chunk(*job)
+
+
+def _chunks(scale: Scale, chunk_assets: int, workers: int) -> Iterator[Chunk]:
+    jobs = [(scale, first, min(chunk_assets, scale.assets - first))
+            for first in range(0, scale.assets, chunk_assets)]
+    if workers <= 1 or len(jobs) <= 1:
+        yield from map(_build_chunk, jobs)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # map keeps chunk order, so keys are written in ascending order
+        yield from pool.map(_build_chunk, jobs)
+
+
+def generate(conn: sqlite3.Connection, scale: Scale, chunk_assets: int = 10_000, workers: int = 1) -> Dict[str, int]:
+    """Creates the tables if needed and writes the fleet; returns rows written per table."""
+    for statement in SCHEMA:
+        conn.execute(statement)
+    conn.commit()
+    written = {table: 0 for table in COLUMNS}
+    for chunk in _chunks(scale, chunk_assets, workers):
+        with conn:
+            for table, columns in chunk.items():
+                names = COLUMNS[table]
+                placeholders = ", ".join("?" * len(names))
+                rows = zip(*(column.tolist() for column in columns))
+                conn.executemany(f"INSERT INTO {table} ({', '.join(names)}) VALUES ({placeholders})", rows)
+                written[table] += len(columns[0])
+    return written
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=db_name)
+    parser.add_argument("--assets", type=int, default=30)
+    parser.add_argument("--sites", type=int, default=10)
+    parser.add_argument("--days", type=int, default=1, help="days of history: one usage row per asset per day")
+    parser.add_argument("--rentals-per-asset", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--today", default=str(np.datetime64("today", "D")), help="last day of history (ISO date)")
+    parser.add_argument("--workers", type=int, default=1, help="processes building chunks")
+    parser.add_argument("--chunk-assets", type=int, default=10_000, help="assets per chunk and transaction")
+    parser.add_argument("--overwrite", action="store_true", help="delete an existing --db file first")
+    parser.add_argument("--migrate", action="store_true", help="apply migrate.py indexes after loading")
+    args = parser.parse_args(argv)
+
+    if os.path.exists(args.db):
+        if not args.overwrite:
+            print(f"{args.db} already exists; pass --overwrite to replace it.")
+            return 1
+        os.remove(args.db)
+
+    scale = Scale(args.assets, args.sites, args.days, args.rentals_per_asset, args.seed, args.today)
+    conn = sqlite3.connect(args.db)
+    try:
+        # Fresh file: nothing to protect until the load finishes, so skip journaling and fsyncs
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        start = time.perf_counter()
+        written = generate(conn, scale, args.chunk_assets, args.workers)
+        elapsed = time.perf_counter() - start
+        for table, rows in written.items():
+            print(f"  - {table}: {rows:,} rows")
+        total = sum(written.values())
+        print(f"Wrote {total:,} rows to {args.db} in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s).")
+        conn.execute("PRAGMA synchronous = FULL")
+        conn.execute("PRAGMA journal_mode = DELETE")
+        if args.migrate:
+            migrate.migrate(migrate.tune_connection(conn))
+    except sqlite3.Error as e:
+        print(f"An error occurred: {e}")
+        return 1
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,299 @@
+import sqlite3
+import sys
+
+db_name = "equipment_management.db"
+report_name = "query_plan_report.md"
+
+# Usage rollups: per equipment per week (starting Monday) and per calendar month of the
+# UTC day given by date(). Rows without a parseable date are left out of both.
+USAGE_ROLLUPS = {
+    "UsageRollupWeekly": "date({row}.date, '-6 days', 'weekday 1')",
+    "UsageRollupMonthly": "date({row}.date, 'start of month')",
+}
+
+# Rollup column -> contribution of one UsageMetrics row; missing values add nothing
+USAGE_ROLLUP_SUMS = {
+    "engine_hours_per_day": "COALESCE({row}.engine_hours_per_day, 0)",
+    "idle_hours_per_day": "COALESCE({row}.idle_hours_per_day, 0)",
+    "total_hours": "COALESCE({row}.engine_hours_per_day + {row}.idle_hours_per_day, 0)",
+    "downtime_hours": "COALESCE({row}.downtime_hours, 0)",
+    "fuel_consumption_per_day": "COALESCE({row}.fuel_consumption_per_day, 0)",
+    "operating_days": "COALESCE({row}.operating_days, 0)",
+    "row_count": "1",
+}
+
+
+def _usage_rollup_statements(table, period):
+    sums = list(USAGE_ROLLUP_SUMS)
+    rolled_up = "date({row}.date) IS NOT NULL AND {row}.equipment_id IS NOT NULL"
+    key = f"period_start = {period} AND equipment_id = {{row}}.equipment_id"
+
+    def add(row):
+        values = ", ".join(USAGE_ROLLUP_SUMS[c].format(row=row) for c in sums)
+        updates = ", ".join(f"{c} = {c} + excluded.{c}" for c in sums)
+        return (f"INSERT INTO {table} (period_start, equipment_id, {', '.join(sums)}) "
+                f"VALUES ({period.format(row=row)}, {row}.equipment_id, {values}) "
+                f"ON CONFLICT (period_start, equipment_id) DO UPDATE SET {updates};")
+
+    def subtract(row):
+        updates = ", ".join(f"{c} = {c} - {USAGE_ROLLUP_SUMS[c].format(row=row)}" for c in sums)
+        return (f"UPDATE {table} SET {updates} WHERE {key.format(row=row)}; "
+                f"DELETE FROM {table} WHERE {key.format(row=row)} AND row_count <= 0;")
+
+    return [
+        f"CREATE TABLE IF NOT EXISTS {table} (period_start TEXT NOT NULL, equipment_id TEXT NOT NULL, "
+        + ", ".join(f"{c} {'INTEGER' if c == 'row_count' else 'REAL'} NOT NULL DEFAULT 0" for c in sums)
+        + ", PRIMARY KEY (period_start, equipment_id)) WITHOUT ROWID",
+        f"INSERT INTO {table} (period_start, equipment_id, {', '.join(sums)}) "
+        f"SELECT {period.format(row='u')}, u.equipment_id, "
+        + ", ".join(f"SUM({USAGE_ROLLUP_SUMS[c].format(row='u')})" for c in sums)
+        + f" FROM UsageMetrics u WHERE {rolled_up.format(row='u')} GROUP BY 1, 2",
+        f"CREATE TRIGGER IF NOT EXISTS trg_{table}_insert AFTER INSERT ON UsageMetrics "
+        f"WHEN {rolled_up.format(row='NEW')} BEGIN {add('NEW')} END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_{table}_delete AFTER DELETE ON UsageMetrics "
+        f"WHEN {rolled_up.format(row='OLD')} BEGIN {subtract('OLD')} END",
+        # An update moves the old row's contribution out and the new row's in
+        f"CREATE TRIGGER IF NOT EXISTS trg_{table}_update_old AFTER UPDATE ON UsageMetrics "
+        f"WHEN {rolled_up.format(row='OLD')} BEGIN {subtract('OLD')} END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_{table}_update_new AFTER UPDATE ON UsageMetrics "
+        f"WHEN {rolled_up.format(row='NEW')} BEGIN {add('NEW')} END",
+    ]
+
+
+# Latest-state tables: the key of each equipment's latest record in a history table, picked
+# as analytics_module._latest_per_equipment does: the latest date (by julianday(), so
+# dates SQLite cannot parse count as missing), the first inserted on ties, and the
+# first inserted record for equipment without any dated one.
+LATEST_RECORDS = {
+    "LatestRental": ("RentalTransactions", "transaction_id", "check_out_date"),
+    "LatestUsage": ("UsageMetrics", "usage_id", "date"),
+}
+
+
+def _latest_order(key, order_col):
+    return f"julianday({order_col}) IS NULL, julianday({order_col}) DESC, {key}"
+
+
+def _latest_rebuild_statements(table):
+    source, key, order_col = LATEST_RECORDS[table]
+    return [
+        f"DELETE FROM {table}",
+        f"INSERT INTO {table} (equipment_id, {key}, order_key) "
+        f"SELECT equipment_id, {key}, order_key FROM ("
+        f"SELECT equipment_id, {key}, julianday({order_col}) AS order_key, "
+        f"ROW_NUMBER() OVER (PARTITION BY equipment_id ORDER BY {_latest_order(key, order_col)}) AS n "
+        f"FROM {source} WHERE equipment_id IS NOT NULL) WHERE n = 1",
+    ]
+
+
+def _latest_record_statements(table):
+    source, key, order_col = LATEST_RECORDS[table]
+
+    def refresh(equipment_id):
+        # Re-picks one equipment's latest record through its (equipment_id, date) index
+        return (f"DELETE FROM {table} WHERE equipment_id = {equipment_id}; "
+                f"INSERT INTO {table} (equipment_id, {key}, order_key) "
+                f"SELECT equipment_id, {key}, julianday({order_col}) FROM {source} "
+                f"WHERE equipment_id = {equipment_id} ORDER BY {_latest_order(key, order_col)} LIMIT 1;")
+
+    # An inserted record replaces the current one only if it sorts first
+    newer = (f"CASE WHEN excluded.order_key IS NULL THEN order_key IS NULL AND excluded.{key} < {key} "
+             f"ELSE order_key IS NULL OR excluded.order_key > order_key "
+             f"OR (excluded.order_key = order_key AND excluded.{key} < {key}) END")
+    return [
+        f"CREATE TABLE IF NOT EXISTS {table} (equipment_id TEXT PRIMARY KEY, {key} INTEGER NOT NULL, "
+        f"order_key REAL) WITHOUT ROWID",
+    ] + _latest_rebuild_statements(table) + [
+        f"CREATE TRIGGER IF NOT EXISTS trg_{table}_insert AFTER INSERT ON {source} "
+        f"WHEN NEW.equipment_id IS NOT NULL BEGIN "
+        f"INSERT INTO {table} (equipment_id, {key}, order_key) "
+        f"VALUES (NEW.equipment_id, NEW.{key}, julianday(NEW.{order_col})) "
+        f"ON CONFLICT (equipment_id) DO UPDATE SET {key} = excluded.{key}, order_key = excluded.order_key "
+        f"WHERE {newer}; END",
+        # Only changes to the equipment, key or date can move the latest record
+        f"CREATE TRIGGER IF NOT EXISTS trg_{table}_update AFTER UPDATE OF equipment_id, {key}, {order_col} "
+        f"ON {source} WHEN OLD.equipment_id IS NOT NEW.equipment_id OR OLD.{key} IS NOT NEW.{key} "
+        f"OR OLD.{order_col} IS NOT NEW.{order_col} BEGIN {refresh('OLD.equipment_id')} "
+        f"{refresh('NEW.equipment_id')} END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_{table}_delete AFTER DELETE ON {source} "
+        f"WHEN OLD.{key} = (SELECT {key} FROM {table} WHERE equipment_id = OLD.equipment_id) "
+        f"BEGIN {refresh('OLD.equipment_id')} END",
+    ]
+
+
+# Versioned schema migrations, applied in order and tracked with PRAGMA user_version.
+MIGRATIONS = [
+    (1, "Secondary indexes for per-equipment joins, latest-record lookups and overdue scans", [
+        # Latest usage per equipment and per-equipment usage aggregates
+        "CREATE INDEX IF NOT EXISTS idx_usage_equipment_date ON UsageMetrics (equipment_id, date)",
+        # Latest rental per equipment
+        "CREATE INDEX IF NOT EXISTS idx_rentals_equipment_checkout ON RentalTransactions (equipment_id, check_out_date)",
+        # Overdue scans only ever look at rentals that are still out
+        "CREATE INDEX IF NOT EXISTS idx_rentals_open ON RentalTransactions (expected_return_date, equipment_id) "
+        "WHERE check_in_date IS NULL",
+        "CREATE INDEX IF NOT EXISTS idx_maintenance_equipment_service ON MaintenanceHealth (equipment_id, last_service_date)",
+        "CREATE INDEX IF NOT EXISTS idx_maintenance_costs ON MaintenanceHealth (maintenance_costs)",
+        "CREATE INDEX IF NOT EXISTS idx_alerts_equipment ON AlertsNotifications (equipment_id)",
+        "CREATE INDEX IF NOT EXISTS idx_financial_equipment ON FinancialData (equipment_id)",
+        "CREATE INDEX IF NOT EXISTS idx_ai_equipment ON AIFeatures (equipment_id)",
+        "CREATE INDEX IF NOT EXISTS idx_ai_anomaly ON AIFeatures (anomaly_flag) WHERE anomaly_flag = 1",
+    ]),
+    (2, "Revision counters bumped on UPDATE/DELETE, so incremental readers can detect rewritten history", [
+        "CREATE TABLE IF NOT EXISTS TableRevisions (table_name TEXT PRIMARY KEY, revision INTEGER NOT NULL DEFAULT 0)",
+    ] + [
+        statement
+        for table in ("RentalTransactions", "UsageMetrics", "MaintenanceHealth")
+        for statement in (
+            f"INSERT OR IGNORE INTO TableRevisions (table_name) VALUES ('{table}')",
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_update AFTER UPDATE ON {table} BEGIN "
+            f"UPDATE TableRevisions SET revision = revision + 1 WHERE table_name = '{table}'; END",
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_delete AFTER DELETE ON {table} BEGIN "
+            f"UPDATE TableRevisions SET revision = revision + 1 WHERE table_name = '{table}'; END",
+            # Appends are fine; a row inserted below the current maximum key is not
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_backfill AFTER INSERT ON {table} "
+            f"WHEN NEW.rowid < (SELECT MAX(rowid) FROM {table}) BEGIN "
+            f"UPDATE TableRevisions SET revision = revision + 1 WHERE table_name = '{table}'; END",
+        )
+    ]),
+    (3, "Open-rental index keyed on the same julianday() test the overdue queries use", [
+        # Blank or malformed check-in dates count as still out, so the predicate must match that
+        "DROP INDEX IF EXISTS idx_rentals_open",
+        "CREATE INDEX IF NOT EXISTS idx_rentals_unreturned ON RentalTransactions (expected_return_date, equipment_id) "
+        "WHERE julianday(check_in_date) IS NULL",
+    ]),
+    (4, "Weekly and monthly usage rollups kept current by triggers, and a date index for the raw edges", [
+        "CREATE INDEX IF NOT EXISTS idx_usage_date ON UsageMetrics (date)",
+        # Rows the rollups leave out; whole-history totals read them raw
+        "CREATE INDEX IF NOT EXISTS idx_usage_undated ON UsageMetrics (equipment_id) WHERE date(date) IS NULL",
+    ] + [statement for table, period in USAGE_ROLLUPS.items()
+         for statement in _usage_rollup_statements(table, period)]),
+    (5, "LatestRental and LatestUsage tables kept current by triggers, for profile lookups", [
+        statement for table in LATEST_RECORDS for statement in _latest_record_statements(table)
+    ]),
+]
+
+# Per-connection settings; SQLite does not persist these, so every reader applies them.
+CONNECTION_PRAGMAS = [
+    "PRAGMA cache_size = -65536",    # 64 MiB page cache
+    "PRAGMA mmap_size = 268435456",  # map up to 256 MiB of the file
+    "PRAGMA temp_store = MEMORY",
+]
+
+# Queries issued by the analysis API, its SQL pushdown backend and the voice agent.
+REPORT_QUERIES = {
+    "analysis: latest usage for one asset":
+        "SELECT * FROM UsageMetrics WHERE equipment_id = 'EQ001' ORDER BY date DESC LIMIT 1",
+    "analysis: latest rental for one asset":
+        "SELECT * FROM RentalTransactions WHERE equipment_id = 'EQ001' ORDER BY check_out_date DESC LIMIT 1",
+    "analysis: usage metrics pushdown":
+        "SELECT equipment_id, TOTAL(engine_hours_per_day), TOTAL(idle_hours_per_day), "
+        "TOTAL(engine_hours_per_day + idle_hours_per_day) FROM UsageMetrics "
+        "WHERE equipment_id IS NOT NULL GROUP BY equipment_id ORDER BY equipment_id",
+    "analysis: overdue rentals pushdown":
+        "SELECT equipment_id, site_id, expected_return_date FROM RentalTransactions "
+        "WHERE julianday(check_in_date) IS NULL "
+        "AND julianday(expected_return_date) < julianday('now') ORDER BY transaction_id",
+    "analysis: usage rollup edge (raw rows of a few days)":
+        "SELECT equipment_id, TOTAL(engine_hours_per_day) FROM UsageMetrics "
+        "WHERE +equipment_id IS NOT NULL AND date >= date('2025-08-10', '-1 day') AND date(date) >= '2025-08-10' "
+        "AND date < date('2025-08-14', '+1 day') AND date(date) < '2025-08-14' GROUP BY +equipment_id",
+    "analysis: last service per asset":
+        "SELECT equipment_id, MAX(last_service_date) FROM MaintenanceHealth GROUP BY equipment_id",
+    "voice agent: highest maintenance costs":
+        "SELECT equipment_id, maintenance_costs FROM MaintenanceHealth ORDER BY maintenance_costs DESC LIMIT 1",
+    "voice agent: average rental duration per type":
+        "SELECT T1.type, AVG(julianday(T2.check_in_date) - julianday(T2.check_out_date)) "
+        "FROM EquipmentMaster AS T1 JOIN RentalTransactions AS T2 ON T1.equipment_id = T2.equipment_id "
+        "WHERE T2.check_in_date IS NOT NULL GROUP BY T1.type",
+    "dashboard: alerts joined to rentals and AI features":
+        "SELECT rt.equipment_id, an.alert_type, an.overdue_status, af.anomaly_flag "
+        "FROM RentalTransactions rt "
+        "LEFT JOIN AlertsNotifications an ON rt.equipment_id = an.equipment_id "
+        "LEFT JOIN AIFeatures af ON rt.equipment_id = af.equipment_id "
+        "WHERE an.alert_type != 'None' OR an.overdue_status = 1 OR af.anomaly_flag = 1",
+}
+
+
+def tune_connection(conn):
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def query_plans(conn):
+    """Returns the EXPLAIN QUERY PLAN lines of every report query."""
+    plans = {}
+    for label, sql in REPORT_QUERIES.items():
+        rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+        plans[label] = [row[-1] for row in rows]
+    return plans
+
+
+def migrate(conn):
+    """Applies pending migrations, switches to WAL and refreshes planner statistics."""
+    current = conn.execute("PRAGMA user_version").fetchone()[0]
+    for version, description, statements in MIGRATIONS:
+        if version <= current:
+            continue
+        print(f"Applying migration {version}: {description}")
+        with conn:
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {version}")
+        current = version
+
+    # WAL is persistent: readers no longer block the writer and vice versa
+    journal_mode = conn.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+    conn.execute("ANALYZE")
+    conn.commit()
+    print(f"Schema at version {current}, journal_mode={journal_mode}, statistics refreshed.")
+    return current
+
+
+def rebuild_latest_tables(conn):
+    """Refills the latest-state tables from their history tables, e.g. after a bulk load without triggers."""
+    with conn:
+        for table in LATEST_RECORDS:
+            for statement in _latest_rebuild_statements(table):
+                conn.execute(statement)
+            count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            print(f"Rebuilt {table}: {count} equipment")
+
+
+def format_report(before, after):
+    lines = ["# Query plans before/after index migration", ""]
+    for label in REPORT_QUERIES:
+        lines.append(f"## {label}")
+        lines.append("")
+        lines.append("Before:")
+        lines.extend(f"    {step}" for step in before[label])
+        lines.append("After:")
+        lines.extend(f"    {step}" for step in after[label])
+        lines.append("")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    # python migrate.py [database] [--rebuild-latest]
+    args = [arg for arg in sys.argv[1:] if arg != "--rebuild-latest"]
+    path = args[0] if args else db_name
+    conn = tune_connection(sqlite3.connect(path))
+    try:
+        if "--rebuild-latest" in sys.argv[1:]:
+            migrate(conn)
+            rebuild_latest_tables(conn)
+            sys.exit(0)
+        before = query_plans(conn)
+        migrate(conn)
+        after = query_plans(conn)
+        report = format_report(before, after)
+        with open(report_name, "w") as f:
+            f.write(report + "\n")
+        print(f"\n{report}")
+        print(f"Query plan report written to {report_name}")
+    except sqlite3.Error as e:
+        print(f"An error occurred: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+        print("Database connection closed.")
@@ -32,6 +32,8 @@ const Dashboard = () => {
   const [focusedEquipment, setFocusedEquipment] = useState(null);
   const [hoveredEquipmentId, setHoveredEquipmentId] = useState(null);
   const [qrTab, setQrTab] = useState('overview');
+  const [liveAlerts, setLiveAlerts] = useState({});
+  const [alertsUpdatedAt, setAlertsUpdatedAt] = useState(null);
 
   // Debug function
   const debugLog = (message, data = null) => {
@@ -98,6 +100,31 @@ const Dashboard = () => {
     return () => clearInterval(interval);
   }, []);
 
+  // Alert feed pushed by the analysis service: one snapshot, then only the deltas
+  useEffect(() => {
+    const source = new EventSource('http://localhost:8085/alerts/stream');
+
+    source.addEventListener('snapshot', (event) => {
+      const { alerts } = JSON.parse(event.data);
+      setLiveAlerts(Object.fromEntries(alerts.map(alert => [alert.key, alert])));
+      setAlertsUpdatedAt(new Date());
+    });
+
+    source.addEventListener('delta', (event) => {
+      const delta = JSON.parse(event.data);
+      debugLog('Alert delta received:', delta);
+      setLiveAlerts(prev => {
+        const next = { ...prev };
+        [...delta.new, ...delta.changed].forEach(alert => { next[alert.key] = alert; });
+        delta.resolved.forEach(key => { delete next[key]; });
+        return next;
+      });
+      setAlertsUpdatedAt(new Date());
+    });
+
+    return () => source.close();
+  }, []);
+
   // QR Scanner
   const handleQRScan = async () => {
     debugLog('QR scan initiated');
@@ -898,6 +925,13 @@ const Dashboard = () => {
                     <div className="text-sm" style={{ color: '#ffffff' }}>Every 60 seconds</div>
                   </div>
                 </div>
+                <div className="flex items-center gap-3" style={{ margin: '16px 0' }}>
+                  <Bell style={{ color: '#FFCD00' }} size={20} />
+                  <div>
+                    <div className="font-semibold" style={{ color: '#FFCD00' }}>Active Alerts</div>
+                    <div className="text-sm" style={{ color: '#ffffff' }}>{Object.keys(liveAlerts).length} live</div>
+                  </div>
+                </div>
                 <div className="flex items-center gap-3" style={{ margin: '16px 0' }}>
                   <MessageCircle style={{ color: '#FFCD00' }} size={20} />
                   <div>
@@ -925,6 +959,11 @@ const Dashboard = () => {
                       Last chat: {new Date().toLocaleTimeString()}
                     </div>
                   )}
+                  {alertsUpdatedAt && (
+                    <div className="text-sm" style={{ color: '#ffffff', margin: '8px 0', padding: '4px 0' }}>
+                      Alerts updated: {alertsUpdatedAt.toLocaleTimeString()}
+                    </div>
+                  )}
                 </div>
             </Card>
           </div>
@@ -1,8 +1,13 @@
+import sys
+from pathlib import Path
 from fastapi import FastAPI, File, UploadFile, HTTPException
 from fastapi.responses import JSONResponse
 import cv2
 import numpy as np
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from common.timing import install_timing
+
 app = FastAPI(title="QR Code Reader (OpenCV)")
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -13,6 +18,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+install_timing(app)
+
 @app.post("/read_qr")
 async def read_qr():
     # Simulated rich QR data payload
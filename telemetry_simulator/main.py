@@ -1,8 +1,13 @@
-import sqlite3
 import random
+import sys
 from datetime import datetime, timedelta
+from pathlib import Path
 from fastapi import FastAPI
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from common.sqlite_pool import SQLitePool
+from common.timing import install_timing, stage
+
 app = FastAPI()
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -13,7 +18,9 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+install_timing(app)
 DB_FILE = "/Users/hardikchhallani/PycharmProjects/Smart-Rental-Tracking/dataset_preparation/equipment_management.db"
+db_pool = SQLitePool(DB_FILE, size=4)
 
 def random_date(start, end):
     """Return a random datetime between `start` and `end`."""
@@ -21,13 +28,12 @@ def random_date(start, end):
     random_days = random.randrange(delta.days)
     return start + timedelta(days=random_days)
 
-def simulate_data():
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+def _random_equipment_id(conn):
+    return conn.execute("SELECT Equipment_ID FROM EquipmentMaster ORDER BY RANDOM() LIMIT 1").fetchone()[0]
 
+def simulate_data():
     # Equipment Master Data
-    cursor.execute("SELECT Equipment_ID FROM EquipmentMaster ORDER BY RANDOM() LIMIT 1")
-    equipment_id = cursor.fetchone()[0]
+    equipment_id = db_pool.run(_random_equipment_id, label="random_equipment")
 
     # Rental/Transaction Data
     site_id = random.randint(100, 200)
@@ -73,8 +79,6 @@ def simulate_data():
     anomaly_flag = random.choice(["Yes", "No"])
     recommended_site = random.randint(100, 200)
 
-    conn.close()
-
     return {
         "equipment_id": equipment_id,
         "rental_transaction": {
@@ -126,9 +130,15 @@ def simulate_data():
 @app.get("/simulate")
 def simulate():
     """Simulate and return full random dataset."""
-    data = simulate_data()
+    with stage("simulate"):
+        data = simulate_data()
     return data
 
+@app.get("/db-pool-stats")
+def db_pool_stats():
+    """Connection pool occupancy, pool-wait and query latencies."""
+    return db_pool.metrics()
+
 if __name__ == "__main__":
     import  uvicorn
     uvicorn.run(app,port=8082)
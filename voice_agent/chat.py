@@ -1,10 +1,15 @@
 import google.generativeai as genai
 from fastapi import FastAPI, Body
 import os
+import sys
+from pathlib import Path
 from dotenv import load_dotenv
 from fastapi.middleware.cors import CORSMiddleware
 from server import run_sql_tool
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from common.timing import install_timing, stage
+
 load_dotenv()
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
@@ -19,6 +24,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+install_timing(app)
 
 # AI Chat Analysis Prompt with Equipment Rental Theme
 ai_analysis_prompt = """
@@ -98,7 +104,8 @@ def generate_ai_response(user_query: str) -> str:
     """Generate AI-powered natural language response for equipment rental queries."""
     try:
         model = genai.GenerativeModel("gemini-2.5-pro")
-        response = model.generate_content(ai_analysis_prompt.format(user_query=user_query))
+        with stage("llm"):
+            response = model.generate_content(ai_analysis_prompt.format(user_query=user_query))
         return response.text.strip()
     except Exception as e:
         return f"I apologize, but I'm experiencing technical difficulties with my AI analysis. Please try again or contact support if the issue persists. Error: {str(e)}"
@@ -112,7 +119,8 @@ def convert_db_result_to_nl(user_query: str, sql_query: str, db_result: list[dic
             sql_query=sql_query,
             db_result=db_result
         )
-        response = model.generate_content(prompt)
+        with stage("llm"):
+            response = model.generate_content(prompt)
         return response.text.strip()
     except Exception as e:
         # Fallback to basic formatting if AI fails
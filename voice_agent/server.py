@@ -1,12 +1,19 @@
 import asyncio
-import sqlite3
+import sys
+from pathlib import Path
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
 from mcp.types import Tool, TextContent
 from typing import Any, Sequence
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from common.sqlite_pool import SQLitePool
+
 DB_PATH = "/Users/hardikchhallani/PycharmProjects/Smart-Rental-Tracking/dataset_preparation/equipment_management.db"
 
+# Read-only: the assistant can query the equipment database but never modify it
+db_pool = SQLitePool(DB_PATH, size=4)
+
 server = Server(name="sqlite-query-server")
 
 
@@ -40,19 +47,18 @@ async def call_tool(name: str, arguments: dict[str, Any]) -> Sequence[TextConten
         raise ValueError(f"Unknown tool: {name}")
 
 
+def _query(conn, sql_query: str) -> list[dict]:
+    cur = conn.execute(sql_query)
+    columns = [col[0] for col in cur.description or []]
+    return [dict(zip(columns, row)) for row in cur.fetchall()]
+
+
 async def run_sql_tool(arguments: dict) -> Sequence[TextContent]:
     """Execute SQL query and return results."""
     sql_query = arguments["sql"]
     try:
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
-        cur = conn.cursor()
-        cur.execute(sql_query)
-        rows = cur.fetchall()
-        conn.commit()
-        conn.close()
-
-        results = [dict(row) for row in rows]
+        # Run on a pooled read-only connection off the event loop
+        results = await asyncio.to_thread(db_pool.run, _query, sql_query, label="run_sql")
         return [TextContent(type="text", text=str(results))]
 
     except Exception as e: